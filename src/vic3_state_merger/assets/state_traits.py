@@ -1,92 +1,15 @@
-﻿str = """
-# 两州整合
-INJECT_OR_CREATE:state_trait_two_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 100 # 州征税能力
-        state_infrastructure_from_population_max_add = 60 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 25 # 建造部门最大等级
-        state_building_barrack_max_level_add = 25 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 50 # 征兵上限
-    }
-}
-
-# 三州整合
-INJECT_OR_CREATE:state_trait_three_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 200 # 州征税能力
-        state_infrastructure_from_population_max_add = 120 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 50 # 建造部门最大等级
-        state_building_barrack_max_level_add = 50 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 100 # 征兵上限
-    }
-}
-
-# 四州整合
-INJECT_OR_CREATE:state_trait_four_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 300 # 州征税能力
-        state_infrastructure_from_population_max_add = 180 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 75 # 建造部门最大等级
-        state_building_barrack_max_level_add = 75 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 150 # 征兵上限
-    }
-}
-
-# 五州整合
-INJECT_OR_CREATE:state_trait_five_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 400 # 州征税能力
-        state_infrastructure_from_population_max_add = 240 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 100 # 建造部门最大等级
-        state_building_barrack_max_level_add = 100 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 200 # 征兵上限
-    }
-}
-
-# 六州整合
-INJECT_OR_CREATE:state_trait_six_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 500 # 州征税能力
-        state_infrastructure_from_population_max_add = 300 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 125 # 建造部门最大等级
-        state_building_barrack_max_level_add = 125 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 250 # 征兵上限
-    }
-}
-
-# 七州整合
-INJECT_OR_CREATE:state_trait_seven_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 600 # 州征税能力
-        state_infrastructure_from_population_max_add = 360 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 150 # 建造部门最大等级
-        state_building_barrack_max_level_add = 150 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 300 # 征兵上限
-    }
-}
-
-# 八州整合
-INJECT_OR_CREATE:state_trait_eight_states_integration= {
-    icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"
-
-    modifier = {
-        state_tax_capacity_add = 700 # 州征税能力
-        state_infrastructure_from_population_max_add = 420 # 来自人口的基础设施上限
-        state_building_construction_sector_max_level_add = 175 # 建造部门最大等级
-        state_building_barrack_max_level_add = 175 # 兵营最大等级
-        state_building_conscription_center_max_level_add = 350 # 征兵上限
-    }
-}
-"""
+﻿# Default modifier table of the state integration traits, in the format of the --trait-table file.
+# Each modifier is added per_state times the number of merged states beyond the first.
+default_table = {
+    "icon": "gfx/interface/icons/state_trait_icons/great_plains.dds",
+    "modifiers": [
+        {"modifier": "state_tax_capacity_add", "per_state": 100, "comment": "州征税能力"},
+        {"modifier": "state_infrastructure_from_population_max_add", "per_state": 60, "comment": "来自人口的基础设施上限"},
+        {"modifier": "state_building_construction_sector_max_level_add", "per_state": 25, "comment": "建造部门最大等级"},
+        {"modifier": "state_building_barrack_max_level_add", "per_state": 25, "comment": "兵营最大等级"},
+        {"modifier": "state_building_conscription_center_max_level_add", "per_state": 50, "comment": "征兵上限"},
+    ],
+}
+
+# Names of the traits in their comments, by integration count
+count_names = {2: "两", 3: "三", 4: "四", 5: "五", 6: "六", 7: "七", 8: "八"}
@@ -1,84 +0,0 @@
-﻿str = '''
-# Count number of actual incorporated states in USA
-REPLACE_OR_CREATE:usa_state_counter = {
-    value = 2
-
-    if = {
-        limit = { exists = c:USA }
-
-        c:USA = {
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_two_states_integration
-                    is_incorporated = yes
-                }
-                add = 2
-            }
-            
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_three_states_integration
-                    is_incorporated = yes
-                }
-                add = 3
-            }
-
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_four_states_integration
-                    is_incorporated = yes
-                }
-                add = 4
-            }
-
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_five_states_integration
-                    is_incorporated = yes
-                }
-                add = 5
-            }
-
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_six_states_integration
-                    is_incorporated = yes
-                }
-                add = 6
-            }
-
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_seven_states_integration
-                    is_incorporated = yes
-                }
-                add = 7
-            }
-
-            every_scope_state = {
-                limit = {
-                    has_state_trait = state_trait_eight_states_integration
-                    is_incorporated = yes
-                }
-                add = 8
-            }
-
-            every_scope_state = {
-                limit = {
-                    NOR = {
-                        has_state_trait = state_trait_two_states_integration
-                        has_state_trait = state_trait_three_states_integration
-                        has_state_trait = state_trait_four_states_integration
-                        has_state_trait = state_trait_five_states_integration
-                        has_state_trait = state_trait_six_states_integration
-                        has_state_trait = state_trait_seven_states_integration
-                        has_state_trait = state_trait_eight_states_integration
-                    }
-                    is_incorporated = yes
-                }
-                add = 1
-            }
-        }
-    }
-}
-'''
@@ -1,5 +1,8 @@
+import copy
 from pyradox import Tree
 
+from vic3_state_merger.emit import write_states
+
 
 def format_dict_to_string(d:dict|list, indent_level:int=0):
     # Convert self into the game's file format and write to file_path
@@ -160,6 +163,26 @@ class Building:
                 self.company_ownership.append(ownership)
         return self
 
+    def to_python(self):
+        """Export the building object to a Python dictionary"""
+        if self.is_empty():
+            return {}
+        building_dict = {"building": self.building}
+        if self.isMonument:
+            building_dict["level"] = 1
+            return building_dict
+        ownership_dict = {}
+        if self.building_ownership:
+            ownership_dict["building"] = [dict(ownership) for ownership in self.building_ownership]
+        if self.country_ownership:
+            ownership_dict["country"] = [dict(ownership) for ownership in self.country_ownership]
+        if self.company_ownership:
+            ownership_dict["company"] = [dict(ownership) for ownership in self.company_ownership]
+        building_dict["add_ownership"] = ownership_dict
+        building_dict["reserves"] = self.reserves
+        building_dict["activate_production_methods"] = list(self.activate_production_methods)
+        return building_dict
+
     def __str__(self):
         building_str = f"            create_building = {{\n"
         if self.is_empty():
@@ -205,9 +228,35 @@ class Building:
         return building_str
 
 
+def buildings_state_str(state_id:str, state_buildings) -> str:
+    """Return the BUILDINGS entry of a state, or the dlc buildings if state_id is "if"."""
+    if state_id == "if":
+        building_tree = Tree({"if": state_buildings})
+        return building_tree.prettyprint(level=1)
+    building_str = f"    {state_id} = {{\n"
+    for tag in state_buildings.keys():
+        building_str += f"        {tag} = {{\n"
+        for building in state_buildings[tag]:
+            building_str += str(building)
+        building_str += f"        }}\n"
+    building_str += f"    }}\n"
+
+    return building_str
+
+
 class Buildings(dict):
-    def __init__(self, source:dict|Tree|None=None):
+    """
+    Dictionary of the buildings of each "s:STATE_X" state, by country tag
+    region_index: dict, ownership region (without quotes) -> (state id, tag, position) of the
+        buildings having a building ownership in that region, or None until region_index_of
+        builds it. It is built when loading and dropped once the states are merged.
+    log: function called with each log line
+    """
+
+    def __init__(self, source:dict|Tree|None=None, log=print):
         super().__init__()
+        self.log = log
+        self.region_index = None
         if source is None:
             return
         elif isinstance(source, Tree):
@@ -226,7 +275,7 @@ class Buildings(dict):
         for state_id in buildings_dict["BUILDINGS"].keys():
             if state_id == "if":  # dlc buildings
                 continue
-            print("Reading buildings: " + state_id)
+            self.log("Reading buildings: " + state_id)
             self[state_id] = {}
             for tag in buildings_dict["BUILDINGS"][state_id].keys():
                 self[state_id][tag] = []
@@ -248,6 +297,25 @@ class Buildings(dict):
                 ]:
                     self[state_id][tag].append(Building(building))
         self.format()
+        self.region_index_of()
+
+    def region_index_of(self) -> dict[str, list[tuple[str, str, int]]]:
+        """Return region_index, building it if needed. The positions are those after format."""
+        if self.region_index is None:
+            self.region_index = {}
+            for state_id in self.keys():
+                if state_id == "if":  # dlc buildings
+                    continue
+                for tag in self[state_id].keys():
+                    if not isinstance(self[state_id][tag], list):
+                        continue
+                    for position, building in enumerate(self[state_id][tag]):
+                        if building.is_empty() or building.isMonument:
+                            continue
+                        regions = {ownership["region"].replace('"', "") for ownership in building.building_ownership}
+                        for region in regions:
+                            self.region_index.setdefault(region, []).append((state_id, tag, position))
+        return self.region_index
 
     def format(self):
         for (
@@ -260,6 +328,25 @@ class Buildings(dict):
                     if self[state_id][tag][i - 1].is_empty():
                         self[state_id][tag].pop(i - 1)
 
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing every state the merge plan does not touch.
+        States owning buildings with ownerships in a food region are touched as well."""
+        forked = Buildings(log=self.log)
+        forked.update(self)
+        region_index = self.region_index_of()
+        touched = set()
+        for diner, food_list in merge_dict.items():
+            touched.add("s:" + diner)
+            for food in food_list:
+                touched.add("s:" + food)
+                touched.update(state_id for state_id, _, _ in region_index.get(food, ()))
+        for state_id in touched:
+            if state_id in self.keys():
+                forked[state_id] = copy.deepcopy(self[state_id])
+        # The touched states are copied as they are, so the positions of the index still hold
+        forked.region_index = region_index
+        return forked
+
     def merge_state(self, diner:str, food:str):
         if ("s:" + food) in self.keys():
             # print(f"Merging {food} building data into {diner}")
@@ -279,58 +366,88 @@ class Buildings(dict):
             # Remove the food from data
             self.pop("s:" + food)
 
-    def merge_states(self, merge_dict:dict):
-        # Transfers building ownerships
-        for state_id in self.keys():
-            if state_id == "if":  # dlc buildings
-                continue
-            for tag in self[state_id].keys():
-                if not isinstance(self[state_id][tag], list):
-                    continue
-                for building in self[state_id][tag]:
-                    if building.is_empty() or building.isMonument:
-                        continue
-                    for ownership in building.building_ownership:
-                        region = ownership["region"].replace(
-                            '"', ""
-                        )  # Remove '\"' from ownership["region"]
-                        for diner, food_list in merge_dict.items():
-                            if region in food_list:
-                                ownership["region"] = '"' + diner + '"'
-                                building.refresh()
-                                break
-        # Merge building
+    def merge_states(self, merge_dict:dict, progress=None):
+        # progress is called with (diners done, diners total) after each diner
+        # Transfers building ownerships, visiting only the buildings owned from a food region
+        diner_of = {}
         for diner, food_list in merge_dict.items():
+            for food in food_list:
+                diner_of.setdefault(food, diner)
+        region_index = self.region_index_of()
+        moved = {}
+        # Ownerships are picked by their original region before any is rewritten, so an ownership
+        # moved to a diner that is itself a food is not moved again
+        rewrites = []
+        for food, diner in diner_of.items():
+            for state_id, tag, position in region_index.get(food, ()):
+                building = self[state_id][tag][position]
+                for ownership in building.building_ownership:
+                    if ownership["region"].replace('"', "") == food:  # Remove '\"' from ownership["region"]
+                        rewrites.append((ownership, diner))
+                moved[id(building)] = building
+        for ownership, diner in rewrites:
+            ownership["region"] = '"' + diner + '"'
+        # Merge the ownerships that now have the same region, once per building
+        for building in moved.values():
+            building.refresh()
+        # Merge building
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
             for food in food_list:
                 self.merge_state(diner, food)
+            if progress is not None:
+                progress(done, len(merge_dict))
         self.format()
+        # Buildings moved between states, the index is rebuilt if it is needed again
+        self.region_index = None
 
-    def get_str(self, state_id:str) -> str:
-        if state_id == "if":
-            building_tree = Tree({"if": self["if"]})
-            return building_tree.prettyprint(level=1)
-        building_str = f"    {state_id} = {{\n"
+    def level_cnt(self, state_id:str) -> int:
+        """Return the total building levels of a state"""
+        if state_id not in self.keys() or state_id == "if":
+            return 0
+        levels = 0
         for tag in self[state_id].keys():
-            building_str += f"        {tag} = {{\n"
+            if not isinstance(self[state_id][tag], list):
+                continue
             for building in self[state_id][tag]:
-                building_str += str(building)
-            building_str += f"        }}\n"
-        building_str += f"    }}\n"
+                levels += building.level_cnt()
+        return levels
 
-        return building_str
+    def to_python(self):
+        """Export the Buildings object to a Python dictionary, the dlc buildings under "if" as they were read"""
+        buildings_dict = {}
+        for state_id in self.keys():
+            if state_id == "if":
+                buildings_dict[state_id] = copy.deepcopy(self[state_id])
+                continue
+            buildings_dict[state_id] = {}
+            for tag in self[state_id].keys():
+                if not isinstance(self[state_id][tag], list):
+                    continue
+                buildings_dict[state_id][tag] = [building.to_python() for building in self[state_id][tag]]
+        return buildings_dict
+
+    def get_str(self, state_id:str) -> str:
+        return buildings_state_str(state_id, self[state_id])
 
     def __str__(self) -> str:
         building_str = "BUILDINGS = {\n"
         for state_id in self.keys():
-            print("Exporting building data: " + state_id)
+            self.log("Exporting building data: " + state_id)
             building_str += self.get_str(state_id)
         building_str += "}\n"
         return building_str
 
-    def dump(self, dir):
+    def dump(self, dir, workers:int=1, threshold:int|None=None):
+        """Write the buildings to dir, formatting the states in worker processes if there are
+        workers and at least threshold states, see emit.write_states"""
         with open(dir, "w", encoding="utf-8-sig") as file:
             file.write("BUILDINGS = {\n")
-            for state_id in self.keys():
-                print("Exporting building data: " + state_id)
-                file.write(self.get_str(state_id))
+            write_states(
+                file,
+                list(self.items()),
+                buildings_state_str,
+                workers,
+                threshold,
+                on_state=lambda state_id: self.log("Exporting building data: " + state_id),
+            )
             file.write("}\n")
@@ -1,9 +1,25 @@
 import argparse
+import asyncio
+import contextlib
 import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
 
 from vic3_state_merger import __version__
-from vic3_state_merger.state_merger import StateMerger
+from vic3_state_merger.state_merger import (
+    GameData,
+    StateMerger,
+    loc_file_dir,
+    parse_merge,
+    read_strategic_regions,
+    remove_file_dir,
+    replace_file_dir,
+    state_file_dir,
+)
+from vic3_state_merger.state_regions import StateRegion
 
 
 def _ensure_trailing_sep(path: str) -> str:
@@ -14,8 +30,6 @@ def _ensure_trailing_sep(path: str) -> str:
     return path + "/"
 
 def _default_data_dir(mod_dir: str) -> str:
-    import os
-
     mod_dir = os.path.abspath(mod_dir)
     parent = os.path.dirname(mod_dir.rstrip("/\\"))
     candidate = os.path.join(parent, "data")
@@ -28,6 +42,7 @@ def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="state-merger",
         description="Merge Victoria 3 states based on a merge plan JSON file.",
+        epilog="Other commands: batch, serve, validate, generate, preview, export, whatif. Run 'state-merger-cli <command> --help' for their options.",
     )
     parser.add_argument(
         "merge_file",
@@ -59,6 +74,90 @@ def get_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Ignore small states when merging.",
     )
+    parser.add_argument(
+        "--recompute-hubs",
+        dest="recompute_hubs",
+        action="store_true",
+        help=(
+            "Move the hubs of each merged state to those of its states closest to its centroid "
+            "in provinces.png (needs numpy)."
+        ),
+    )
+    parser.add_argument(
+        "--trait-table",
+        dest="trait_table",
+        default=None,
+        help=(
+            "JSON file with the icon and the per-state modifiers of the integration traits "
+            "(default: the built-in table)."
+        ),
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Merge the pops and the trade as numpy columns, faster on large games (needs numpy). The output is the same.",
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help=(
+            "Parse, merge and write the state data one subsystem at a time, holding only one of them in "
+            "memory at once. The output is the same."
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Merge the buildings, pops, states and trade in up to this many worker processes, alongside "
+            "the state regions and the script files (implies --staged)."
+        ),
+    )
+    parser.add_argument(
+        "--emit-workers",
+        dest="emit_workers",
+        type=int,
+        default=1,
+        help="Format the state regions, buildings and pops files in this many worker processes. The output is the same.",
+    )
+    parser.add_argument(
+        "--emit-threshold",
+        dest="emit_threshold",
+        type=int,
+        default=None,
+        help="Fewest states of a file for --emit-workers to be used (default: 500).",
+    )
+    parser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        help="Report the planned changes without writing anything to mod_dir.",
+    )
+    parser.add_argument(
+        "--report",
+        dest="report_file",
+        default=None,
+        help="With --dry-run, write the report as JSON to this path instead of printing it.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep the parsed game data in memory and merge again whenever merge_file changes.",
+    )
+    parser.add_argument(
+        "--watch-game-root",
+        dest="watch_game_root",
+        action="store_true",
+        help="With --watch, also parse the game root again when its state, script or localization files change.",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        dest="watch_interval",
+        type=float,
+        default=1.0,
+        help="With --watch, seconds between two checks for changes.",
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -67,6 +166,282 @@ def get_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def get_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger batch",
+        description="Apply several merge plans to one parsed game root, each written to its own mod folder.",
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "--variant",
+        dest="variants",
+        nargs=2,
+        action="append",
+        required=True,
+        metavar=("MERGE_FILE", "MOD_DIR"),
+        help="Merge plan and its target mod output folder. Can be given several times.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes merging the variants in parallel.",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Merge the pops and the trade as numpy columns, faster on large games (needs numpy). The output is the same.",
+    )
+    parser.add_argument(
+        "--recompute-hubs",
+        dest="recompute_hubs",
+        action="store_true",
+        help=(
+            "Move the hubs of each merged state to those of its states closest to its centroid "
+            "in provinces.png (needs numpy)."
+        ),
+    )
+    parser.add_argument(
+        "--trait-table",
+        dest="trait_table",
+        default=None,
+        help=(
+            "JSON file with the icon and the per-state modifiers of the integration traits "
+            "(default: the built-in table)."
+        ),
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory (defaults to sibling of each mod_dir).",
+    )
+    parser.add_argument(
+        "--small-state-limit",
+        type=int,
+        default=4,
+        help="Limit for small states when merging.",
+    )
+    parser.add_argument(
+        "--ignore-small-states",
+        dest="ignore_small_states",
+        action="store_true",
+        help="Ignore small states when merging.",
+    )
+    return parser
+
+
+def get_serve_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger serve",
+        description=(
+            "Parse a game root once and serve merge, dry_run, validate, query and reload "
+            "JSON-RPC 2.0 requests over localhost HTTP or stdio."
+        ),
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port to listen on.",
+    )
+    parser.add_argument(
+        "--stdio",
+        action="store_true",
+        help="Read requests from stdin and write responses to stdout, one JSON object per line.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of requests handled at the same time.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory (defaults to ./data).",
+    )
+    parser.add_argument(
+        "--allow-dir",
+        dest="allow_dirs",
+        action="append",
+        default=None,
+        help=(
+            "Accept merge_file, mod_dir and data_dir paths inside this directory. Can be given several "
+            "times. Without it, plans can only be sent inline and merge requests are refused."
+        ),
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Hold the pops and the trade as numpy columns, faster on large games (needs numpy).",
+    )
+    return parser
+
+
+def get_validate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger validate",
+        description=(
+            "Check a merge plan: unknown or twice merged states, provinces of the merged states in "
+            "several state regions or not owned by their state region, and with numpy installed, "
+            "contiguity of each merged group and port/naval exit conflicts from provinces.png."
+        ),
+    )
+    parser.add_argument(
+        "merge_file",
+        help="Path to merge_states.json (merge plan).",
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory for the province map (defaults to ./data).",
+    )
+    parser.add_argument(
+        "--no-geometry",
+        dest="geometry",
+        action="store_false",
+        help="Skip the checks using provinces.png.",
+    )
+    parser.add_argument(
+        "--json",
+        dest="json_output",
+        action="store_true",
+        help="Print the issues as a JSON list.",
+    )
+    return parser
+
+
+def get_generate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger generate",
+        description=(
+            "Write a merge plan merging every small state into its largest adjacent neighbour "
+            "in the same strategic region. Needs numpy to read provinces.png."
+        ),
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "output_file",
+        help="Path of the merge plan JSON file to write.",
+    )
+    parser.add_argument(
+        "--small-state-limit",
+        type=int,
+        default=4,
+        help="States with fewer provinces than this are merged into a neighbour.",
+    )
+    parser.add_argument(
+        "--max-provinces",
+        type=int,
+        default=None,
+        help="Maximum province count of a merged state.",
+    )
+    parser.add_argument(
+        "--max-pops",
+        type=int,
+        default=None,
+        help="Maximum pop total of a merged state.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory for the province map (defaults to ./data).",
+    )
+    return parser
+
+
+def get_preview_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger preview",
+        description="Render a PNG of the map with the states of a merge plan merged. Needs numpy.",
+    )
+    parser.add_argument(
+        "merge_file",
+        help="Path to merge_states.json (merge plan).",
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "output_file",
+        help="Path of the PNG file to write.",
+    )
+    parser.add_argument(
+        "--borders",
+        action="store_true",
+        help="Draw the borders between merged states.",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Size of the preview relative to provinces.png, e.g. 0.25.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory for the province map (defaults to ./data).",
+    )
+    return parser
+
+
+def get_whatif_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger whatif",
+        description=(
+            "Print the totals (provinces, arable land, resources, pops by culture, building levels) of "
+            "the merged states of merge plans without merging. Needs numpy."
+        ),
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "merge_files",
+        nargs="+",
+        help="Paths to merge plans to evaluate.",
+    )
+    parser.add_argument(
+        "--json",
+        dest="json_output",
+        action="store_true",
+        help="Print the totals of each plan as JSON.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory for the per-state totals (defaults to ./data).",
+    )
+    return parser
+
+
 def print_help(parser: Optional[argparse.ArgumentParser] = None) -> None:
     if parser is None:
         parser = get_parser()
@@ -77,6 +452,34 @@ def print_version() -> None:
     print(f"state-merger {__version__}")
 
 
+def print_report(report: dict) -> None:
+    print("Merged states:")
+    for diner, summary in report["states"].items():
+        print(
+            f"  {diner} <- {', '.join(summary['foods'])}: "
+            f"{summary['provinces']} provinces, {summary['pops']} pops, "
+            f"{summary['building_levels']} building levels, {summary['trade_entries']} trade entries"
+        )
+    if "hubs" in report:
+        print("Hubs placed from the map:")
+        for diner, hubs in report["hubs"].items():
+            for attr, hub in hubs.items():
+                print(f"  {diner} {attr}: {hub['province']} from {hub['from']}")
+    print("Script files to rewrite:")
+    for misc_file in report["misc_files"]:
+        print(f"  {misc_file['file']}: {misc_file['changed_lines']} of {misc_file['lines']} lines")
+    print("Map object locators to rewrite:")
+    for map_object in report.get("map_objects", []):
+        print(
+            f"  {map_object['file']}: {map_object['dropped']} dropped, "
+            f"{map_object['reassigned']} reassigned, {map_object['kept']} kept"
+        )
+    print("Localization keys to add:")
+    for lang, keys in report["loc_keys"].items():
+        for key in keys:
+            print(f"  {lang}: {key}")
+
+
 def run_merge(
     merge_file: str,
     mod_dir: str,
@@ -84,9 +487,25 @@ def run_merge(
     data_dir: Optional[str],
     small_state_limit: int,
     ignore_small_states: bool,
-) -> None:
+    dry_run: bool = False,
+    report_file: Optional[str] = None,
+    progress=None,
+    cancel=None,
+    recompute_hubs: bool = False,
+    trait_table: Optional[str] = None,
+    columnar: bool = False,
+    staged: bool = False,
+    jobs: int = 1,
+    emit_workers: int = 1,
+    emit_threshold: Optional[int] = None,
+    game_data: Optional[GameData] = None,
+) -> Optional[dict]:
     with open(merge_file, "r", encoding="utf-8") as file:
         merge_dict = json.load(file)
+    trait_modifiers = None
+    if trait_table:
+        with open(trait_table, "r", encoding="utf-8") as file:
+            trait_modifiers = json.load(file)
 
     resolved_data_dir = data_dir or _default_data_dir(mod_dir)
 
@@ -95,15 +514,547 @@ def run_merge(
         _ensure_trailing_sep(mod_dir),
         merge_dict,
         _ensure_trailing_sep(resolved_data_dir),
+        dry_run=dry_run,
+        game_data=game_data,
+        progress=progress,
+        cancel=cancel,
+        columnar=columnar,
+        staged=staged,
+        jobs=jobs,
+        emit_workers=emit_workers,
+        emit_threshold=emit_threshold,
+    )
+    province_map = None
+    if recompute_hubs:
+        from vic3_state_merger.province_map import ProvinceMap
+
+        province_map = ProvinceMap(game_root, resolved_data_dir)
+    state_merger.merge_state_data(
+        ignoreSmallStates=ignore_small_states,
+        smallStateLimit=small_state_limit,
+        province_map=province_map,
+        trait_table=trait_modifiers,
     )
-    state_merger.merge_state_data(ignoreSmallStates=ignore_small_states, smallStateLimit=small_state_limit)
     state_merger.merge_misc_data()
     state_merger.merge_loc_data()
 
+    if not dry_run:
+        return None
+    if report_file:
+        with open(report_file, "w", encoding="utf-8") as file:
+            json.dump(state_merger.report, file, indent=4, ensure_ascii=False)
+    else:
+        print_report(state_merger.report)
+    return state_merger.report
+
+
+def _game_root_stamp(game_root: str) -> tuple:
+    """Return the modification times of the state, script and localization files of game_root"""
+    stamp = []
+    for value in [*state_file_dir.values(), *replace_file_dir, *remove_file_dir, *loc_file_dir.values()]:
+        directory = os.path.join(game_root, value)
+        if not os.path.isdir(directory):
+            continue
+        for file in sorted(os.listdir(directory)):
+            stamp.append((file, os.path.getmtime(os.path.join(directory, file))))
+    return tuple(stamp)
+
+
+def run_watch(
+    merge_file: str,
+    mod_dir: str,
+    game_root: str,
+    data_dir: Optional[str],
+    small_state_limit: int,
+    ignore_small_states: bool,
+    watch_game_root: bool = False,
+    interval: float = 1.0,
+    columnar: bool = False,
+    dry_run: bool = False,
+    report_file: Optional[str] = None,
+    recompute_hubs: bool = False,
+    trait_table: Optional[str] = None,
+    emit_workers: int = 1,
+    emit_threshold: Optional[int] = None,
+) -> None:
+    """Parse game_root once, then merge again each time merge_file (or the game root) changes"""
+    game_data = GameData(_ensure_trailing_sep(game_root), cache_files=True, columnar=columnar)
+    game_stamp = _game_root_stamp(game_root) if watch_game_root else None
+    plan_stamp = None
+    print(f"Watching {merge_file} for changes, press Ctrl+C to stop")
+    try:
+        while True:
+            try:
+                if watch_game_root:
+                    new_game_stamp = _game_root_stamp(game_root)
+                    if new_game_stamp != game_stamp:
+                        print(f"{game_root} changed, parsing it again")
+                        game_data = GameData(_ensure_trailing_sep(game_root), cache_files=True, columnar=columnar)
+                        game_stamp = new_game_stamp
+                        plan_stamp = None
+                new_plan_stamp = os.path.getmtime(merge_file)
+            except OSError:  # A file is being replaced by an atomic save, look again on the next tick
+                time.sleep(interval)
+                continue
+            if new_plan_stamp != plan_stamp:
+                plan_stamp = new_plan_stamp
+                start = time.perf_counter()
+                try:
+                    _merge_variant(
+                        merge_file,
+                        mod_dir,
+                        game_root,
+                        data_dir,
+                        small_state_limit,
+                        ignore_small_states,
+                        game_data,
+                        dry_run=dry_run,
+                        report_file=report_file,
+                        recompute_hubs=recompute_hubs,
+                        trait_table=trait_table,
+                        emit_workers=emit_workers,
+                        emit_threshold=emit_threshold,
+                    )
+                except Exception as exc:  # Keep watching, the plan may be in the middle of an edit
+                    print(f"Merge failed: {exc!r}")
+                else:
+                    if dry_run:
+                        print(f"Checked {merge_file} in {time.perf_counter() - start:.1f}s, {mod_dir} left untouched")
+                    else:
+                        print(f"Merged {merge_file} into {mod_dir} in {time.perf_counter() - start:.1f}s")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+# Parsed game data of the batch worker processes
+_batch_game_data: Optional[GameData] = None
+
+
+def _init_batch_worker(game_data: GameData) -> None:
+    global _batch_game_data
+    _batch_game_data = game_data
+
+
+def _merge_variant(
+    merge_file: str,
+    mod_dir: str,
+    game_root: str,
+    data_dir: Optional[str],
+    small_state_limit: int,
+    ignore_small_states: bool,
+    game_data: Optional[GameData] = None,
+    **options,
+) -> str:
+    """Merge one plan on a fork of game_data (of the batch worker if None), options are those of run_merge"""
+    run_merge(
+        merge_file,
+        mod_dir,
+        game_root,
+        data_dir,
+        small_state_limit,
+        ignore_small_states,
+        game_data=game_data if game_data is not None else _batch_game_data,
+        **options,
+    )
+    return mod_dir
+
+
+def run_batch(
+    game_root: str,
+    variants: list[tuple[str, str]],
+    data_dir: Optional[str],
+    small_state_limit: int,
+    ignore_small_states: bool,
+    jobs: int = 1,
+    columnar: bool = False,
+    recompute_hubs: bool = False,
+    trait_table: Optional[str] = None,
+) -> None:
+    """Parse game_root once and merge each (merge_file, mod_dir) variant on a fork of the parsed data"""
+    game_data = GameData(_ensure_trailing_sep(game_root), columnar=columnar)
+    options = {"recompute_hubs": recompute_hubs, "trait_table": trait_table}
+    if recompute_hubs:
+        from vic3_state_merger.province_map import ProvinceMap
+
+        # Write the province map cache once, before the variants read it
+        for resolved_data_dir in {data_dir or _default_data_dir(mod_dir) for _, mod_dir in variants}:
+            ProvinceMap(game_root, resolved_data_dir)
+
+    if jobs <= 1 or len(variants) <= 1:
+        for merge_file, mod_dir in variants:
+            _merge_variant(
+                merge_file, mod_dir, game_root, data_dir, small_state_limit, ignore_small_states, game_data, **options
+            )
+            print(f"Finished variant {merge_file} -> {mod_dir}")
+        return
+
+    # Workers receive the parsed data once, when they start
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(variants)),
+        initializer=_init_batch_worker,
+        initargs=(game_data,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _merge_variant,
+                merge_file,
+                mod_dir,
+                game_root,
+                data_dir,
+                small_state_limit,
+                ignore_small_states,
+                **options,
+            )
+            for merge_file, mod_dir in variants
+        ]
+        for (merge_file, mod_dir), future in zip(variants, futures):
+            future.result()
+            print(f"Finished variant {merge_file} -> {mod_dir}")
+
+
+def main_batch(argv: list[str]) -> None:
+    args = get_batch_parser().parse_args(argv)
+    run_batch(
+        game_root=args.game_root,
+        variants=[tuple(variant) for variant in args.variants],
+        data_dir=args.data_dir,
+        small_state_limit=args.small_state_limit,
+        ignore_small_states=args.ignore_small_states,
+        jobs=args.jobs,
+        columnar=args.columnar,
+        recompute_hubs=args.recompute_hubs,
+        trait_table=args.trait_table,
+    )
+
+
+def main_serve(argv: list[str]) -> None:
+    from vic3_state_merger.server import MergeService, serve_http, serve_stdio
+
+    args = get_serve_parser().parse_args(argv)
+    data_dir = args.data_dir or os.path.join(os.getcwd(), "data")
+    if args.stdio:
+        with contextlib.redirect_stdout(sys.stderr):
+            service = MergeService(
+                _ensure_trailing_sep(args.game_root),
+                _ensure_trailing_sep(data_dir),
+                allowed_dirs=args.allow_dirs,
+                columnar=args.columnar,
+            )
+        asyncio.run(serve_stdio(service, workers=args.workers))
+    else:
+        service = MergeService(
+            _ensure_trailing_sep(args.game_root),
+            _ensure_trailing_sep(data_dir),
+            allowed_dirs=args.allow_dirs,
+            columnar=args.columnar,
+        )
+        try:
+            asyncio.run(serve_http(service, host=args.host, port=args.port, workers=args.workers))
+        except KeyboardInterrupt:
+            pass
+
+
+def run_validate(
+    merge_file: str,
+    game_root: str,
+    data_dir: Optional[str],
+    geometry: bool = True,
+) -> list[dict]:
+    from vic3_state_merger.states import States
+    from vic3_state_merger.validate import validate_geometry, validate_plan, validate_provinces
+
+    with open(merge_file, "r", encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    map_data = StateRegion(parse_merge(os.path.join(game_root, state_file_dir["map_data"]), merge_levels=1))
+    # Keep stdout for the issues, States logs each state it formats
+    with contextlib.redirect_stdout(sys.stderr):
+        states = States(parse_merge(os.path.join(game_root, state_file_dir["state"]), merge_levels=2))
+    issues = validate_plan(merge_dict, map_data)
+    issues += validate_provinces(merge_dict, map_data, states)
+    if geometry:
+        try:
+            from vic3_state_merger.province_map import ProvinceMap
+
+            province_map = ProvinceMap(game_root, data_dir or os.path.join(os.getcwd(), "data"))
+        except ImportError as exc:
+            print(f"Skipping the geometry checks: {exc}", file=sys.stderr)
+        else:
+            issues += validate_geometry(merge_dict, map_data, province_map)
+    return issues
+
+
+def main_validate(argv: list[str]) -> None:
+    args = get_validate_parser().parse_args(argv)
+    issues = run_validate(args.merge_file, args.game_root, args.data_dir, geometry=args.geometry)
+    if args.json_output:
+        print(json.dumps(issues, indent=4, ensure_ascii=False))
+    else:
+        for plan_issue in issues:
+            print(f"{plan_issue['level']}: {plan_issue['state']}: {plan_issue['message']}")
+        errors = sum(1 for plan_issue in issues if plan_issue["level"] == "error")
+        print(f"{errors} errors, {len(issues) - errors} warnings")
+    if any(plan_issue["level"] == "error" for plan_issue in issues):
+        sys.exit(1)
+
+
+def run_generate(
+    game_root: str,
+    output_file: str,
+    data_dir: Optional[str],
+    small_state_limit: int = 4,
+    max_provinces: Optional[int] = None,
+    max_pops: Optional[int] = None,
+) -> dict:
+    from vic3_state_merger.generate import generate_plan
+    from vic3_state_merger.pops import Pops
+    from vic3_state_merger.province_map import ProvinceMap
+
+    map_data = StateRegion(parse_merge(os.path.join(game_root, state_file_dir["map_data"]), merge_levels=1))
+    province_map = ProvinceMap(game_root, data_dir or os.path.join(os.getcwd(), "data"))
+    pop_size = None
+    if max_pops is not None:
+        pops = Pops(parse_merge(os.path.join(game_root, state_file_dir["pops"]), merge_levels=2))
+        pop_size = {state: pops.size_cnt("s:" + state) for state in map_data}
+    plan = generate_plan(
+        map_data,
+        province_map.state_adjacency(map_data),
+        read_strategic_regions(game_root),
+        small_state_limit=small_state_limit,
+        max_provinces=max_provinces,
+        pop_size=pop_size,
+        max_pops=max_pops,
+    )
+    if os.path.dirname(output_file) and not os.path.exists(os.path.dirname(output_file)):
+        os.makedirs(os.path.dirname(output_file))
+    with open(output_file, "w", encoding="utf-8") as file:
+        json.dump(plan, file, indent=4)
+    merged = sum(len(food_list) for food_list in plan.values())
+    print(f"Wrote {output_file}: {merged} states merged, {len(plan)} states left")
+    return plan
+
+
+def main_generate(argv: list[str]) -> None:
+    args = get_generate_parser().parse_args(argv)
+    run_generate(
+        game_root=args.game_root,
+        output_file=args.output_file,
+        data_dir=args.data_dir,
+        small_state_limit=args.small_state_limit,
+        max_provinces=args.max_provinces,
+        max_pops=args.max_pops,
+    )
+
+
+def get_export_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="state-merger export",
+        description=(
+            "Merge the state data of a plan in memory and write it as tables (state regions, provinces, "
+            "resources, pops, buildings, ownership, homelands, claims, trade) for analysis."
+        ),
+    )
+    parser.add_argument(
+        "merge_file",
+        help="Path to merge_states.json (merge plan).",
+    )
+    parser.add_argument(
+        "game_root",
+        help="Victoria 3 game root directory.",
+    )
+    parser.add_argument(
+        "output_dir",
+        help="Directory to write the tables to.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dir",
+        default=None,
+        help="Cache/data directory (defaults to sibling of output_dir).",
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        nargs="+",
+        choices=["csv", "npz", "parquet"],
+        default=None,
+        help="Formats to write (default: csv, plus npz with numpy and parquet with pyarrow installed).",
+    )
+    parser.add_argument(
+        "--small-state-limit",
+        type=int,
+        default=4,
+        help="Limit for small states when merging.",
+    )
+    parser.add_argument(
+        "--ignore-small-states",
+        dest="ignore_small_states",
+        action="store_true",
+        help="Ignore small states when merging.",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Merge the pops and the trade as numpy columns (needs numpy).",
+    )
+    return parser
+
+
+def run_export(
+    merge_file: str,
+    game_root: str,
+    output_dir: str,
+    data_dir: Optional[str] = None,
+    formats: Optional[list[str]] = None,
+    small_state_limit: int = 4,
+    ignore_small_states: bool = False,
+    columnar: bool = False,
+) -> dict:
+    from vic3_state_merger.export import export_tables
+
+    with open(merge_file, "r", encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    resolved_data_dir = data_dir or _default_data_dir(output_dir)
+
+    state_merger = StateMerger(
+        _ensure_trailing_sep(game_root),
+        "",
+        merge_dict,
+        _ensure_trailing_sep(resolved_data_dir),
+        dry_run=True,
+        columnar=columnar,
+    )
+    state_merger.merge_state_data(ignoreSmallStates=ignore_small_states, smallStateLimit=small_state_limit)
+    return export_tables(
+        state_merger.map_data,
+        state_merger.buildings,
+        state_merger.pops,
+        state_merger.states,
+        state_merger.trade,
+        output_dir,
+        formats,
+    )
+
+
+def main_export(argv: list[str]) -> None:
+    args = get_export_parser().parse_args(argv)
+    counts = run_export(
+        args.merge_file,
+        args.game_root,
+        args.output_dir,
+        data_dir=args.data_dir,
+        formats=args.formats,
+        small_state_limit=args.small_state_limit,
+        ignore_small_states=args.ignore_small_states,
+        columnar=args.columnar,
+    )
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+    print(f"Wrote {len(counts)} tables to {args.output_dir}")
+
+
+def run_preview(
+    merge_file: str,
+    game_root: str,
+    output_file: str,
+    data_dir: Optional[str],
+    borders: bool = False,
+    scale: float = 1.0,
+) -> None:
+    from vic3_state_merger.preview import PreviewData, render_preview
+    from vic3_state_merger.province_map import ProvinceMap
+
+    with open(merge_file, "r", encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    data_dir = data_dir or os.path.join(os.getcwd(), "data")
+    province_map = ProvinceMap(game_root, data_dir)
+    image = render_preview(province_map, PreviewData(game_root, province_map, data_dir), merge_dict, borders, scale)
+    if os.path.dirname(output_file) and not os.path.exists(os.path.dirname(output_file)):
+        os.makedirs(os.path.dirname(output_file))
+    image.save(output_file)
+    print(f"Wrote {output_file} ({image.width}x{image.height})")
+
+
+def main_preview(argv: list[str]) -> None:
+    args = get_preview_parser().parse_args(argv)
+    run_preview(args.merge_file, args.game_root, args.output_file, args.data_dir, args.borders, args.scale)
+
+
+def run_whatif(game_root: str, merge_files: list[str], data_dir: Optional[str]) -> dict:
+    from vic3_state_merger.whatif import WhatIf
+
+    # Keep stdout for the totals, the parsers log what they read
+    with contextlib.redirect_stdout(sys.stderr):
+        what_if = WhatIf(game_root, data_dir or os.path.join(os.getcwd(), "data"))
+    results = {}
+    for merge_file in merge_files:
+        with open(merge_file, "r", encoding="utf-8") as file:
+            results[merge_file] = what_if.evaluate(json.load(file))
+    return results
+
+
+def main_whatif(argv: list[str]) -> None:
+    args = get_whatif_parser().parse_args(argv)
+    results = run_whatif(args.game_root, args.merge_files, args.data_dir)
+    if args.json_output:
+        print(json.dumps(results, indent=4, ensure_ascii=False))
+        return
+    for merge_file, totals in results.items():
+        print(f"{merge_file}: {len(totals)} merged states")
+        for diner, state_totals in totals.items():
+            cultures = sorted(
+                ((column[len("culture:"):], value) for column, value in state_totals.items() if column.startswith("culture:")),
+                key=lambda item: -item[1],
+            )
+            print(
+                f"    {diner}: {state_totals['provinces']} provinces, {state_totals['arable_land']} arable land, "
+                f"{state_totals['pops']} pops ({', '.join(f'{culture} {size}' for culture, size in cultures[:3])}), "
+                f"{state_totals['building_levels']} building levels"
+            )
+
+
+commands = {
+    "batch": main_batch,
+    "serve": main_serve,
+    "validate": main_validate,
+    "generate": main_generate,
+    "preview": main_preview,
+    "export": main_export,
+    "whatif": main_whatif,
+}
+
 
-def main() -> None:
+def main(argv: Optional[list[str]] = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in commands:
+        commands[argv[0]](argv[1:])
+        return
     parser = get_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.report_file is not None and not args.dry_run:
+        parser.error("--report requires --dry-run")
+    if args.watch and (args.staged or args.jobs > 1):
+        parser.error("--watch keeps the parsed game data in memory and cannot be combined with --staged or --jobs")
+    if args.watch:
+        run_watch(
+            merge_file=args.merge_file,
+            mod_dir=args.mod_dir,
+            game_root=args.game_root,
+            data_dir=args.data_dir,
+            small_state_limit=args.small_state_limit,
+            ignore_small_states=args.ignore_small_states,
+            watch_game_root=args.watch_game_root,
+            interval=args.watch_interval,
+            columnar=args.columnar,
+            dry_run=args.dry_run,
+            report_file=args.report_file,
+            recompute_hubs=args.recompute_hubs,
+            trait_table=args.trait_table,
+            emit_workers=args.emit_workers,
+            emit_threshold=args.emit_threshold,
+        )
+        return
     run_merge(
         merge_file=args.merge_file,
         mod_dir=args.mod_dir,
@@ -111,4 +1062,13 @@ def main() -> None:
         data_dir=args.data_dir,
         small_state_limit=args.small_state_limit,
         ignore_small_states=args.ignore_small_states,
+        dry_run=args.dry_run,
+        report_file=args.report_file,
+        recompute_hubs=args.recompute_hubs,
+        trait_table=args.trait_table,
+        columnar=args.columnar,
+        staged=args.staged,
+        jobs=args.jobs,
+        emit_workers=args.emit_workers,
+        emit_threshold=args.emit_threshold,
     )
\ No newline at end of file
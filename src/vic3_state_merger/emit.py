@@ -0,0 +1,73 @@
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Fewer states than this are formatted in this process, a process pool does not pay off for them
+default_threshold = 500
+# Chunks of states handed to each worker process
+chunks_per_worker = 4
+
+# States being written, set in each worker process of a forked pool by _init_worker
+_items = None
+
+
+def _init_worker(items:list):
+    global _items
+    _items = items
+
+
+def _format_range(format_state, start:int, end:int) -> str:
+    return "".join(format_state(state_id, value) for state_id, value in _items[start:end])
+
+
+def _format_chunk(format_state, chunk:list) -> str:
+    return "".join(format_state(state_id, value) for state_id, value in chunk)
+
+
+def write_states(file, items:list, format_state, workers:int=1, threshold:int|None=None, on_state=None):
+    """Write format_state(state_id, value) for each (state_id, value) of items to file, in order.
+    With workers above 1 and at least threshold items (default_threshold if None), chunks of items
+    are formatted in a pool of worker processes and written in their original order, so the file
+    is the same as when formatted here. On Linux in a single-threaded process, the workers are
+    forked and inherit items, and only the bounds of their chunk are sent to them; elsewhere
+    (forking is unsafe on macOS and with other threads running) they are started by a fork server
+    where available and the chunks are pickled.
+    format_state must be a module-level function so that it can be sent to the workers.
+    on_state is called with each state_id as it is written."""
+    if threshold is None:
+        threshold = default_threshold
+    if workers <= 1 or len(items) < max(threshold, 1):
+        for state_id, value in items:
+            if on_state is not None:
+                on_state(state_id)
+            file.write(format_state(state_id, value))
+        return
+
+    step = -(-len(items) // (workers * chunks_per_worker))
+    starts = list(range(0, len(items), step))
+    ends = [min(start + step, len(items)) for start in starts]
+    fork = sys.platform.startswith("linux") and threading.active_count() == 1
+    if fork:
+        context = multiprocessing.get_context("fork")
+    elif "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+    else:
+        context = None
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(starts)),
+        mp_context=context,
+        initializer=_init_worker if fork else None,
+        initargs=(items,) if fork else (),
+    ) as executor:
+        if fork:
+            texts = executor.map(_format_range, [format_state] * len(starts), starts, ends)
+        else:
+            texts = executor.map(
+                _format_chunk, [format_state] * len(starts), [items[start:end] for start, end in zip(starts, ends)]
+            )
+        for start, end, text in zip(starts, ends, texts):
+            if on_state is not None:
+                for state_id, _ in items[start:end]:
+                    on_state(state_id)
+            file.write(text)
@@ -0,0 +1,340 @@
+import csv
+import os
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet is only written if pyarrow is installed
+    pyarrow = None
+
+# Rows buffered before a Parquet row group is written
+batch_rows = 65536
+
+
+def state_name(state_id:str) -> str:
+    """Return the state region name of a "s:STATE_X" id, so that all the tables join on STATE_X"""
+    return state_id[2:] if state_id.startswith("s:") else state_id
+
+
+def amount(value) -> int|float:
+    """Return a number of the game files as an int, or a float if it has decimals"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0
+
+
+# Columns of each table, with the type of their values: "str", "int", "float" or "bool"
+tables = {
+    "state_regions": [
+        ("state", "str"),
+        ("id", "int"),
+        ("is_sea", "bool"),
+        ("provinces", "int"),
+        ("subsistence_building", "str"),
+        ("city", "str"),
+        ("port", "str"),
+        ("farm", "str"),
+        ("mine", "str"),
+        ("wood", "str"),
+        ("arable_land", "int"),
+        ("naval_exit_id", "int"),
+        ("traits", "str"),
+        ("arable_resources", "str"),
+    ],
+    "state_provinces": [
+        ("state", "str"),
+        ("province", "str"),
+        ("impassable", "bool"),
+        ("prime_land", "bool"),
+    ],
+    "state_resources": [
+        ("state", "str"),
+        ("resource", "str"),
+        ("kind", "str"),
+        ("amount", "int"),
+    ],
+    "pops": [
+        ("state", "str"),
+        ("region_state", "str"),
+        ("culture", "str"),
+        ("religion", "str"),
+        ("pop_type", "str"),
+        ("size", "int"),
+    ],
+    "buildings": [
+        ("state", "str"),
+        ("region_state", "str"),
+        ("building", "str"),
+        ("ownership", "str"),
+        ("type", "str"),
+        ("country", "str"),
+        ("region", "str"),
+        ("levels", "int"),
+        ("reserves", "int"),
+    ],
+    "ownership": [
+        ("state", "str"),
+        ("country", "str"),
+        ("province", "str"),
+        ("state_type", "str"),
+    ],
+    "homelands": [
+        ("state", "str"),
+        ("culture", "str"),
+    ],
+    "claims": [
+        ("state", "str"),
+        ("country", "str"),
+    ],
+    "trade": [
+        ("state", "str"),
+        ("region_state", "str"),
+        ("good", "str"),
+        ("exports", "float"),
+        ("imports", "float"),
+    ],
+}
+
+
+def state_region_rows(map_data_dict:dict):
+    """Yield the state_regions rows of StateRegion.to_python()"""
+    for state, state_dict in map_data_dict.items():
+        is_sea = "subsistence_building" not in state_dict
+        yield (
+            state,
+            state_dict["id"],
+            is_sea,
+            len(state_dict["provinces"]),
+            state_dict.get("subsistence_building", ""),
+            state_dict.get("city", ""),
+            state_dict.get("port", ""),
+            state_dict.get("farm", ""),
+            state_dict.get("mine", ""),
+            state_dict.get("wood", ""),
+            state_dict.get("arable_land", 0),
+            state_dict.get("naval_exit_id", -1),
+            ";".join(state_dict.get("traits", [])),
+            ";".join(state_dict.get("arable_resources", [])),
+        )
+
+
+def state_province_rows(map_data_dict:dict):
+    """Yield the state_provinces rows of StateRegion.to_python()"""
+    for state, state_dict in map_data_dict.items():
+        impassable = set(state_dict.get("impassable", []))
+        prime_land = set(state_dict.get("prime_land", []))
+        for province in state_dict["provinces"]:
+            yield state, province, province in impassable, province in prime_land
+
+
+def state_resource_rows(map_data_dict:dict):
+    """Yield the state_resources rows of StateRegion.to_python(): the capped resources, and the
+    undiscovered and discovered amounts of the other resources"""
+    for state, state_dict in map_data_dict.items():
+        for resource, value in state_dict.get("capped_resources", {}).items():
+            yield state, resource, "capped", amount(value)
+        for resource in state_dict.get("resource", []):
+            for kind in ("undiscovered", "discovered"):
+                if f"{kind}_amount" in resource:
+                    yield state, resource["type"], kind, amount(resource[f"{kind}_amount"])
+
+
+def pop_rows(pops_dict:dict):
+    """Yield the pops rows of Pops.to_python()"""
+    for state_id, state_pops in pops_dict.items():
+        for tag, tag_pops in state_pops.items():
+            for pop in tag_pops["create_pop"]:
+                yield (
+                    state_name(state_id),
+                    tag,
+                    pop.get("culture", ""),
+                    pop.get("religion", ""),
+                    pop.get("pop_type", ""),
+                    amount(pop.get("size", 0)),
+                )
+
+
+def building_rows(buildings_dict:dict):
+    """Yield the buildings rows of Buildings.to_python(), one per ownership, the dlc buildings
+    excepted"""
+    for state_id, state_buildings in buildings_dict.items():
+        if state_id == "if":
+            continue
+        for tag, tag_buildings in state_buildings.items():
+            for building in tag_buildings:
+                if not building:
+                    continue
+                if "level" in building:
+                    yield state_name(state_id), tag, building["building"], "monument", "", "", "", 1, 0
+                    continue
+                for kind, ownerships in building["add_ownership"].items():
+                    for ownership in ownerships:
+                        yield (
+                            state_name(state_id),
+                            tag,
+                            building["building"],
+                            kind,
+                            ownership.get("type", ""),
+                            ownership.get("country", ""),
+                            str(ownership.get("region", "")).strip('"'),
+                            amount(ownership.get("levels", 0)),
+                            amount(building["reserves"]),
+                        )
+
+
+def ownership_rows(states_dict:dict):
+    """Yield the ownership rows of States.to_python(), one per owned province"""
+    for state_id, state in states_dict.items():
+        for create_state in state.get("create_state", []):
+            state_type = ";".join(create_state.get("state_type", []))
+            for province in create_state.get("owned_provinces", []):
+                yield state_name(state_id), create_state.get("country", ""), province, state_type
+
+
+def homeland_rows(states_dict:dict):
+    for state_id, state in states_dict.items():
+        for culture in state.get("add_homeland", []):
+            yield state_name(state_id), culture
+
+
+def claim_rows(states_dict:dict):
+    for state_id, state in states_dict.items():
+        for country in state.get("add_claim", []):
+            yield state_name(state_id), country
+
+
+def trade_rows(trade_dict:dict):
+    """Yield the trade rows of Trade.to_python()"""
+    for state_id, state_trade in trade_dict.items():
+        for region_state, trade_data in state_trade.items():
+            if not isinstance(trade_data, dict):
+                continue
+            for trade_good, good_data in trade_data.items():
+                if not isinstance(good_data, dict):
+                    continue
+                yield (
+                    state_name(state_id),
+                    region_state,
+                    trade_good,
+                    amount(good_data.get("add_exports", 0)),
+                    amount(good_data.get("add_imports", 0)),
+                )
+
+
+def available_formats() -> list[str]:
+    """Return the export formats whose libraries are installed"""
+    formats = ["csv"]
+    if np is not None:
+        formats.append("npz")
+    if pyarrow is not None:
+        formats.append("parquet")
+    return formats
+
+
+class TableWriter:
+    """Write the rows of a table to out_dir/<name>.<format> for each format, as they come.
+    CSV rows are written one by one and Parquet rows by row groups of batch_rows; a .npz file
+    holds one array per column, written once the table is complete since the .npy header of a
+    column gives its length and string width before any value."""
+
+    def __init__(self, out_dir:str, name:str, formats:list[str]):
+        self.columns = tables[name]
+        self.paths = {}
+        self.csv_file = None
+        self.npz_columns = None
+        self.parquet_writer = None
+        self.batch = []
+        if "csv" in formats:
+            self.paths["csv"] = os.path.join(out_dir, f"{name}.csv")
+            self.csv_file = open(self.paths["csv"], "w", encoding="utf-8", newline="")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow([column for column, _ in self.columns])
+        if "npz" in formats:
+            self.paths["npz"] = os.path.join(out_dir, f"{name}.npz")
+            self.npz_columns = [[] for _ in self.columns]
+        if "parquet" in formats:
+            self.paths["parquet"] = os.path.join(out_dir, f"{name}.parquet")
+            types = {"str": pyarrow.string(), "int": pyarrow.int64(), "float": pyarrow.float64(), "bool": pyarrow.bool_()}
+            self.parquet_schema = pyarrow.schema([(column, types[kind]) for column, kind in self.columns])
+            self.parquet_writer = pyarrow.parquet.ParquetWriter(self.paths["parquet"], self.parquet_schema)
+
+    def write(self, row:tuple):
+        if self.csv_file is not None:
+            self.csv_writer.writerow(row)
+        if self.npz_columns is not None:
+            for values, value in zip(self.npz_columns, row):
+                values.append(value)
+        if self.parquet_writer is not None:
+            self.batch.append(row)
+            if len(self.batch) >= batch_rows:
+                self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.parquet_writer.write_batch(
+                pyarrow.record_batch([list(values) for values in zip(*self.batch)], schema=self.parquet_schema)
+            )
+            self.batch = []
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+        if self.npz_columns is not None:
+            dtypes = {"str": str, "int": np.int64, "float": np.float64, "bool": bool}
+            np.savez_compressed(
+                self.paths["npz"],
+                **{
+                    column: np.array(values, dtype=dtypes[kind])
+                    for (column, kind), values in zip(self.columns, self.npz_columns)
+                },
+            )
+            self.npz_columns = None
+        if self.parquet_writer is not None:
+            self.flush()
+            self.parquet_writer.close()
+
+
+def export_tables(map_data, buildings, pops, states, trade, out_dir:str, formats:list[str]|None=None) -> dict[str, int]:
+    """Write the tables of the merged data to out_dir, one subsystem at a time, through its
+    to_python method. Return the number of rows of each table."""
+    if formats is None:
+        formats = available_formats()
+    for format in formats:
+        if format not in ("csv", "npz", "parquet"):
+            raise ValueError(f"Unknown export format: {format}")
+        if format == "npz" and np is None:
+            raise ImportError("numpy is required for the .npz export, install it with: pip install vic3-state-merger[numpy]")
+        if format == "parquet" and pyarrow is None:
+            raise ImportError("pyarrow is required for the Parquet export, install it with: pip install pyarrow")
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    sources = [
+        (map_data, [("state_regions", state_region_rows), ("state_provinces", state_province_rows), ("state_resources", state_resource_rows)]),
+        (pops, [("pops", pop_rows)]),
+        (buildings, [("buildings", building_rows)]),
+        (states, [("ownership", ownership_rows), ("homelands", homeland_rows), ("claims", claim_rows)]),
+        (trade, [("trade", trade_rows)]),
+    ]
+    counts = {}
+    for subsystem, subsystem_tables in sources:
+        data = subsystem.to_python()
+        for name, rows in subsystem_tables:
+            writer = TableWriter(out_dir, name, formats)
+            count = 0
+            for row in rows(data):
+                writer.write(row)
+                count += 1
+            writer.close()
+            counts[name] = count
+        del data
+    return counts
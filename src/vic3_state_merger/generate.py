@@ -0,0 +1,86 @@
+import heapq
+
+from vic3_state_merger.state_regions import StateRegion
+
+
+def generate_plan(
+    map_data:StateRegion,
+    adjacency:dict[str, set[str]],
+    region_of:dict[str, str],
+    small_state_limit:int=4,
+    max_provinces:int|None=None,
+    pop_size:dict[str, int]|None=None,
+    max_pops:int|None=None,
+) -> dict[str, list[str]]:
+    """Return a merge plan merging every small state into its largest adjacent neighbour of the
+    same strategic region.
+    adjacency: states sharing a border with each state, see ProvinceMap.state_adjacency
+    region_of: strategic region of each state, see read_strategic_regions; states in none are
+        left alone
+    max_provinces, max_pops: caps on the province count and pop total of a merged state
+    pop_size: pop total of each state, required by max_pops
+
+    The smallest group is always merged first, so a group of small states can grow into a state
+    that is no longer small. Groups are kept in a union-find forest whose roots hold the province
+    count, pop total and neighbouring groups of the whole group.
+    The plan lists every land state of map_data, in order, with the states merged into it.
+    """
+    land = [state for state, item in map_data.items() if not item.is_sea_node()]
+    parent = {state: state for state in land}
+    provinces = {state: map_data[state].province_cnt() for state in land}
+    pops = {state: (pop_size or {}).get(state, 0) for state in land}
+    neighbors = {
+        state: {neighbor for neighbor in adjacency.get(state, ()) if neighbor in parent} for state in land
+    }
+    members = {state: [state] for state in land}
+
+    def find(state:str) -> str:
+        root = state
+        while parent[root] != root:
+            root = parent[root]
+        while parent[state] != root:
+            parent[state], state = root, parent[state]
+        return root
+
+    heap = [(provinces[state], state) for state in land if map_data[state].is_small_state(small_state_limit)]
+    heapq.heapify(heap)
+    while heap:
+        size, root = heapq.heappop(heap)
+        if find(root) != root or provinces[root] != size:
+            # Merged into another group, or grown since it was pushed
+            continue
+        if size >= small_state_limit:
+            continue
+        region = region_of.get(root)
+        if region is None:
+            # In no strategic region, so in the same one as no neighbour
+            continue
+        best = None
+        for neighbor in {find(neighbor) for neighbor in neighbors[root]}:
+            if neighbor == root or region_of.get(neighbor) != region:
+                continue
+            if max_provinces is not None and provinces[root] + provinces[neighbor] > max_provinces:
+                continue
+            if max_pops is not None and pops[root] + pops[neighbor] > max_pops:
+                continue
+            if best is None or (provinces[neighbor], neighbor) > (provinces[best], best):
+                best = neighbor
+        if best is None:
+            continue
+        if provinces[best] < provinces[root]:
+            # The larger group stays the diner
+            root, best = best, root
+        # Merge the group of root into the group of best
+        parent[root] = best
+        provinces[best] += provinces[root]
+        pops[best] += pops[root]
+        members[best] += members.pop(root)
+        neighbors[best] |= neighbors.pop(root)
+        if provinces[best] < small_state_limit:
+            heapq.heappush(heap, (provinces[best], best))
+
+    plan = {}
+    for state in land:
+        if find(state) == state:
+            plan[state] = members[state][1:]
+    return plan
@@ -1,8 +1,47 @@
-import threading
+import contextlib
+import multiprocessing
+import os
+import queue
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
 from vic3_state_merger.cli import _default_data_dir, run_merge
+from vic3_state_merger.progress import ProgressEvent, ProgressTracker, load_timings, save_timings
+
+# Milliseconds between two refreshes of the progress widgets
+POLL_INTERVAL = 100
+# Log lines added to the log panel per refresh, and kept in it
+LOG_LINES_PER_POLL = 200
+LOG_LINES_KEPT = 2000
+
+
+class _LogWriter:
+    """File-like object turning the lines printed by the merge into log events"""
+
+    def __init__(self, events):
+        self.events = events
+        self.buffer = ""
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self.events.put(ProgressEvent("log", "", message=line))
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _merge_process(events, merge_kwargs: dict) -> None:
+    """Run a merge in the worker process, sending its events and outcome to the GUI over events"""
+    try:
+        with contextlib.redirect_stdout(_LogWriter(events)):
+            run_merge(**merge_kwargs, progress=events.put)
+    except Exception as exc:
+        events.put(("failed", f"{type(exc).__name__}: {exc}"))
+    else:
+        events.put(("completed", ""))
 
 
 def _browse_file(var: tk.StringVar) -> None:
@@ -31,6 +70,9 @@ def _build_help_text() -> str:
         "- Ignore small states: If enabled, small states are ignored when merging.\n\n"
         "Run:\n"
         "- Click Run to execute the merge with the provided settings.\n"
+        "- The progress bar and the log follow the merge. The remaining time is estimated\n"
+        "  from the previous run with the same mod output folder.\n"
+        "- Click Cancel to stop the merge at once. The mod output folder may then be incomplete.\n"
     )
 
 
@@ -55,11 +97,20 @@ def _validate_inputs(
     return True, ""
 
 
+def _format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"About {minutes}:{seconds:02d} left"
+
+
 def main() -> None:
+    # The merge worker process starts this executable again in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
     root = tk.Tk()
     root.title("State Merger")
-    root.geometry("640x420")
-    root.minsize(640, 420)
+    root.geometry("720x600")
+    root.minsize(640, 520)
 
     notebook = ttk.Notebook(root)
     main_tab = ttk.Frame(notebook, padding=12)
@@ -74,6 +125,8 @@ def main() -> None:
     small_state_limit_var = tk.StringVar(value="4")
     ignore_small_states_var = tk.BooleanVar(value=False)
     status_var = tk.StringVar(value="Idle")
+    eta_var = tk.StringVar(value="")
+    progress_var = tk.DoubleVar(value=0.0)
 
     main_tab.columnconfigure(1, weight=1)
 
@@ -110,18 +163,51 @@ def main() -> None:
     ignore_checkbox.grid(row=4, column=0, columnspan=2, sticky="w", pady=(8, 0))
 
     status_label = ttk.Label(main_tab, textvariable=status_var)
-    status_label.grid(row=5, column=0, columnspan=3, sticky="w", pady=(12, 0))
+    status_label.grid(row=5, column=0, columnspan=2, sticky="w", pady=(12, 0))
+    eta_label = ttk.Label(main_tab, textvariable=eta_var)
+    eta_label.grid(row=5, column=2, sticky="e", pady=(12, 0))
 
-    run_button = ttk.Button(main_tab, text="Run")
-    run_button.grid(row=6, column=0, pady=(16, 0), sticky="w")
+    progress_bar = ttk.Progressbar(main_tab, mode="determinate", maximum=100.0, variable=progress_var)
+    progress_bar.grid(row=6, column=0, columnspan=3, sticky="ew", pady=(4, 0))
+
+    button_frame = ttk.Frame(main_tab)
+    button_frame.grid(row=7, column=0, columnspan=3, pady=(12, 0), sticky="w")
+    run_button = ttk.Button(button_frame, text="Run")
+    run_button.pack(side="left")
+    cancel_button = ttk.Button(button_frame, text="Cancel", state="disabled")
+    cancel_button.pack(side="left", padx=(8, 0))
+
+    log_frame = ttk.Frame(main_tab)
+    log_frame.grid(row=8, column=0, columnspan=3, sticky="nsew", pady=(12, 0))
+    main_tab.rowconfigure(8, weight=1)
+    log_text = tk.Text(log_frame, wrap="none", height=10, state="disabled")
+    log_scroll = ttk.Scrollbar(log_frame, orient="vertical", command=log_text.yview)
+    log_text.configure(yscrollcommand=log_scroll.set)
+    log_scroll.pack(side="right", fill="y")
+    log_text.pack(side="left", fill="both", expand=True)
 
     help_text = tk.Text(help_tab, wrap="word", height=10)
     help_text.insert("1.0", _build_help_text())
     help_text.configure(state="disabled")
     help_text.pack(fill="both", expand=True)
 
+    # The merge runs in a worker process so that it does not hold the GIL of the Tk loop.
+    # Its progress events and final outcome come back over a queue read by _poll.
+    context = multiprocessing.get_context("spawn")
+    worker = {"process": None, "events": None}
+
+    def _append_log(lines: list[str]) -> None:
+        log_text.configure(state="normal")
+        log_text.insert("end", "\n".join(lines) + "\n")
+        excess = int(log_text.index("end-1c").split(".")[0]) - LOG_LINES_KEPT
+        if excess > 0:
+            log_text.delete("1.0", f"{excess + 1}.0")
+        log_text.see("end")
+        log_text.configure(state="disabled")
+
     def _set_running(is_running: bool) -> None:
         state = "disabled" if is_running else "normal"
+        cancel_button.configure(state="normal" if is_running else "disabled")
         run_button.configure(state=state)
         merge_entry.configure(state=state)
         game_root_entry.configure(state=state)
@@ -144,33 +230,106 @@ def main() -> None:
             messagebox.showerror("Invalid input", error_message)
             return
 
+        data_dir = _default_data_dir(mod_dir)
+        timings_file = os.path.join(data_dir, "timings.json")
+        tracker = ProgressTracker(load_timings(timings_file))
         status_var.set("Running...")
+        eta_var.set("")
+        progress_var.set(0.0)
+        log_text.configure(state="normal")
+        log_text.delete("1.0", "end")
+        log_text.configure(state="disabled")
         _set_running(True)
 
-        def _worker() -> None:
-            try:
-                limit = int(small_state_limit)
-                data_dir = _default_data_dir(mod_dir)
-                run_merge(
-                    merge_file=merge_file,
-                    mod_dir=mod_dir,
-                    game_root=game_root,
-                    data_dir=data_dir,
-                    small_state_limit=limit,
-                    ignore_small_states=ignore_small_states_var.get(),
-                )
-            except Exception as exc:  # pragma: no cover - UI error display
-                root.after(0, lambda: messagebox.showerror("Merge failed", str(exc)))
-                root.after(0, lambda: status_var.set("Failed"))
+        events = context.Queue()
+        process = context.Process(
+            target=_merge_process,
+            args=(
+                events,
+                {
+                    "merge_file": merge_file,
+                    "mod_dir": mod_dir,
+                    "game_root": game_root,
+                    "data_dir": data_dir,
+                    "small_state_limit": int(small_state_limit),
+                    "ignore_small_states": ignore_small_states_var.get(),
+                },
+            ),
+            daemon=True,
+        )
+
+        def _poll() -> None:
+            if worker["process"] is not process:
+                # The merge was cancelled
+                return
+            log_lines = []
+            outcome = None
+            while len(log_lines) < LOG_LINES_PER_POLL:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    if not process.is_alive() and events.empty():
+                        outcome = ("failed", f"The merge process exited with code {process.exitcode}")
+                    break
+                if isinstance(event, tuple):
+                    outcome = event
+                    break
+                tracker.update(event)
+                if event.kind == "log":
+                    log_lines.append(event.message)
+                elif event.kind == "phase_start":
+                    status_var.set(f"Running: {event.phase}")
+            if log_lines:
+                _append_log(log_lines)
+            progress_var.set(tracker.overall() * 100.0)
+            eta_var.set(_format_eta(tracker.remaining()))
+            if outcome is None:
+                root.after(POLL_INTERVAL, _poll)
+                return
+
+            status, message = outcome
+            worker["process"] = None
+            process.join()
+            eta_var.set("")
+            if status == "completed":
+                progress_var.set(100.0)
+                status_var.set("Completed")
+                try:
+                    save_timings(timings_file, tracker.timings)
+                except OSError:
+                    pass
             else:
-                root.after(0, lambda: status_var.set("Completed"))
-            finally:
-                root.after(0, lambda: _set_running(False))
+                status_var.set("Failed")
+                messagebox.showerror("Merge failed", message)
+            _set_running(False)
 
-        threading.Thread(target=_worker, daemon=True).start()
+        worker["process"] = process
+        worker["events"] = events
+        process.start()
+        root.after(POLL_INTERVAL, _poll)
+
+    def _cancel_merge() -> None:
+        process = worker["process"]
+        if process is None:
+            return
+        worker["process"] = None
+        process.terminate()
+        process.join()
+        worker["events"].close()
+        eta_var.set("")
+        status_var.set("Cancelled")
+        _append_log(["Merge cancelled, the mod output folder may be incomplete."])
+        _set_running(False)
 
     run_button.configure(command=_run_merge)
+    cancel_button.configure(command=_cancel_merge)
+
+    def _close() -> None:
+        if worker["process"] is not None:
+            worker["process"].terminate()
+        root.destroy()
 
+    root.protocol("WM_DELETE_WINDOW", _close)
     root.mainloop()
 
 
@@ -0,0 +1,58 @@
+from vic3_state_merger.province_map import ProvinceMap, normalize_province, require_numpy
+from vic3_state_merger.state_regions import StateRegion, merge_groups
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
+hub_attrs = ["city", "port", "farm", "mine", "wood"]
+
+
+def hub_candidates(map_data:StateRegion, merge_dict:dict) -> dict[str, dict[str, list[tuple[str, str]]]]:
+    """Return the hubs of the states of each diner group, as (state, province) pairs per hub
+    attribute. Ports are only listed if their state has the naval exit the merged state keeps, and
+    hubs only if the province index of map_data puts their province in their state.
+    map_data must not be merged yet. The groups follow chained plans, see merge_groups."""
+    candidates = {}
+    for diner, group in merge_groups(merge_dict, map_data).items():
+        naval_exit_id = next(
+            (map_data[state].naval_exit_id for state in group if map_data[state].naval_exit_id != -1), -1
+        )
+        candidates[diner] = {}
+        for attr in hub_attrs:
+            candidates[diner][attr] = [
+                (state, getattr(map_data[state], attr))
+                for state in group
+                if getattr(map_data[state], attr) != ""
+                and (attr != "port" or map_data[state].naval_exit_id == naval_exit_id)
+                and map_data.state_of(getattr(map_data[state], attr)) == state
+            ]
+    return candidates
+
+
+def place_hubs(map_data:StateRegion, candidates:dict, province_map:ProvinceMap) -> dict[str, dict[str, str]]:
+    """Move the hubs of each merged state to the candidate closest to the centroid of the merged
+    state, weighting each province by its area in provinces.png. Return the state each chosen hub
+    comes from, by diner and hub attribute."""
+    require_numpy()
+    sources = {}
+    for diner, attr_candidates in candidates.items():
+        if diner not in map_data:
+            continue
+        labels = [province_map.index.get(normalize_province(p), -1) for p in map_data[diner].provinces]
+        labels = np.array([label for label in labels if label >= 0], dtype=np.int64)
+        if len(labels) == 0:
+            continue
+        areas = province_map.areas[labels].astype(np.float64)
+        centroid = (province_map.centroids[labels] * areas[:, None]).sum(axis=0) / areas.sum()
+        sources[diner] = {}
+        for attr, hubs in attr_candidates.items():
+            hubs = [(state, province) for state, province in hubs if normalize_province(province) in province_map.index]
+            if not hubs:
+                continue
+            points = province_map.centroids[[province_map.index[normalize_province(p)] for _, p in hubs]]
+            state, province = hubs[int(np.argmin(((points - centroid) ** 2).sum(axis=1)))]
+            setattr(map_data[diner], attr, province)
+            sources[diner][attr] = state
+    return sources
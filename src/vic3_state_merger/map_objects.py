@@ -0,0 +1,123 @@
+import codecs
+import os
+import re
+
+from vic3_state_merger.state_regions import StateRegion, merge_groups
+
+# Hub attribute of StateRegionItem placed by each generated locator file
+locator_kinds = {
+    "generated_map_object_locators_city.txt": "city",
+    "generated_map_object_locators_farm.txt": "farm",
+    "generated_map_object_locators_mine.txt": "mine",
+    "generated_map_object_locators_port.txt": "port",
+    "generated_map_object_locators_wood.txt": "wood",
+}
+
+id_pattern = re.compile(r"^(\s*id\s*=\s*)(\d+)(.*)$", re.DOTALL)
+
+
+def locator_plan(map_data:StateRegion, merge_dict:dict) -> dict[str, dict[int, int|None]]:
+    """Return, for each hub attribute, what happens to the locator instance of each merged state.
+    The instance id of a generated locator is the id of its state region.
+    Values map the id of a food or diner state to the id the instance is written with, or to None
+    if it is dropped. States missing from the result keep their instances.
+
+    map_data must not be merged yet: the merged state keeps the hub of the diner, or for port, mine
+    and wood the hub of the first food having one if the diner has none (see StateRegionItem.merge),
+    so the instance of the state the hub comes from is the one kept, under the id of the diner.
+    A diner merged into another state later in the plan is a food of the last diner of the chain,
+    like the states merged into it, see merge_groups.
+    """
+    plan = {attr: {} for attr in locator_kinds.values()}
+    for diner, states in merge_groups(merge_dict, map_data).items():
+        group = [map_data[state] for state in states]
+        diner_id = map_data[diner].id
+        for attr, moves in plan.items():
+            source = None
+            for state in group:
+                if getattr(state, attr, "") != "":
+                    source = state
+                    break
+            if attr in ("city", "farm") and source is not map_data[diner]:
+                # city and farm are never inherited from the foods
+                source = None
+            for state in group[1:]:
+                moves[state.id] = diner_id if state is source else None
+    return plan
+
+
+def transform_locators(in_path:str, out_path:str|None, moves:dict[int, int|None]) -> dict:
+    """Copy a generated locator file, dropping the instances moves maps to None and giving the
+    instances it maps to an id that id. The file is streamed one instance at a time, and written
+    with a byte order mark if in_path has one.
+    Nothing is written if out_path is None. Return the numbers of kept, dropped and reassigned
+    instances."""
+    counts = {"kept": 0, "dropped": 0, "reassigned": 0}
+    out_file = None
+    if out_path is not None:
+        with open(in_path, "rb") as in_file:
+            encoding = "utf-8-sig" if in_file.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8 else "utf-8"
+        if not os.path.exists(os.path.dirname(out_path)):
+            os.makedirs(os.path.dirname(out_path))
+        out_file = open(out_path + ".tmp", "w", encoding=encoding, newline="")
+
+    depth = 0
+    instances_depth = None
+    block = []
+    block_depth = 0
+
+    def write(text:str):
+        if out_file is not None:
+            out_file.write(text)
+
+    def flush_block():
+        instance_id = None
+        for pos, line in enumerate(block):
+            match = id_pattern.match(line)
+            if match:
+                instance_id = int(match.group(2))
+                break
+        if instance_id is None or instance_id not in moves:
+            counts["kept"] += 1
+            write("".join(block))
+        elif moves[instance_id] is None:
+            counts["dropped"] += 1
+        else:
+            counts["reassigned"] += 1
+            block[pos] = f"{match.group(1)}{moves[instance_id]}{match.group(3)}"
+            write("".join(block))
+        block.clear()
+
+    try:
+        with open(in_path, "r", encoding="utf-8-sig", newline="") as in_file:
+            for line in in_file:
+                opening = line.count("{")
+                closing = line.count("}")
+                if block:
+                    # Inside an instance
+                    block.append(line)
+                    block_depth += opening - closing
+                    if block_depth <= 0:
+                        flush_block()
+                elif instances_depth is not None and depth == instances_depth and opening > 0:
+                    # An instance starts
+                    block.append(line)
+                    block_depth = opening - closing
+                    if block_depth <= 0:
+                        flush_block()
+                else:
+                    write(line)
+                    if instances_depth is None and re.match(r"\s*instances\s*=\s*\{", line):
+                        instances_depth = depth + 1
+                depth += opening - closing
+                if instances_depth is not None and depth < instances_depth:
+                    instances_depth = None
+        if block:
+            # Unterminated instance at the end of the file
+            write("".join(block))
+    finally:
+        if out_file is not None:
+            out_file.close()
+    if out_path is not None:
+        os.replace(out_path + ".tmp", out_path)
+    return counts
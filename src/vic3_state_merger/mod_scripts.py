@@ -0,0 +1,104 @@
+from string import Template
+
+import vic3_state_merger.assets.flag_definitions_usa as flag_definitions
+import vic3_state_merger.assets.state_traits as trait_assets
+from vic3_state_merger.state_regions import StateRegion, seq_str
+
+
+def integration_trait(count:int) -> str:
+    return f"state_trait_{seq_str[count]}_states_integration"
+
+
+def integration_counts(map_data:StateRegion) -> dict[int, int]:
+    """Return how many land states of map_data have each integration count above 1"""
+    counts = {}
+    for state in map_data.values():
+        count = state.merge_states_cnt()
+        if count > 1:
+            counts[count] = counts.get(count, 0) + 1
+    return counts
+
+
+def usa_state_counter(counts:dict[int, int]) -> str:
+    """Return the usa_state_counter script value: 2 plus the number of original states making up
+    the incorporated states of USA.
+    Each state is visited once and adds its integration count, found by an if / else_if chain over
+    the counts that occur, most frequent first. States without integration trait add 1."""
+    branches = ""
+    for pos, count in enumerate(sorted(counts, key=lambda count: (-counts[count], count))):
+        keyword = "if" if pos == 0 else "else_if"
+        branches += f"                {keyword} = {{\n"
+        branches += f"                    limit = {{ has_state_trait = {integration_trait(count)} }}\n"
+        branches += f"                    add = {count}\n"
+        branches += f"                }}\n"
+    if branches:
+        branches += "                else = {\n                    add = 1\n                }\n"
+    else:
+        branches = "                add = 1\n"
+    return (
+        "\n"
+        "# Count number of actual incorporated states in USA\n"
+        "REPLACE_OR_CREATE:usa_state_counter = {\n"
+        "    value = 2\n"
+        "\n"
+        "    if = {\n"
+        "        limit = { exists = c:USA }\n"
+        "\n"
+        "        c:USA = {\n"
+        "            every_scope_state = {\n"
+        "                limit = { is_incorporated = yes }\n"
+        f"{branches}"
+        "            }\n"
+        "        }\n"
+        "    }\n"
+        "}\n"
+    )
+
+
+# usa_state_counter values with a flag of their own in flag_definitions_usa
+star_flag_counts = range(25, 101)
+
+
+def usa_state_counter_max(map_data:StateRegion) -> int:
+    """Return the highest value usa_state_counter can reach: 2 plus the integration counts of every
+    land state of map_data, as USA can come to own any state. Merging keeps this sum at about the
+    number of states of the base game, so only star flags of small maps are left out."""
+    return 2 + sum(state.merge_states_cnt() for state in map_data.values() if not state.is_sea_node())
+
+
+def flag_definitions_usa(max_count:int|None=None) -> str:
+    """Return the USA flag definitions, with a star flag for each usa_state_counter value of
+    star_flag_counts up to max_count, or for all of them if max_count is None"""
+    counts = [count for count in star_flag_counts if max_count is None or count <= max_count]
+    return (
+        flag_definitions.header
+        + "".join(Template(flag_definitions.star_flag).substitute(count=count) for count in counts)
+        + flag_definitions.footer
+    )
+
+
+def state_traits(counts, table:dict|None=None) -> str:
+    """Return the definitions of the integration traits of counts.
+    table: modifier table, see assets/state_traits.py, the default one if None"""
+    if table is None:
+        table = trait_assets.default_table
+    blocks = []
+    for count in sorted(counts):
+        block = f"# {trait_assets.count_names.get(count, count)}州整合\n"
+        block += f"INJECT_OR_CREATE:{integration_trait(count)}= {{\n"
+        block += f'    icon = "{table.get("icon", trait_assets.default_table["icon"])}"\n'
+        block += "\n"
+        block += "    modifier = {\n"
+        for modifier in table["modifiers"]:
+            value = modifier["per_state"] * (count - 1)
+            if isinstance(value, float):
+                # Drop the float noise of the product, and the ".0" of whole values
+                value = round(value, 6)
+                if value.is_integer():
+                    value = int(value)
+            comment = f" # {modifier['comment']}" if modifier.get("comment") else ""
+            block += f"        {modifier['modifier']} = {value}{comment}\n"
+        block += "    }\n"
+        block += "}\n"
+        blocks.append(block)
+    return "\n" + "\n".join(blocks)
@@ -1,9 +1,37 @@
+import copy
 from pyradox import Tree
 
+from vic3_state_merger.emit import write_states
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
+
+def pops_state_str(state_id:str, state_pops:dict) -> str:
+    """Return the POPS entry of a state"""
+    state_str = f"    {state_id} = {{\n"
+    for tag in state_pops.keys():
+        state_str += f"        {tag} = {{\n"
+        for pop in state_pops[tag]["create_pop"]:
+            state_str += f"            create_pop = {{\n"
+            for key, value in pop.items():
+                state_str += f"                {key} = {value}\n"
+            state_str += f"            }}\n"
+        if len(state_pops[tag]["create_pop"]) == 0:
+            state_str += f"            create_pop = {{}}\n"
+        state_str += f"        }}\n"
+    state_str += f"    }}\n"
+
+    return state_str
+
 
 class Pops(dict):
-    def __init__(self, source: dict | Tree | None = None):
+    def __init__(self, source: dict | Tree | None = None, log=print):
         super().__init__()
+        # Called with each log line
+        self.log = log
         if source is None:
             return
         if isinstance(source, Tree):
@@ -20,7 +48,7 @@ class Pops(dict):
     def format(self):
         # Restore the original structure of certain pop keys
         for state_id in self.keys():
-            print(f"Formatting pop data: {state_id}")
+            self.log(f"Formatting pop data: {state_id}")
             for tag in self[state_id].keys():
                 if isinstance(self[state_id][tag], list):
                     raw_pop_list = self[state_id][tag]
@@ -43,6 +71,16 @@ class Pops(dict):
                         self[state_id][tag]["create_pop"]
                     ]
 
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing every state the merge plan does not touch"""
+        forked = Pops(log=self.log)
+        forked.update(self)
+        for diner, food_list in merge_dict.items():
+            for state_id in [diner, *food_list]:
+                if ("s:" + state_id) in self.keys():
+                    forked["s:" + state_id] = copy.deepcopy(self["s:" + state_id])
+        return forked
+
     def merge_state(self, this: str, other: str):  # this, other are "state_id" strings
         for tag in self[other].keys():
             if tag not in self[this].keys():
@@ -81,28 +119,41 @@ class Pops(dict):
                     self[this][tag]["create_pop"].append(other_pop)
 
     def get_str(self, state_id: str) -> str:
-        state_str = f"    {state_id} = {{\n"
-        for tag in self[state_id].keys():
-            state_str += f"        {tag} = {{\n"
-            for pop in self[state_id][tag]["create_pop"]:
-                state_str += f"            create_pop = {{\n"
-                for key, value in pop.items():
-                    state_str += f"                {key} = {value}\n"
-                state_str += f"            }}\n"
-            if len(self[state_id][tag]["create_pop"]) == 0:
-                state_str += f"            create_pop = {{}}\n"
-            state_str += f"        }}\n"
-        state_str += f"    }}\n"
-
-        return state_str
-
-    def merge_states(self, merge_dict: dict):
-        for diner, food_list in merge_dict.items():
+        return pops_state_str(state_id, self[state_id])
+
+    def merge_states(self, merge_dict: dict, progress=None):
+        # progress is called with (diners done, diners total) after each diner
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
             for food in food_list:
                 if ("s:" + food) in self.keys():
-                    print(f"Merging {food} pop data into {diner}")
+                    self.log(f"Merging {food} pop data into {diner}")
                     self.merge_state(("s:" + diner), ("s:" + food))
                     self.pop("s:" + food)
+            if progress is not None:
+                progress(done, len(merge_dict))
+
+    def state_pops(self, state_id: str) -> list[tuple[str, dict]]:
+        """Return the (tag, create_pop) pairs of a state in the order they are written, none if it has no pops"""
+        return [(tag, pop) for tag, tag_pops in self.get(state_id, {}).items() for pop in tag_pops["create_pop"]]
+
+    def size_cnt(self, state_id: str) -> int:
+        """Return the total pop size of a state"""
+        if state_id not in self.keys():
+            return 0
+        size = 0
+        for tag in self[state_id].keys():
+            for pop in self[state_id][tag]["create_pop"]:
+                size += int(pop["size"])
+        return size
+
+    def to_python(self):
+        """Export the Pops object to a Python dictionary"""
+        pops_dict = {}
+        for state_id in self.keys():
+            pops_dict[state_id] = {}
+            for tag in self[state_id].keys():
+                pops_dict[state_id][tag] = {"create_pop": [dict(pop) for pop in self[state_id][tag]["create_pop"]]}
+        return pops_dict
 
     def __str__(self) -> str:
         pops_str = "POPS = {\n"
@@ -112,6 +163,327 @@ class Pops(dict):
         pops_str += "}\n"
         return pops_str
 
+    def dump(self, dir, workers:int=1, threshold:int|None=None):
+        """Write the pops to dir, formatting the states in worker processes if there are workers
+        and at least threshold states, see emit.write_states"""
+        with open(dir, "w", encoding="utf-8-sig") as file:
+            file.write("POPS = {\n")
+            write_states(file, list(self.items()), pops_state_str, workers, threshold)
+            file.write("}\n")
+
+
+class ColumnarPops:
+    """Pops held as numpy columns, one row per create_pop, with the strings in tables.
+    state, tag, culture, religion, pop_type: int32 arrays, indices in state_names, tag_names,
+        cultures, religions and pop_types, -1 if the pop has no religion or pop_type
+    size: int64 array, pop size
+    layout: int32 array, index in layouts of the keys of the pop, in the order they are written
+    extra: int32 array, index in extras of the values of the other keys of the pop, or -1
+    order: list of the state_names indices of the states, in the order they are written
+    tags_of: dict, state index -> tag indices of the state, in the order they are written
+    log: function called with each log line, the one of source by default
+
+    It merges and writes the same POPS as Pops, see merge_states.
+    """
+
+    columns = ["state", "tag", "culture", "religion", "pop_type", "size", "layout", "extra"]
+
+    def __init__(self, source:Pops|None=None, log=None):
+        if np is None:
+            raise ImportError(
+                "numpy is required for the columnar pops, install it with: pip install vic3-state-merger[numpy]"
+            )
+        self.log = log or (print if source is None else source.log)
+        self.state_names = []
+        self.tag_names = []
+        self.cultures = []
+        self.religions = []
+        self.pop_types = []
+        self.layouts = []
+        self.extras = []
+        self.order = []
+        self.tags_of = {}
+        self.state_totals = None
+        if source is None:
+            source = Pops()
+        tables = {
+            "culture": {},
+            "religion": {},
+            "pop_type": {},
+        }
+        layout_ids = {}
+        tag_ids = {}
+        rows = {column: [] for column in self.columns}
+        for state_index, (state_id, state_pops) in enumerate(source.items()):
+            self.state_names.append(state_id)
+            self.order.append(state_index)
+            self.tags_of[state_index] = []
+            for tag, tag_pops in state_pops.items():
+                if tag not in tag_ids:
+                    tag_ids[tag] = len(self.tag_names)
+                    self.tag_names.append(tag)
+                self.tags_of[state_index].append(tag_ids[tag])
+                for pop in tag_pops["create_pop"]:
+                    rows["state"].append(state_index)
+                    rows["tag"].append(tag_ids[tag])
+                    for key in tables:
+                        if key in pop:
+                            rows[key].append(tables[key].setdefault(pop[key], len(tables[key])))
+                        else:
+                            rows[key].append(-1)
+                    size = int(pop["size"])
+                    if str(size) != str(pop["size"]):
+                        raise ValueError(f"Pop size {pop['size']!r} of {state_id} is not an integer")
+                    rows["size"].append(size)
+                    keys = tuple(pop.keys())
+                    rows["layout"].append(layout_ids.setdefault(keys, len(layout_ids)))
+                    extra = {key: value for key, value in pop.items() if key not in tables and key != "size"}
+                    if extra:
+                        rows["extra"].append(len(self.extras))
+                        self.extras.append(extra)
+                    else:
+                        rows["extra"].append(-1)
+        self.cultures = list(tables["culture"])
+        self.religions = list(tables["religion"])
+        self.pop_types = list(tables["pop_type"])
+        self.layouts = list(layout_ids)
+        self.index = {state_id: state_index for state_index, state_id in enumerate(self.state_names)}
+        for column, values in rows.items():
+            setattr(self, column, np.array(values, dtype=np.int64 if column == "size" else np.int32))
+
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing the columns, which merge_states replaces instead of changing them"""
+        forked = copy.copy(self)
+        forked.order = list(self.order)
+        forked.tags_of = dict(self.tags_of)
+        return forked
+
+    def keys(self):
+        return [self.state_names[state_index] for state_index in self.order]
+
+    def __contains__(self, state_id) -> bool:
+        return state_id in self.index and self.index[state_id] in self.tags_of
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, state_id:str) -> dict:
+        """Return the pops of a state in the layout of Pops, {tag: {"create_pop": [pop, ...]}}"""
+        if state_id not in self:
+            raise KeyError(state_id)
+        state_index = self.index[state_id]
+        state_pops = {self.tag_names[tag]: {"create_pop": []} for tag in self.tags_of[state_index]}
+        for row in np.flatnonzero(self.state == state_index).tolist():
+            state_pops[self.tag_names[self.tag[row]]]["create_pop"].append(self.pop_dict(row))
+        return state_pops
+
+    def get(self, state_id:str, default=None):
+        return self[state_id] if state_id in self else default
+
+    def items(self):
+        for state_id in self.keys():
+            yield state_id, self[state_id]
+
+    def pop_dict(self, row:int) -> dict:
+        """Return the create_pop of a row, with its keys in their original order"""
+        values = {"size": int(self.size[row])}
+        if self.culture[row] >= 0:
+            values["culture"] = self.cultures[self.culture[row]]
+        if self.religion[row] >= 0:
+            values["religion"] = self.religions[self.religion[row]]
+        if self.pop_type[row] >= 0:
+            values["pop_type"] = self.pop_types[self.pop_type[row]]
+        if self.extra[row] >= 0:
+            values.update(self.extras[self.extra[row]])
+        return {key: values[key] for key in self.layouts[self.layout[row]]}
+
+    def merge_states(self, merge_dict:dict, progress=None):
+        """Merge the pops of each food into its diner like Pops.merge_states.
+        The tags of a merged state are those of its first state (in the order diner, foods, foods of
+        the foods merged before) having each tag, which keeps all its pops of that tag. Every other
+        pop is added to the first pop of the merged state with the same tag, culture, religion and
+        pop_type, or kept if it is the first one. This is computed for all the merged states at once:
+        a remap of the states, a sort and a group-by sum of the sizes."""
+        # progress is called with (diners done, diners total) after each diner
+        sources = {}
+        alive = set(self.order)
+        tags_of = dict(self.tags_of)
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
+            for food in food_list:
+                if ("s:" + food) in self.index and self.index["s:" + food] in alive:
+                    food_index = self.index["s:" + food]
+                    self.log(f"Merging {food} pop data into {diner}")
+                    if not tags_of[food_index]:
+                        # Nothing to merge, Pops.merge_state only drops the food, even if the diner
+                        # is gone
+                        del tags_of[food_index]
+                        alive.discard(food_index)
+                        continue
+                    diner_index = self.index.get("s:" + diner)
+                    if diner_index not in alive:
+                        raise KeyError("s:" + diner)
+                    sources.setdefault(diner_index, [diner_index]).extend(sources.pop(food_index, [food_index]))
+                    tags_of[diner_index] = tags_of[diner_index] + [
+                        tag for tag in tags_of[food_index] if tag not in tags_of[diner_index]
+                    ]
+                    del tags_of[food_index]
+                    alive.discard(food_index)
+            if progress is not None:
+                progress(done, len(merge_dict))
+        if not sources:
+            self.order = [state_index for state_index in self.order if state_index in alive]
+            self.tags_of = tags_of
+            self.state_totals = None
+            return
+
+        # Merged state and position in its list of sources of every state, and the position of the
+        # first source having each tag
+        dest_of = np.arange(len(self.state_names), dtype=np.int64)
+        pos_of = np.zeros(len(self.state_names), dtype=np.int64)
+        owner = {}
+        for dest, states in sources.items():
+            for pos, state_index in enumerate(states):
+                dest_of[state_index] = dest
+                pos_of[state_index] = pos
+                for tag in self.tags_of[state_index]:
+                    owner.setdefault(dest * len(self.tag_names) + tag, pos)
+        merged = np.zeros(len(self.state_names), dtype=bool)
+        merged[[state_index for states in sources.values() for state_index in states]] = True
+
+        affected = merged[self.state]
+        rows = np.flatnonzero(affected)
+        dest = dest_of[self.state[rows]]
+        pos = pos_of[self.state[rows]]
+        tag = self.tag[rows].astype(np.int64)
+        # Rows in the order Pops would append them: by merged state, tag, source, then file order
+        rows = rows[np.lexsort((rows, pos, tag, dest))]
+        dest = dest_of[self.state[rows]]
+        pos = pos_of[self.state[rows]]
+        tag = self.tag[rows].astype(np.int64)
+        owner_keys = np.array(sorted(owner), dtype=np.int64)
+        owner_pos = np.array([owner[key] for key in owner_keys.tolist()], dtype=np.int64)
+        is_owner = pos == owner_pos[np.searchsorted(owner_keys, dest * len(self.tag_names) + tag)]
+
+        keys = np.stack([dest, tag, self.culture[rows], self.religion[rows], self.pop_type[rows]], axis=1)
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        target = np.where(is_owner, np.arange(len(rows)), first[inverse.reshape(-1)])
+        sizes = np.zeros(len(rows), dtype=np.int64)
+        np.add.at(sizes, target, self.size[rows])
+        kept = target == np.arange(len(rows))
+
+        keep = np.concatenate([np.flatnonzero(~affected), rows[kept]])
+        for column in self.columns:
+            setattr(self, column, getattr(self, column)[keep])
+        self.state[len(keep) - int(kept.sum()):] = dest[kept]
+        self.size[len(keep) - int(kept.sum()):] = sizes[kept]
+        self.order = [state_index for state_index in self.order if state_index in alive]
+        self.tags_of = tags_of
+        self.state_totals = None
+
+    def state_pops(self, state_id:str) -> list[tuple[str, dict]]:
+        """Return the (tag, create_pop) pairs of a state like Pops.state_pops"""
+        if state_id not in self:
+            return []
+        state_index = self.index[state_id]
+        rows = np.flatnonzero(self.state == state_index)
+        tags = self.tag[rows]
+        return [
+            (self.tag_names[tag], self.pop_dict(row))
+            for tag in self.tags_of[state_index]
+            for row in rows[tags == tag].tolist()
+        ]
+
+    def size_cnt(self, state_id:str) -> int:
+        """Return the total pop size of a state"""
+        if state_id not in self:
+            return 0
+        if self.state_totals is None:
+            self.state_totals = np.zeros(len(self.state_names), dtype=np.int64)
+            np.add.at(self.state_totals, self.state, self.size)
+        return int(self.state_totals[self.index[state_id]])
+
+    def totals(self, by:str) -> dict:
+        """Return the total pop size of the world by "state", "tag", "culture", "religion" or
+        "pop_type". Pops without religion or pop_type are counted under None."""
+        names = {
+            "state": self.state_names,
+            "tag": self.tag_names,
+            "culture": self.cultures,
+            "religion": self.religions,
+            "pop_type": self.pop_types,
+        }[by]
+        column = getattr(self, by).astype(np.int64) + 1
+        sums = np.zeros(len(names) + 1, dtype=np.int64)
+        np.add.at(sums, column, self.size)
+        present = np.zeros(len(names) + 1, dtype=bool)
+        present[column] = True
+        return {
+            (names[i - 1] if i > 0 else None): int(sums[i]) for i in np.flatnonzero(present).tolist()
+        }
+
+    def to_python(self):
+        """Export the pops to a Python dictionary in the layout of Pops.to_python"""
+        pops_dict = {}
+        for state_index in self.order:
+            pops_dict[self.state_names[state_index]] = {
+                self.tag_names[tag]: {"create_pop": []} for tag in self.tags_of[state_index]
+            }
+        rows = np.lexsort((np.arange(len(self.state)), self.state))
+        for row, state_index, tag in zip(rows.tolist(), self.state[rows].tolist(), self.tag[rows].tolist()):
+            pops_dict[self.state_names[state_index]][self.tag_names[tag]]["create_pop"].append(self.pop_dict(row))
+        return pops_dict
+
+    def get_str(self, state_id:str) -> str:
+        return self.state_strs([self.index[state_id]])[0]
+
+    def state_strs(self, state_indices:list[int]) -> list[str]:
+        """Return the POPS entries of states, written like Pops.get_str"""
+        wanted = np.zeros(len(self.state_names), dtype=bool)
+        wanted[state_indices] = True
+        rows = np.flatnonzero(wanted[self.state])
+        rows = rows[np.lexsort((rows, self.tag[rows], self.state[rows]))]
+        row_state = self.state[rows].tolist()
+        row_tag = self.tag[rows].tolist()
+        rows = rows.tolist()
+        pops = {}
+        for row, state_index, tag in zip(rows, row_state, row_tag):
+            pops.setdefault((state_index, tag), []).append(row)
+        # Lines of each layout with the values left as %s, filled from the column lists
+        templates = [
+            "            create_pop = {\n" + "".join(f"                {key} = %s\n" for key in keys) + "            }\n"
+            for keys in self.layouts
+        ]
+        columns = {
+            "size": self.size.tolist(),
+            "culture": [self.cultures[i] if i >= 0 else None for i in self.culture.tolist()],
+            "religion": [self.religions[i] if i >= 0 else None for i in self.religion.tolist()],
+            "pop_type": [self.pop_types[i] if i >= 0 else None for i in self.pop_type.tolist()],
+        }
+        layout = self.layout.tolist()
+        extra = self.extra.tolist()
+        strs = []
+        for state_index in state_indices:
+            state_str = f"    {self.state_names[state_index]} = {{\n"
+            for tag in self.tags_of[state_index]:
+                state_str += f"        {self.tag_names[tag]} = {{\n"
+                tag_rows = pops.get((state_index, tag), [])
+                for row in tag_rows:
+                    keys = self.layouts[layout[row]]
+                    if extra[row] >= 0:
+                        values = self.pop_dict(row).values()
+                    else:
+                        values = [columns[key][row] for key in keys]
+                    state_str += templates[layout[row]] % tuple(values)
+                if len(tag_rows) == 0:
+                    state_str += f"            create_pop = {{}}\n"
+                state_str += f"        }}\n"
+            state_str += f"    }}\n"
+            strs.append(state_str)
+        return strs
+
+    def __str__(self) -> str:
+        return "POPS = {\n" + "".join(self.state_strs(self.order)) + "}\n"
+
     def dump(self, dir):
         with open(dir, "w", encoding="utf-8-sig") as file:
             file.write(str(self))
@@ -0,0 +1,107 @@
+import json
+import os
+import zlib
+
+from PIL import Image
+
+from vic3_state_merger.province_map import ProvinceMap, require_numpy
+from vic3_state_merger.state_merger import parse_merge, state_file_dir
+from vic3_state_merger.state_regions import StateRegion, merge_groups
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
+sea_color = (38, 68, 110)
+unknown_color = (0, 0, 0)
+border_color = (20, 20, 20)
+
+
+def state_color(state:str) -> tuple[int, int, int]:
+    """Return a colour for a state, stable across runs and plans"""
+    crc = zlib.crc32(state.encode("utf-8"))
+    return (80 + (crc & 0xFF) % 176, 80 + ((crc >> 8) & 0xFF) % 176, 80 + ((crc >> 16) & 0xFF) % 176)
+
+
+class PreviewData:
+    """Unmerged states of a game root and the state of each province label of a ProvinceMap,
+    cached in cache_dir/preview_states.npz so that a preview does not parse the state regions.
+    states: list of string, state names
+    is_sea: bool array, if each state is a sea node
+    state_of: int32 array, index in states of the state of each province label, or -1
+    """
+
+    def __init__(self, game_root_dir:str, province_map:ProvinceMap, cache_dir:str|None=None):
+        require_numpy()
+        state_region_dir = os.path.join(game_root_dir, state_file_dir["map_data"])
+        source = json.dumps(
+            [province_map.stamp]
+            + [
+                [file, os.path.getmtime(os.path.join(state_region_dir, file)), os.path.getsize(os.path.join(state_region_dir, file))]
+                for file in sorted(os.listdir(state_region_dir))
+            ]
+        )
+        cache_file = None if cache_dir is None else os.path.join(cache_dir, "preview_states.npz")
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as cached:
+                    if str(cached["source"]) == source:
+                        self.states = [str(state) for state in cached["states"]]
+                        self.is_sea = cached["is_sea"]
+                        self.state_of = cached["state_of"]
+                        return
+            except (OSError, ValueError, KeyError):
+                pass
+
+        map_data = StateRegion(parse_merge(state_region_dir, merge_levels=1))
+        self.states, self.state_of = province_map.province_states(map_data)
+        self.is_sea = np.array([map_data[state].is_sea_node() for state in self.states], dtype=bool)
+        if cache_file is not None:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            np.savez(
+                cache_file,
+                source=np.array(source),
+                states=np.array(self.states),
+                is_sea=self.is_sea,
+                state_of=self.state_of,
+            )
+
+
+def render_preview(
+    province_map:ProvinceMap,
+    preview_data:PreviewData,
+    merge_dict:dict,
+    borders:bool=False,
+    scale:float=1.0,
+) -> Image.Image:
+    """Render the map with every merged state in one colour.
+    The pixels are coloured through a lookup table from province label to colour, so the cost is
+    a few array operations over the image. scale below 1 samples one pixel out of 1 / scale in
+    each direction; borders draws the borders between merged states."""
+    require_numpy()
+    index = {state: i for i, state in enumerate(preview_data.states)}
+    # Merged state of each state, following the plan in order like the merge
+    group = np.arange(len(preview_data.states), dtype=np.int32)
+    for diner, members in merge_groups(merge_dict, index).items():
+        group[[index[state] for state in members]] = index[diner]
+
+    palette = np.array(
+        [sea_color if is_sea else state_color(state) for state, is_sea in zip(preview_data.states, preview_data.is_sea)]
+        + [unknown_color],
+        dtype=np.uint8,
+    )
+    # Group of each province label, provinces of no state get the last palette entry
+    label_group = np.where(preview_data.state_of >= 0, group[preview_data.state_of], len(preview_data.states))
+
+    step = max(1, round(1 / scale)) if scale > 0 else 1
+    labels = province_map.labels()[::step, ::step]
+    groups = label_group[labels]
+    pixels = palette[groups]
+    if borders:
+        edge = np.zeros(groups.shape, dtype=bool)
+        edge[:, 1:] |= groups[:, 1:] != groups[:, :-1]
+        edge[1:, :] |= groups[1:, :] != groups[:-1, :]
+        pixels[edge] = border_color
+    return Image.fromarray(pixels)
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+# Phases of a merge, in the order they run
+phases = ["parse", "state_data", "misc_data", "loc_data"]
+
+
+class ProgressEvent:
+    """Progress event emitted by StateMerger
+    kind: string, "phase_start", "phase_end", "progress" or "log"
+    phase: string, one of phases
+    done: int, items done in the phase ("progress" events)
+    total: int, items in the phase ("progress" events)
+    unit: string, what the items are: "files", "subsystems" or "states"
+    message: string, log line or description of the item being processed
+    time: float, time.time() when the event was emitted
+    """
+
+    def __init__(self, kind:str, phase:str, done:int=0, total:int=0, unit:str="", message:str=""):
+        self.kind = kind
+        self.phase = phase
+        self.done = done
+        self.total = total
+        self.unit = unit
+        self.message = message
+        self.time = time.time()
+
+    def __repr__(self):
+        return (
+            f"ProgressEvent({self.kind!r}, {self.phase!r}, done={self.done}, total={self.total}, "
+            f"unit={self.unit!r}, message={self.message!r})"
+        )
+
+
+class MergeCancelled(Exception):
+    """Raised by StateMerger when the merge is cancelled. The mod directory is left half written."""
+
+
+class ProgressTracker:
+    """Follow the progress events of a merge to estimate its overall progress and remaining time.
+    The estimate uses the phase durations of a previous run, see load_timings and save_timings."""
+
+    def __init__(self, previous_timings:dict|None=None):
+        self.previous_timings = previous_timings or {}
+        self.timings = {}
+        self.phase = None
+        self.phase_start = 0.0
+        self.fraction = 0.0
+
+    def update(self, event:ProgressEvent):
+        if event.kind == "phase_start":
+            self.phase = event.phase
+            self.phase_start = event.time
+            self.fraction = 0.0
+        elif event.kind == "phase_end":
+            self.timings[event.phase] = event.time - self.phase_start
+            self.fraction = 1.0
+        elif event.kind == "progress" and event.total > 0:
+            self.fraction = event.done / event.total
+
+    def _weights(self) -> dict:
+        # Without a previous run every phase weighs the same
+        if all(phase in self.previous_timings for phase in phases):
+            return {phase: max(self.previous_timings[phase], 1e-3) for phase in phases}
+        return {phase: 1.0 for phase in phases}
+
+    def overall(self) -> float:
+        """Return the overall progress of the merge, between 0 and 1"""
+        if self.phase is None:
+            return 0.0
+        weights = self._weights()
+        index = phases.index(self.phase)
+        done = sum(weights[phase] for phase in phases[:index]) + weights[self.phase] * self.fraction
+        return done / sum(weights.values())
+
+    def remaining(self) -> float|None:
+        """Return the estimated remaining seconds, or None without a previous run to compare with"""
+        if self.phase is None or not all(phase in self.previous_timings for phase in phases):
+            return None
+        index = phases.index(self.phase)
+        current = self.previous_timings[self.phase]
+        elapsed = time.time() - self.phase_start
+        if self.fraction > 0.0 and self.fraction < 1.0:
+            # Scale the previous duration of the phase by how far it got this time
+            current = elapsed / self.fraction
+        remaining = max(current - elapsed, 0.0) if self.fraction < 1.0 else 0.0
+        return remaining + sum(self.previous_timings[phase] for phase in phases[index + 1:])
+
+
+def load_timings(path:str) -> dict:
+    """Load the phase durations recorded by save_timings, or {} if there are none"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            timings = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return timings if isinstance(timings, dict) else {}
+
+
+def save_timings(path:str, timings:dict):
+    if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(timings, file, indent=4)
@@ -0,0 +1,215 @@
+import os
+
+from PIL import Image
+
+from vic3_state_merger.state_regions import StateRegion, normalize_province
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
+provinces_png = r"map_data/provinces.png"
+
+# Bump when the content of the cache file changes
+cache_version = 1
+# Rows of the image processed at once, to bound the memory used by the temporary arrays
+band_rows = 512
+
+
+def province_id(color:int) -> str:
+    """Return the province id of a 0xRRGGBB colour of provinces.png"""
+    return f"x{color:06X}"
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError(
+            "numpy is required for the province map, install it with: pip install vic3-state-merger[numpy]"
+        )
+
+
+class ProvinceMap:
+    """Province adjacency graph of a game root, built from map_data/provinces.png.
+    provinces: list of string, province ids sorted by colour, the index of a province in this list
+        is its label
+    index: dict, province id -> label
+    edges: int32 array of shape (edge count, 2), pairs of adjacent labels, smaller label first
+    areas: int64 array, pixel count of each province
+    centroids: float64 array of shape (province count, 2), mean (x, y) pixel of each province
+
+    The graph is cached in cache_dir/province_map.npz and rebuilt when provinces.png changes.
+    """
+
+    def __init__(self, game_root_dir:str, cache_dir:str|None=None):
+        require_numpy()
+        self.png_path = os.path.join(game_root_dir, provinces_png)
+        self.cache_dir = cache_dir
+        stat = os.stat(self.png_path)
+        source = np.array([stat.st_mtime_ns, stat.st_size, cache_version], dtype=np.int64)
+        self.stamp = f"{stat.st_mtime_ns:x}_{stat.st_size:x}_{cache_version}"
+        cache_file = None if cache_dir is None else os.path.join(cache_dir, "province_map.npz")
+
+        data = None
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as cached:
+                    if np.array_equal(cached["source"], source):
+                        data = {key: cached[key] for key in cached.files}
+            except (OSError, ValueError, KeyError):
+                data = None
+        if data is None:
+            data = self.build(self.png_path)
+            if cache_file is not None:
+                if not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir)
+                np.savez_compressed(cache_file, source=source, **data)
+
+        self.colors = data["colors"]
+        self.edges = data["edges"]
+        self.areas = data["areas"]
+        self.centroids = data["centroids"]
+        self.provinces = [province_id(int(color)) for color in self.colors]
+        self.index = {province: label for label, province in enumerate(self.provinces)}
+
+        # Compressed sparse rows of the symmetric adjacency: the neighbours of label i are
+        # self.neighbor_labels[self.indptr[i]:self.indptr[i + 1]]
+        both = np.concatenate([self.edges, self.edges[:, ::-1]])
+        both = both[np.lexsort((both[:, 1], both[:, 0]))]
+        self.neighbor_labels = both[:, 1]
+        self.indptr = np.zeros(len(self.provinces) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(both[:, 0], minlength=len(self.provinces)), out=self.indptr[1:])
+
+    @staticmethod
+    def read_labels(png_path:str):
+        """Return the colours of provinces.png and the label of each of its pixels"""
+        require_numpy()
+        with Image.open(png_path) as image:
+            pixels = np.asarray(image.convert("RGB"))
+        codes = (
+            (pixels[:, :, 0].astype(np.uint32) << 16)
+            | (pixels[:, :, 1].astype(np.uint32) << 8)
+            | pixels[:, :, 2].astype(np.uint32)
+        )
+        del pixels
+        # Colours are 24 bits, a lookup table labels the pixels without sorting them
+        present = np.zeros(1 << 24, dtype=bool)
+        present[codes] = True
+        colors = np.flatnonzero(present).astype(np.int32)
+        lookup = np.zeros(1 << 24, dtype=np.int32)
+        lookup[colors] = np.arange(len(colors), dtype=np.int32)
+        return colors, lookup[codes]
+
+    @staticmethod
+    def build(png_path:str) -> dict:
+        """Read provinces.png and return the arrays stored in the cache"""
+        colors, labels = ProvinceMap.read_labels(png_path)
+        count = len(colors)
+        height, width = labels.shape
+        areas = np.bincount(labels.ravel(), minlength=count).astype(np.int64)
+        sum_x = np.zeros(count)
+        sum_y = np.zeros(count)
+        keys = []
+        xs = np.arange(width, dtype=np.float64)
+        for top in range(0, height, band_rows):
+            # One extra row so that the vertical pairs across two bands are counted
+            band = labels[top:top + band_rows + 1]
+            rows = band[:band_rows]
+            sum_x += np.bincount(rows.ravel(), weights=np.broadcast_to(xs, rows.shape).ravel(), minlength=count)
+            sum_y += np.bincount(
+                rows.ravel(),
+                weights=np.repeat(np.arange(top, top + len(rows), dtype=np.float64), width),
+                minlength=count,
+            )
+            for a, b in ((band[:, :-1], band[:, 1:]), (band[:-1], band[1:])):
+                mask = a != b
+                low = np.minimum(a[mask], b[mask]).astype(np.int64)
+                high = np.maximum(a[mask], b[mask]).astype(np.int64)
+                keys.append(np.unique(low * count + high))
+        keys = np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64)
+        edges = np.stack([keys // count, keys % count], axis=1).astype(np.int32)
+        centroids = np.stack([sum_x, sum_y], axis=1) / np.maximum(areas, 1)[:, None]
+        return {"colors": colors, "edges": edges, "areas": areas, "centroids": centroids}
+
+    def labels(self):
+        """Return the label of each pixel of provinces.png, as a (height, width) array.
+        The labels are cached in cache_dir as a .npy file that is memory-mapped when loaded."""
+        if self.cache_dir is None:
+            return self.read_labels(self.png_path)[1]
+        labels_file = os.path.join(self.cache_dir, f"province_labels_{self.stamp}.npy")
+        if not os.path.exists(labels_file):
+            labels = self.read_labels(self.png_path)[1]
+            if len(self.provinces) <= np.iinfo(np.uint16).max:
+                labels = labels.astype(np.uint16)
+            for file in os.listdir(self.cache_dir):
+                # Labels of an older provinces.png
+                if file.startswith("province_labels_") and file.endswith(".npy"):
+                    os.remove(os.path.join(self.cache_dir, file))
+            np.save(labels_file + ".tmp.npy", labels)
+            os.replace(labels_file + ".tmp.npy", labels_file)
+            return labels
+        return np.load(labels_file, mmap_mode="r")
+
+    def label(self, province:str) -> int:
+        return self.index[normalize_province(province)]
+
+    def neighbors(self, province:str) -> list[str]:
+        """Return the provinces sharing a border with province"""
+        label = self.label(province)
+        return [self.provinces[i] for i in self.neighbor_labels[self.indptr[label]:self.indptr[label + 1]]]
+
+    def components(self, provinces:list[str]) -> list[list[str]]:
+        """Split provinces into groups connected by borders between provinces of the list"""
+        labels = {}
+        for province in provinces:
+            normalized = normalize_province(province)
+            if normalized in self.index:
+                labels[self.index[normalized]] = province
+        seen = set()
+        components = []
+        for start in labels:
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [labels[start]]
+            stack = [start]
+            while stack:
+                label = stack.pop()
+                for neighbor in self.neighbor_labels[self.indptr[label]:self.indptr[label + 1]].tolist():
+                    if neighbor in labels and neighbor not in seen:
+                        seen.add(neighbor)
+                        component.append(labels[neighbor])
+                        stack.append(neighbor)
+            components.append(component)
+        return components
+
+    def is_contiguous(self, provinces:list[str]) -> bool:
+        """Determine if provinces form a single connected group"""
+        return len(self.components(provinces)) <= 1
+
+    def province_states(self, map_data:StateRegion) -> tuple[list[str], "np.ndarray"]:
+        """Return the state names of map_data and, for each province label, the index of its
+        state in that list, or -1 if it belongs to none"""
+        states = list(map_data.keys())
+        state_index = {state: i for i, state in enumerate(states)}
+        labels = []
+        indices = []
+        for province, state in map_data.province_index.items():
+            if province in self.index:
+                labels.append(self.index[province])
+                indices.append(state_index[state])
+        state_of = np.full(len(self.provinces), -1, dtype=np.int32)
+        state_of[labels] = indices
+        return states, state_of
+
+    def state_adjacency(self, map_data:StateRegion) -> dict[str, set[str]]:
+        """Return the states (including sea nodes) sharing a border with each state of map_data"""
+        states, state_of = self.province_states(map_data)
+        pairs = state_of[self.edges]
+        pairs = pairs[(pairs[:, 0] >= 0) & (pairs[:, 1] >= 0) & (pairs[:, 0] != pairs[:, 1])]
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+        adjacency = {state: set() for state in states}
+        for a, b in pairs.tolist():
+            adjacency[states[a]].add(states[b])
+            adjacency[states[b]].add(states[a])
+        return adjacency
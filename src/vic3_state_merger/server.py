@@ -0,0 +1,353 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from vic3_state_merger.state_merger import GameData, StateMerger
+from vic3_state_merger.state_regions import merge_groups
+from vic3_state_merger.validate import validate_geometry, validate_plan, validate_provinces
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class ServiceError(Exception):
+    """Error reported to the client as a JSON-RPC error object"""
+
+    def __init__(self, code:int, message:str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _inside(path:str, dir:str) -> bool:
+    """Return whether path resolves to dir or a path below it"""
+    try:
+        return os.path.commonpath([os.path.realpath(path), dir]) == dir
+    except ValueError:  # on different drives
+        return False
+
+
+class MergeService:
+    """Merge, dry-run, validation and query operations on a game root parsed once.
+
+    Every operation takes a "plan" (the merge dict) or a "merge_file" (path to it) in its params,
+    and optionally "small_state_limit" and "ignore_small_states".
+    The merge_file, mod_dir and data_dir paths of the params must lie inside one of allowed_dirs,
+    so without allowed_dirs plans can only be given inline and merge, which writes a mod, is refused.
+    If columnar is set, the pops and the trade are held as numpy columns, see GameData.
+    """
+
+    def __init__(
+        self,
+        game_root_dir:str,
+        cache_dir:str="./data",
+        max_cached_plans:int=4,
+        allowed_dirs:list[str]|None=None,
+        columnar:bool=False,
+    ):
+        self.game_root_dir = game_root_dir
+        self.cache_dir = cache_dir
+        self.allowed_dirs = [os.path.realpath(dir) for dir in allowed_dirs or []]
+        self.max_cached_plans = max_cached_plans
+        self.columnar = columnar
+        self.game_data = GameData(game_root_dir, cache_files=True, columnar=columnar)
+        # Province adjacency for the geometry checks, built on the first request needing it
+        self.province_map = None
+        # Plans merged in memory for queries, most recently used last
+        self.merged = {}
+        self.cache_lock = threading.Lock()
+        # Merges writing to disk run one at a time
+        self.merge_lock = threading.Lock()
+        self.methods = {
+            "merge": self.merge,
+            "dry_run": self.dry_run,
+            "validate": self.validate,
+            "query": self.query,
+            "reload": self.reload,
+        }
+
+    def call(self, method:str, params:dict):
+        if method not in self.methods:
+            raise ServiceError(METHOD_NOT_FOUND, f"Unknown method: {method}")
+        if not isinstance(params, dict):
+            raise ServiceError(INVALID_PARAMS, "params must be an object")
+        return self.methods[method](params)
+
+    def _path(self, params:dict, key:str) -> str:
+        """Return params[key], raising a ServiceError if it is outside the allowed directories"""
+        path = params[key]
+        if not isinstance(path, str):
+            raise ServiceError(INVALID_PARAMS, f"{key} must be a string")
+        if not self.allowed_dirs:
+            raise ServiceError(INVALID_PARAMS, f"{key} is refused, the server was started without allowed directories")
+        if not any(_inside(path, dir) for dir in self.allowed_dirs):
+            raise ServiceError(INVALID_PARAMS, f"{key} is outside the allowed directories: {path}")
+        return path
+
+    def _plan(self, params:dict) -> dict:
+        if "plan" in params:
+            merge_dict = params["plan"]
+        elif "merge_file" in params:
+            with open(self._path(params, "merge_file"), "r", encoding="utf-8") as file:
+                merge_dict = json.load(file)
+        else:
+            raise ServiceError(INVALID_PARAMS, "Either plan or merge_file is required")
+        if not isinstance(merge_dict, dict):
+            raise ServiceError(INVALID_PARAMS, "The plan must be an object")
+        return merge_dict
+
+    def _options(self, params:dict) -> dict:
+        return {
+            "ignoreSmallStates": bool(params.get("ignore_small_states", False)),
+            "smallStateLimit": int(params.get("small_state_limit", 4)),
+        }
+
+    def _merged(self, params:dict) -> StateMerger:
+        """Return a dry-run StateMerger with the state data merged, cached by plan and options"""
+        merge_dict = self._plan(params)
+        options = self._options(params)
+        key = json.dumps([merge_dict, options], sort_keys=True)
+        with self.cache_lock:
+            if key in self.merged:
+                self.merged[key] = self.merged.pop(key)
+                return self.merged[key]
+        state_merger = StateMerger(
+            self.game_root_dir, "", merge_dict, self.cache_dir, dry_run=True, game_data=self.game_data
+        )
+        state_merger.merge_state_data(**options)
+        with self.cache_lock:
+            self.merged[key] = state_merger
+            while len(self.merged) > self.max_cached_plans:
+                self.merged.pop(next(iter(self.merged)))
+        return state_merger
+
+    def merge(self, params:dict) -> dict:
+        """Merge the plan and write the mod to params["mod_dir"]"""
+        if "mod_dir" not in params:
+            raise ServiceError(INVALID_PARAMS, "mod_dir is required")
+        mod_dir = self._path(params, "mod_dir")
+        data_dir = self._path(params, "data_dir") if "data_dir" in params else self.cache_dir
+        merge_dict = self._plan(params)
+        with self.merge_lock:
+            state_merger = StateMerger(
+                self.game_root_dir,
+                mod_dir,
+                merge_dict,
+                data_dir,
+                game_data=self.game_data,
+            )
+            state_merger.merge_state_data(**self._options(params))
+            state_merger.merge_misc_data()
+            state_merger.merge_loc_data()
+        return {"mod_dir": mod_dir}
+
+    def dry_run(self, params:dict) -> dict:
+        """Return the dry-run report of the plan"""
+        state_merger = StateMerger(
+            self.game_root_dir, "", self._plan(params), self.cache_dir, dry_run=True, game_data=self.game_data
+        )
+        state_merger.merge_state_data(**self._options(params))
+        state_merger.merge_misc_data()
+        state_merger.merge_loc_data()
+        return state_merger.report
+
+    def validate(self, params:dict) -> list:
+        """Return the issues of the plan, with the contiguity and port checks if params["geometry"] is set"""
+        merge_dict = self._plan(params)
+        issues = validate_plan(merge_dict, self.game_data.map_data)
+        issues += validate_provinces(merge_dict, self.game_data.map_data, self.game_data.states)
+        if params.get("geometry", False):
+            issues += validate_geometry(merge_dict, self.game_data.map_data, self._province_map())
+        return issues
+
+    def _province_map(self):
+        from vic3_state_merger.province_map import ProvinceMap
+
+        with self.cache_lock:
+            if self.province_map is None:
+                try:
+                    self.province_map = ProvinceMap(self.game_root_dir, self.cache_dir)
+                except ImportError as exc:
+                    raise ServiceError(SERVER_ERROR, str(exc))
+            return self.province_map
+
+    def query(self, params:dict) -> dict:
+        """Return what ends up in params["state"], or in the state of params["province"], once the
+        plan is merged"""
+        state = params.get("state")
+        if isinstance(params.get("province"), str) and state is None:
+            state = self.game_data.map_data.state_of(params["province"])
+            if state is None:
+                raise ServiceError(INVALID_PARAMS, f"Unknown province: {params['province']}")
+        if not isinstance(state, str):
+            raise ServiceError(INVALID_PARAMS, "state or province is required")
+        state_merger = self._merged(params)
+        merged_into = None
+        for diner, group in merge_groups(state_merger.merge_dict, self.game_data.map_data).items():
+            if state in group[1:]:
+                merged_into = diner
+                break
+        result_state = merged_into or state
+        if result_state not in state_merger.map_data:
+            raise ServiceError(INVALID_PARAMS, f"Unknown state: {state}")
+        state_id = "s:" + result_state
+        pops = [{"region_state": tag, **pop} for tag, pop in state_merger.pops.state_pops(state_id)]
+        return {
+            "state": result_state,
+            "merged_into": merged_into,
+            "provinces": list(state_merger.map_data[result_state].provinces),
+            "owners": state_merger.states.get(state_id, {}).get("create_state", []),
+            "pops": pops,
+            "pop_total": state_merger.pops.size_cnt(state_id),
+            "building_levels": state_merger.buildings.level_cnt(state_id),
+        }
+
+    def reload(self, params:dict) -> dict:
+        """Parse the game root again"""
+        game_data = GameData(self.game_root_dir, cache_files=True, columnar=self.columnar)
+        with self.cache_lock:
+            self.game_data = game_data
+            self.province_map = None
+            self.merged = {}
+        return {"states": len(game_data.map_data)}
+
+
+def error_response(request_id, code:int, message:str) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+async def handle_request(service:MergeService, executor, request) -> dict|None:
+    """Run one JSON-RPC request in the executor. Return None for notifications"""
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return error_response(None, INVALID_REQUEST, "Invalid request")
+    request_id = request.get("id")
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            executor, service.call, request["method"], request.get("params", {})
+        )
+    except ServiceError as exc:
+        response = error_response(request_id, exc.code, exc.message)
+    except Exception as exc:
+        response = error_response(request_id, SERVER_ERROR, f"{type(exc).__name__}: {exc}")
+    else:
+        response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+    if "id" not in request:
+        return None
+    return response
+
+
+async def handle_payload(service:MergeService, executor, payload:bytes|str) -> list|dict|None:
+    """Handle a single or batch JSON-RPC payload"""
+    try:
+        request = json.loads(payload)
+    except ValueError:
+        return error_response(None, PARSE_ERROR, "Parse error")
+    if isinstance(request, list):
+        if not request:
+            return error_response(None, INVALID_REQUEST, "Invalid request")
+        responses = await asyncio.gather(
+            *(handle_request(service, executor, item) for item in request)
+        )
+        responses = [response for response in responses if response is not None]
+        return responses or None
+    return await handle_request(service, executor, request)
+
+
+def _http_error(headers:dict, hosts:set[str]) -> str|None:
+    """Return the status rejecting a request with headers, or None if it may be handled.
+    Requests from web pages (carrying an Origin), sent to another host name (DNS rebinding) or
+    not declared as JSON (which a page can POST without a preflight) are refused."""
+    if "origin" in headers:
+        return "403 Forbidden"
+    if headers.get("host", "").lower() not in hosts:
+        return "403 Forbidden"
+    if headers.get("content-type", "").partition(";")[0].strip().lower() != "application/json":
+        return "415 Unsupported Media Type"
+    return None
+
+
+async def _handle_http(service:MergeService, executor, reader, writer, hosts:set[str]):
+    try:
+        request_line = await reader.readline()
+        if not request_line:
+            return
+        http_method = request_line.decode("latin-1").split(" ", 1)[0]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        if http_method != "POST":
+            status, content = "405 Method Not Allowed", b""
+        elif (error := _http_error(headers, hosts)) is not None:
+            status, content = error, b""
+        else:
+            response = await handle_payload(service, executor, body)
+            if response is None:
+                status, content = "204 No Content", b""
+            else:
+                status, content = "200 OK", json.dumps(response, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1")
+            + content
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_http(service:MergeService, host:str="127.0.0.1", port:int=8765, workers:int=4):
+    """Serve JSON-RPC requests POSTed to http://host:port/ with a JSON Content-Type, a Host header
+    naming host, 127.0.0.1 or localhost with port, and no Origin header"""
+    hosts = {f"{name}:{port}".lower() for name in (host, "127.0.0.1", "localhost")}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle_http(service, executor, reader, writer, hosts), host, port
+        )
+        print(f"Serving on http://{host}:{port}/", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+async def serve_stdio(service:MergeService, workers:int=4):
+    """Serve JSON-RPC requests read from stdin, one per line, answering one per line on stdout.
+    The merge log is moved to stderr so that stdout only carries responses."""
+    loop = asyncio.get_running_loop()
+    out = sys.stdout
+    pending = set()
+
+    async def respond(line:str):
+        response = await handle_payload(service, executor, line)
+        if response is not None:
+            out.write(json.dumps(response, ensure_ascii=False) + "\n")
+            out.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, contextlib.redirect_stdout(sys.stderr):
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(respond(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
@@ -3,14 +3,22 @@ import re
 import yaml
 import shutil
 import pyradox
-import vic3_state_merger.assets.flag_definitions_usa
-import vic3_state_merger.assets.state_traits
-import vic3_state_merger.assets.usa_state_counter
+from concurrent.futures import ProcessPoolExecutor, wait
 from vic3_state_merger.state_regions import StateRegion
 from vic3_state_merger.buildings import Buildings
-from vic3_state_merger.pops import Pops
+from vic3_state_merger.pops import ColumnarPops, Pops
 from vic3_state_merger.states import States
-from vic3_state_merger.trade import Trade
+from vic3_state_merger.trade import ColumnarTrade, Trade
+from vic3_state_merger.map_objects import locator_kinds, locator_plan, transform_locators
+from vic3_state_merger.hubs import hub_candidates, place_hubs
+from vic3_state_merger.mod_scripts import (
+    flag_definitions_usa,
+    integration_counts,
+    state_traits,
+    usa_state_counter,
+    usa_state_counter_max,
+)
+from vic3_state_merger.progress import MergeCancelled, ProgressEvent
 
 try:
     from importlib.resources import files, as_file
@@ -63,7 +71,9 @@ replace_file_dir = [
     "gfx/map/city_data/city_types",
 ]
 
-remove_file_dir = ["common/strategic_regions"]
+strategic_region_dir = r"common/strategic_regions"
+
+remove_file_dir = [strategic_region_dir]
 
 loc_file_dir = {
     "l_english": r"localization/english",
@@ -79,8 +89,9 @@ map_object_data_files = [
 ]
 
 
-def parse_merge(path, merge_levels:int=0):
-    """Given a directory, return a Tree as if all .txt files in the directory were a single file"""
+def parse_merge(path, merge_levels:int=0, on_file=None):
+    """Given a directory, return a Tree as if all .txt files in the directory were a single file.
+    on_file is called with the path of each file once it is parsed."""
 
     result = pyradox.Tree()
     for filename in sorted(os.listdir(path)):
@@ -91,9 +102,111 @@ def parse_merge(path, merge_levels:int=0):
         if os.path.isfile(fullpath):
             tree = pyradox.parse_file(fullpath, game='HoI4', path_relative_to_game=False)
             result.merge(tree, merge_levels)
+            if on_file is not None:
+                on_file(fullpath)
     return result
 
 
+def read_strategic_regions(game_root_dir:str) -> dict[str, str]:
+    """Return the strategic region of each state listed in common/strategic_regions"""
+    region_of = {}
+    regions = parse_merge(os.path.join(game_root_dir, strategic_region_dir), merge_levels=1).to_python()
+    for region, data in regions.items():
+        if not isinstance(data, dict) or "states" not in data:
+            continue
+        states = data["states"]
+        if not isinstance(states, (list, tuple)):
+            states = [states]
+        for state in states:
+            region_of[str(state)] = region
+    return region_of
+
+
+# History subsystems of a game root, in the order they are parsed, merged and written:
+# key of state_file_dir -> (attribute of GameData, class, merge levels of the parser, file written)
+subsystems = {
+    "map_data": ("map_data", StateRegion, 1, "state_merging.txt"),
+    "buildings": ("buildings", Buildings, 2, "state_merging.txt"),
+    "pops": ("pops", Pops, 2, "state_merging.txt"),
+    "state": ("states", States, 2, "00_states.txt"),
+    "trade": ("trade", Trade, 2, "00_historical_trade.txt"),
+}
+
+subsystem_names = {
+    "map_data": "state regions",
+    "buildings": "buildings",
+    "pops": "pops",
+    "state": "states",
+    "trade": "trade",
+}
+
+# Totals of the merged diner states in the dry-run report: key -> (report field, method)
+summary_counts = {
+    "buildings": ("building_levels", "level_cnt"),
+    "pops": ("pops", "size_cnt"),
+    "trade": ("trade_entries", "entry_cnt"),
+}
+
+
+def parse_subsystem(game_root_dir:str, key:str, on_file=None, columnar:bool=False, log=print):
+    """Parse one subsystem of subsystems from a game root.
+    If columnar is set, the pops and the trade are returned as numpy columns.
+    log is called with the log lines of the subsystem."""
+    _, subsystem_class, merge_levels, _ = subsystems[key]
+    parser = parse_merge(os.path.join(game_root_dir, state_file_dir[key]), merge_levels=merge_levels, on_file=on_file)
+    subsystem = subsystem_class(parser, log=log)
+    if columnar and key == "pops":
+        subsystem = ColumnarPops(subsystem)
+    elif columnar and key == "trade":
+        subsystem = ColumnarTrade(subsystem)
+    return subsystem
+
+
+def terminate_executor(executor:ProcessPoolExecutor):
+    """Shut executor down, cancelling its pending tasks and killing the worker processes running
+    the others instead of waiting for them. If the executor does not expose its worker processes,
+    the running tasks are waited for."""
+    if hasattr(executor, "terminate_workers"):  # Python 3.14+
+        executor.terminate_workers()
+        return
+    # _processes is private to ProcessPoolExecutor, None once it is shut down
+    processes = getattr(executor, "_processes", None)
+    if processes is None:
+        # The worker processes cannot be reached, wait for the tasks they are running instead
+        executor.shutdown(cancel_futures=True)
+        return
+    processes = list(processes.values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def count_diners(subsystem, key:str, merge_dict:dict) -> dict[str, int]:
+    """Return the summary_counts total of a subsystem for every merged diner state"""
+    count = getattr(subsystem, summary_counts[key][1])
+    return {diner: count("s:" + diner) for diner, food_list in merge_dict.items() if food_list}
+
+
+def merge_subsystem(
+    game_root_dir:str, key:str, merge_dict:dict, path:str|None=None, columnar:bool=False, verbose:bool=True
+) -> dict:
+    """Parse, merge and write to path (nothing is written if it is None) one subsystem of
+    subsystems, in a worker process of StateMerger. Return what the merge keeps of it: the
+    summary_counts totals.
+    The log lines of the subsystem are printed if verbose is set, and dropped otherwise."""
+    subsystem = parse_subsystem(
+        game_root_dir, key, columnar=columnar, log=print if verbose else (lambda message: None)
+    )
+    subsystem.merge_states(merge_dict)
+    if path is not None:
+        subsystem.dump(path)
+    return {
+        "totals": count_diners(subsystem, key, merge_dict) if key in summary_counts else None,
+    }
+
+
 def clear_mod_dir(dir_dict:dict[str, str]):
     # Clear the output directory
     for dir in dir_dict.values():
@@ -113,51 +226,297 @@ def clean_v3_yml_numbered_keys(yml_path:str) -> str:
     return cleaned
 
 
+class GameData:
+    """Parsed state data of a game root, which can be forked cheaply for each merge plan.
+    If cache_files is set, the script and localization files read while merging are kept
+    in file_cache and shared by all forks, for processes merging many plans.
+    If columnar is set, the pops and the trade are held as numpy columns, see pops.ColumnarPops
+    and trade.ColumnarTrade.
+    on_file is called with (files done, files total, path) after each parsed file.
+    log is called with the log lines of the subsystems, see parse_subsystem."""
+
+    def __init__(
+        self, game_root_dir:str|None=None, cache_files:bool=False, on_file=None, columnar:bool=False, log=print
+    ):
+        self.file_cache = {} if cache_files else None
+        self.map_data = StateRegion()
+        self.buildings = Buildings()
+        self.pops = Pops()
+        self.states = States()
+        self.trade = Trade()
+        if game_root_dir is None:
+            return
+        base_game_dir = {}
+        for key, value in state_file_dir.items():
+            base_game_dir[key] = os.path.join(game_root_dir, value)
+
+        parse_file = None
+        if on_file is not None:
+            files_total = sum(
+                1 for value in base_game_dir.values() for file in os.listdir(value) if file.endswith(".txt")
+            )
+            files_done = []
+
+            def parse_file(path):
+                files_done.append(path)
+                on_file(len(files_done), files_total, path)
+
+        for key, (attr, _, _, _) in subsystems.items():
+            setattr(self, attr, parse_subsystem(game_root_dir, key, on_file=parse_file, columnar=columnar, log=log))
+
+    def fork(self, merge_dict:dict):
+        """Return a copy of the data that can be merged with merge_dict without altering this one.
+        Only the states touched by merge_dict are copied, the others are shared."""
+        forked = GameData()
+        forked.file_cache = self.file_cache
+        forked.map_data = self.map_data.fork(merge_dict)
+        forked.buildings = self.buildings.fork(merge_dict)
+        forked.pops = self.pops.fork(merge_dict)
+        forked.states = self.states.fork(merge_dict)
+        forked.trade = self.trade.fork(merge_dict)
+        return forked
+
+
 class StateMerger:
-    def __init__(self, game_root_dir:str, write_dir:str, merge_dict:dict, cache_dir:str="./data"):
+    """Merge the states of a game root according to merge_dict and write the result to write_dir.
+    progress is called with a ProgressEvent at each step of the merge, in place of printing the log.
+    cancel is an object with an is_set() method, such as a threading.Event; once it is set, the
+    merge stops with MergeCancelled before the next file or state. write_dir, whose state files
+    are cleared when the StateMerger is created, then only holds what was written before the
+    cancel and has to be merged into again before the mod is used.
+    columnar is passed to GameData when the game data is parsed here.
+    If staged is set, merge_state_data parses, merges and writes one subsystem at a time and drops
+    it before the next one, so that only one subsystem is held in memory at once. Afterwards
+    map_data is only a StateRegion.hub_view and buildings, pops, states and trade are None.
+    If jobs is above 1, the merge is staged and merge_state_data hands the buildings, pops, states
+    and trade to a pool of jobs worker processes, each parsing, merging and writing one of them
+    while map_data is merged here and merge_misc_data runs. merge_misc_data waits for them before
+    it writes the files depending on the states, see wait_subsystems. A cancel kills the worker
+    processes still running. The progress of the state_data phase only counts the subsystems
+    merged here.
+    If emit_workers is above 1, the state regions, buildings and pops written here are formatted
+    in that many worker processes when they have at least emit_threshold states, see
+    emit.write_states."""
+
+    def __init__(self, game_root_dir:str, write_dir:str, merge_dict:dict, cache_dir:str="./data", dry_run:bool=False, game_data:GameData|None=None, progress=None, cancel=None, columnar:bool=False, staged:bool=False, jobs:int=1, emit_workers:int=1, emit_threshold:int|None=None):
         self.base_game_dir = {}
         self.mod_dir = {}
         self.game_root_dir = game_root_dir
         self.write_dir = write_dir
         self.merge_dict = merge_dict
         self.cache_dir = cache_dir
+        # In dry-run mode nothing is written, the planned changes are collected in report
+        self.dry_run = dry_run
+        self.report = {"states": {}, "misc_files": [], "map_objects": [], "loc_keys": {}}
+        self.progress = progress
+        self.cancel = cancel
+        self.phase = ""
+        self.columnar = columnar
+        self.staged = staged or jobs > 1
+        self.jobs = jobs
+        self.emit_workers = emit_workers
+        self.emit_threshold = emit_threshold
+        # Futures of the subsystems merged in worker processes, by key of subsystems
+        self.pending = {}
+        self.executor = None
+        # Totals of the diner states kept for the dry-run report when a subsystem is dropped
+        self.diner_totals = {}
 
         # Set the base game and mod directories
         for key, value in state_file_dir.items():
             self.base_game_dir[key] = os.path.join(game_root_dir, value)
             self.mod_dir[key] = os.path.join(write_dir, value)
-        clear_mod_dir(self.mod_dir)
-
-        # Parse State Regions data
-        parser = parse_merge(
-            self.base_game_dir["map_data"], merge_levels=1
-        )
-        self.map_data = StateRegion(parser)
-
-        # Parse Buildings data
-        parser = parse_merge(
-            self.base_game_dir["buildings"], merge_levels=2
-        )
-        self.buildings = Buildings(parser)
-
-        # Parse Pops data
-        parser = parse_merge(self.base_game_dir["pops"], merge_levels=2)
-        self.pops = Pops(parser)
-
-        # Parse States data
-        parser = parse_merge(
-            self.base_game_dir["state"], merge_levels=2
-        )
-        self.states = States(parser)
-
-        # Parse Trade data
-        parser = parse_merge(
-            self.base_game_dir["trade"], merge_levels=2
+        if not self.dry_run:
+            clear_mod_dir(self.mod_dir)
+
+        # Parse the game data, or fork the already parsed one so that it stays unmerged
+        # When staged, each subsystem is parsed by merge_state_data right before it is merged
+        self.start_phase("parse")
+        if game_data is not None:
+            game_data = game_data.fork(merge_dict)
+        elif not self.staged:
+            game_data = GameData(game_root_dir, on_file=self._parsed_file, columnar=columnar, log=self.log)
+        self.end_phase()
+        self.file_cache = None if game_data is None else game_data.file_cache
+        for key, (attr, _, _, _) in subsystems.items():
+            setattr(self, attr, None if game_data is None else getattr(game_data, attr))
+            if game_data is not None and key != "map_data":
+                # The lines of the subsystems go to the log of this merge, the fork is its own
+                getattr(self, attr).log = self.log
+        # What happens to the map object locators of the merged states, set before merging map_data
+        self.locator_plan = None
+        # State each hub of a merged state comes from, when the hubs are placed from the map
+        self.hub_sources = {}
+
+    def start_phase(self, phase:str):
+        self.phase = phase
+        self.emit("phase_start")
+
+    def end_phase(self):
+        self.emit("phase_end")
+
+    def emit(self, kind:str, done:int=0, total:int=0, unit:str="", message:str=""):
+        """Send a progress event of the current phase to the progress callback, if there is one"""
+        if self.progress is not None:
+            self.progress(ProgressEvent(kind, self.phase, done, total, unit, message))
+
+    def log(self, message:str):
+        """Print a log line, or send it as a progress event if there is a progress callback"""
+        if self.progress is None:
+            print(message)
+        else:
+            self.emit("log", message=message)
+
+    def check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            if self.executor is not None:
+                # Drop the subsystems still waiting for a worker process and stop the ones being
+                # merged, which may leave their common/history files half written
+                terminate_executor(self.executor)
+                self.executor = None
+                self.pending = {}
+            raise MergeCancelled(f"Merge cancelled during {self.phase}")
+
+    def _parsed_file(self, done:int, total:int, path:str):
+        self.emit("progress", done, total, "files", path)
+        self.check_cancelled()
+
+    def subsystem(self, key:str):
+        """Return a subsystem of subsystems, parsed now if it has not been"""
+        attr = subsystems[key][0]
+        if getattr(self, attr) is None:
+            self.log(f"Parsing {self.base_game_dir[key]}")
+            setattr(
+                self,
+                attr,
+                parse_subsystem(
+                    self.game_root_dir,
+                    key,
+                    on_file=lambda path: self.check_cancelled(),
+                    columnar=self.columnar,
+                    log=self.log,
+                ),
+            )
+        return getattr(self, attr)
+
+    def release_subsystem(self, key:str):
+        """Drop a merged and written subsystem, keeping what the rest of the merge needs of it"""
+        if self.dry_run and key in summary_counts:
+            self.diner_totals[key] = count_diners(self.subsystem(key), key, self.merge_dict)
+        if key == "map_data":
+            self.map_data = self.map_data.hub_view()
+        else:
+            setattr(self, subsystems[key][0], None)
+
+    def merge_state_data(
+        self,
+        ignoreSmallStates:bool=False,
+        smallStateLimit:int=4,
+        province_map=None,
+        trait_table:dict|None=None,
+    ):
+        """Merge the state data and write it to the mod directory.
+        If province_map (a ProvinceMap) is given, the hubs of each merged state are moved to the
+        hubs of its states closest to its centroid, see hubs.place_hubs.
+        trait_table: modifiers of the integration traits, see assets/state_traits.py"""
+        self.start_phase("state_data")
+        diners_total = max(len(self.merge_dict), 1)
+
+        def merge_progress(step:int, name:str):
+            def progress(done:int, total:int):
+                self.emit("progress", step * diners_total + done, steps * diners_total, "states", f"Merging {name}")
+                self.check_cancelled()
+            return progress
+
+        if not self.dry_run:
+            self.clear_state_files()
+        # Subsystems not parsed yet are merged in worker processes, once the mod files are cleared
+        pooled = [
+            key for key in subsystems if self.jobs > 1 and key != "map_data" and getattr(self, subsystems[key][0]) is None
+        ]
+        local = [key for key in subsystems if key not in pooled]
+        # Each subsystem merged here is merged then dumped, both steps count as one pass over the plan
+        steps = len(local) if self.dry_run else 2 * len(local)
+        if pooled:
+            self.executor = ProcessPoolExecutor(max_workers=min(self.jobs, len(pooled)))
+            for key in pooled:
+                path = None if self.dry_run else os.path.join(self.mod_dir[key], subsystems[key][3])
+                # The worker processes cannot reach the progress callback, their log lines are dropped
+                self.pending[key] = self.executor.submit(
+                    merge_subsystem, self.game_root_dir, key, self.merge_dict, path, self.columnar, self.progress is None
+                )
+        for pos, key in enumerate(local):
+            # Staged, each subsystem is written right after it is merged
+            step = 2 * pos if self.staged and not self.dry_run else pos
+            if key == "map_data":
+                self.merge_map_data(ignoreSmallStates, smallStateLimit, province_map, merge_progress(step, subsystem_names[key]))
+            else:
+                self.subsystem(key).merge_states(self.merge_dict, progress=merge_progress(step, subsystem_names[key]))
+            if self.staged:
+                if not self.dry_run:
+                    self.write_subsystem(key, step + 1, steps * diners_total)
+                self.release_subsystem(key)
+        if not self.staged and not self.dry_run:
+            for pos, key in enumerate(local, len(local)):
+                self.write_subsystem(key, pos, steps * diners_total)
+
+        if self.dry_run:
+            if not self.pending:
+                self.report["states"] = self.summarize_states()
+            self.end_phase()
+            return
+
+        # Write the integration traits the merged states use to mod directory
+        dir = os.path.join(self.write_dir, "common", "state_traits")
+        file_str = state_traits(integration_counts(self.map_data), trait_table)
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+        # Delete the file in dir if it exists
+        if os.path.exists(os.path.join(dir, "state_merging.txt")):
+            os.remove(os.path.join(dir, "state_merging.txt"))
+        with open(os.path.join(dir, "state_merging.txt"), "w", encoding="utf-8-sig") as file:
+            file.write(file_str)
+        self.end_phase()
+
+    def wait_subsystems(self):
+        """Wait for the subsystems merged in worker processes and keep what the merge needs of them"""
+        if not self.pending:
+            return
+        try:
+            while wait(self.pending.values(), timeout=0.2).not_done:
+                self.check_cancelled()
+            for key, future in self.pending.items():
+                result = future.result()
+                self.log(f"Merged {subsystem_names[key]} in a worker process")
+                if self.dry_run and key in summary_counts:
+                    self.diner_totals[key] = result["totals"]
+        finally:
+            self.pending = {}
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+        if self.dry_run:
+            self.report["states"] = self.summarize_states()
+
+    def merge_map_data(self, ignoreSmallStates:bool, smallStateLimit:int, province_map, progress):
+        """Merge map_data, once the hubs the locators follow are known"""
+        self.subsystem("map_data")
+        self.locator_plan = locator_plan(self.map_data, self.merge_dict)
+        if province_map is not None:
+            candidates = hub_candidates(self.map_data, self.merge_dict)
+            state_ids = {state: item.id for state, item in self.map_data.items()}
+        self.map_data.merge_states(
+            self.merge_dict,
+            ignoreSmallStates=ignoreSmallStates,
+            smallStateLimit=smallStateLimit,
+            progress=progress,
         )
-        self.trade = Trade(parser)
+        if province_map is not None:
+            self.place_hubs(candidates, state_ids, province_map)
 
-    def merge_state_data(self, ignoreSmallStates:bool=False, smallStateLimit:int=4):
-        # Write cleared base game data to mod directory
+    def clear_state_files(self):
+        """Write the state files of the base game empty to the mod directory, so that only the
+        merged ones written by write_subsystem count"""
         for key, value in self.base_game_dir.items():
             for file in os.listdir(value):
                 if file == "state_merging.txt":
@@ -168,44 +527,70 @@ class StateMerger:
         if os.path.exists(os.path.join(self.mod_dir["map_data"], "99_seas.txt")):
             os.remove(os.path.join(self.mod_dir["map_data"], "99_seas.txt"))
 
-        # Merge map_data
-        self.map_data.merge_states(
-            self.merge_dict,
-            ignoreSmallStates=ignoreSmallStates,
-            smallStateLimit=smallStateLimit,
-        )
-        self.map_data.dump(os.path.join(self.mod_dir["map_data"], "state_merging.txt"))
-        # Merge buildings
-        self.buildings.merge_states(self.merge_dict)
-        self.buildings.dump(os.path.join(self.mod_dir["buildings"], "state_merging.txt"))
-        # Merge pops
-        self.pops.merge_states(self.merge_dict)
-        self.pops.dump(os.path.join(self.mod_dir["pops"], "state_merging.txt"))
-        # Merge states
-        self.states.merge_states(self.merge_dict)
-        self.states.dump(os.path.join(self.mod_dir["state"], "00_states.txt"))
-        # Merge trade
-        self.trade.merge_states(self.merge_dict)
-        self.trade.dump(os.path.join(self.mod_dir["trade"], "00_historical_trade.txt"))
-
-        # Copy state_trait file to mod directory
-        dir = os.path.join(self.write_dir, "common", "state_traits")
-        file_str = vic3_state_merger.assets.state_traits.str
-        if not os.path.exists(dir):
-            os.makedirs(dir)
-        # Delete the file in dir if it exists
-        if os.path.exists(os.path.join(dir, "state_merging.txt")):
-            os.remove(os.path.join(dir, "state_merging.txt"))
-        with open(os.path.join(dir, "state_merging.txt"), "w", encoding="utf-8-sig") as file:
-            file.write(file_str)
-
-    def merge_misc_data(self):
-        for dir in replace_file_dir:
-            base_game_dir = os.path.join(self.game_root_dir, dir)
-            mod_dir = os.path.join(self.write_dir, dir)
-            print("Scanning", base_game_dir)
-
-            # Clear the output directory
+    def write_subsystem(self, key:str, step:int, total:int):
+        self.check_cancelled()
+        path = os.path.join(self.mod_dir[key], subsystems[key][3])
+        self.emit("progress", step * max(len(self.merge_dict), 1), total, "states", f"Writing {path}")
+        subsystem = getattr(self, subsystems[key][0])
+        if self.emit_workers > 1 and isinstance(subsystem, (StateRegion, Buildings, Pops)):
+            subsystem.dump(path, workers=self.emit_workers, threshold=self.emit_threshold)
+        else:
+            subsystem.dump(path)
+
+    def place_hubs(self, candidates:dict, state_ids:dict, province_map):
+        """Move the hubs of the merged states and make their locators follow them"""
+        self.hub_sources = place_hubs(self.map_data, candidates, province_map)
+        for diner, sources in self.hub_sources.items():
+            diner_id = self.map_data[diner].id
+            for attr, source in sources.items():
+                self.log(f"{diner} {attr} hub: {getattr(self.map_data[diner], attr)} from {source}")
+                moves = self.locator_plan[attr]
+                for state, _ in candidates[diner][attr]:
+                    moves[state_ids[state]] = None
+                moves[state_ids[source]] = diner_id
+                if source == diner:
+                    moves.pop(diner_id)
+        if self.dry_run:
+            self.report["hubs"] = {
+                diner: {attr: {"province": getattr(self.map_data[diner], attr), "from": source} for attr, source in sources.items()}
+                for diner, sources in self.hub_sources.items()
+            }
+
+    def read_lines(self, path:str) -> list[str]:
+        """Read the lines of a game file, from the file cache if there is one"""
+        if self.file_cache is not None and ("lines", path) in self.file_cache:
+            return self.file_cache[("lines", path)]
+        with open(path, "r", encoding="utf-8-sig") as file:
+            lines = file.readlines()
+        if self.file_cache is not None:
+            self.file_cache[("lines", path)] = lines
+        return lines
+
+    def read_loc(self, path:str, lang:str) -> dict:
+        """Read a localization yml file, from the file cache if there is one"""
+        if self.file_cache is not None and ("loc", path) in self.file_cache:
+            return self.file_cache[("loc", path)]
+        cleaned_yml = clean_v3_yml_numbered_keys(path)
+        data = yaml.safe_load(cleaned_yml)[lang]
+        if self.file_cache is not None:
+            self.file_cache[("loc", path)] = data
+        return data
+
+    def food_pattern(self):
+        """Return a compiled pattern matching any food state name, or None if nothing is merged"""
+        foods = [food for food_list in self.merge_dict.values() for food in food_list]
+        if not foods:
+            return None
+        return re.compile(r"\b(?:" + "|".join(re.escape(food) for food in foods) + r")\b")
+
+    def merge_misc_dir(self, dir:str, remove:bool=False, food_pattern=None):
+        """Replace food state names in the script files of dir with their diner, or with "" if remove is set"""
+        base_game_dir = os.path.join(self.game_root_dir, dir)
+        mod_dir = os.path.join(self.write_dir, dir)
+        self.log(f"Scanning {base_game_dir}")
+
+        # Clear the output directory
+        if not self.dry_run:
             if not os.path.exists(mod_dir):
                 os.makedirs(mod_dir)
             else:
@@ -213,93 +598,73 @@ class StateMerger:
                     if os.path.isdir(os.path.join(mod_dir, file)):  # If is folder
                         continue
                     os.remove(os.path.join(mod_dir, file))
+        if food_pattern is None:
+            return
+
+        for game_file in os.listdir(base_game_dir):
+            if os.path.isdir(os.path.join(base_game_dir, game_file)):  # If is folder
+                continue
+            self.check_cancelled()
+            self.misc_files_done += 1
+            self.emit("progress", self.misc_files_done, self.misc_files_total, "files", game_file)
+
+            # Read game file
+            lines = self.read_lines(os.path.join(base_game_dir, game_file))
+
+            # Find any food state name in the file
+            if not food_pattern.search("".join(lines)):
+                continue
+
+            self.log(f"Modifying {os.path.join(base_game_dir, game_file)}")
+            if self.dry_run:
+                self.report["misc_files"].append(
+                    {
+                        "file": os.path.join(dir, game_file).replace("\\", "/"),
+                        "lines": len(lines),
+                        "changed_lines": sum(1 for line in lines if food_pattern.search(line)),
+                    }
+                )
+                continue
+
+            # Replace all state names with their merged counterparts, or with "" when removing
+            output_file = os.path.join(mod_dir, game_file)
+            # Create the output directory if it doesn't exist
+            if not os.path.exists(os.path.dirname(output_file)):
+                os.makedirs(os.path.dirname(output_file))
+            with open(output_file, "w", encoding="utf-8-sig") as file:
+                for line in lines:
+                    for diner, food_list in self.merge_dict.items():
+                        for food in food_list:
+                            line = re.sub(
+                                r"\b" + re.escape(food) + r"\b", "" if remove else diner, line
+                            )
+                    file.write(line)
 
-            for game_file in os.listdir(base_game_dir):
-                if os.path.isdir(os.path.join(base_game_dir, game_file)):  # If is folder
-                    continue
-
-                # Read game file
-                with open(os.path.join(base_game_dir, game_file), "r", encoding="utf-8-sig") as file:
-                    lines = file.readlines()
-                text = "".join(lines)
-
-                for diner, food_list in self.merge_dict.items():
-                    for food in food_list:
-                        # Find all state names in the file
-                        if re.search(r"\b" + re.escape(food) + r"\b", text):
-                            break
-                    else:
-                        continue
-                    break
-                else:
-                    continue
-
-                print("Modifying", os.path.join(base_game_dir, game_file))
-                # Replace all state names with their merged counterparts
-                output_file = os.path.join(mod_dir, game_file)
-                # Create the output directory if it doesn't exist
-                if not os.path.exists(os.path.dirname(output_file)):
-                    os.makedirs(os.path.dirname(output_file))
-                with open(output_file, "w", encoding="utf-8-sig") as file:
-                    for line in lines:
-                        for diner, food_list in self.merge_dict.items():
-                            for food in food_list:
-                                # Replace "food" with "diner"
-                                line = re.sub(
-                                    r"\b" + re.escape(food) + r"\b", diner, line
-                                )
-                        file.write(line)
-
+    def merge_misc_data(self):
+        self.start_phase("misc_data")
+        food_pattern = self.food_pattern()
+        self.misc_files_done = 0
+        self.misc_files_total = 0
+        if food_pattern is not None:
+            for dir in replace_file_dir + remove_file_dir:
+                base_game_dir = os.path.join(self.game_root_dir, dir)
+                self.misc_files_total += sum(
+                    1 for file in os.listdir(base_game_dir) if not os.path.isdir(os.path.join(base_game_dir, file))
+                )
+        for dir in replace_file_dir:
+            self.merge_misc_dir(dir, food_pattern=food_pattern)
         for dir in remove_file_dir:
-            base_game_dir = os.path.join(self.game_root_dir, dir)
-            mod_dir = os.path.join(self.write_dir, dir)
-            print("Scanning", base_game_dir)
+            self.merge_misc_dir(dir, remove=True, food_pattern=food_pattern)
+        self.merge_map_object_data()
+        self.wait_subsystems()
 
-            # Clear the output directory
-            if not os.path.exists(mod_dir):
-                os.makedirs(mod_dir)
-            else:
-                for file in os.listdir(mod_dir):
-                    if os.path.isdir(os.path.join(mod_dir, file)):  # If is folder
-                        continue
-                    os.remove(os.path.join(mod_dir, file))
-
-            for game_file in os.listdir(base_game_dir):
-                if os.path.isdir(os.path.join(base_game_dir, game_file)):  # If is folder
-                    continue
+        if self.dry_run:
+            self.end_phase()
+            return
 
-                # Read game file
-                with open(os.path.join(base_game_dir, game_file), "r", encoding="utf-8-sig") as file:
-                    lines = file.readlines()
-
-                for diner, food_list in self.merge_dict.items():
-                    for food in food_list:
-                        # Find all state names in the file
-                        if re.search(r"\b" + re.escape(food) + r"\b", "".join(lines)):
-                            break
-                    else:
-                        continue
-                    break
-                else:
-                    continue
-
-                print("Modifying", os.path.join(base_game_dir, game_file))
-                # Replace all state names with ""
-                output_file = os.path.join(mod_dir, game_file)
-                # Create the output directory if it doesn't exist
-                if not os.path.exists(os.path.dirname(output_file)):
-                    os.makedirs(os.path.dirname(output_file))
-                with open(output_file, "w", encoding="utf-8-sig") as file:
-                    for line in lines:
-                        for diner, food_list in self.merge_dict.items():
-                            for food in food_list:
-                                # Replace "food" with ""
-                                line = re.sub(r"\b" + re.escape(food) + r"\b", "", line)
-                        file.write(line)
-
-        # Copy USA flag adaptation file to mod directory
+        # Write the USA flag adaptation file, with the star counts usa_state_counter can reach
         dir = os.path.join(self.write_dir, "common", "flag_definitions")
-        file_str = vic3_state_merger.assets.flag_definitions_usa.str
+        file_str = flag_definitions_usa(usa_state_counter_max(self.subsystem("map_data")))
         if not os.path.exists(dir):
             os.makedirs(dir)
         # Delete the file in dir if it exists
@@ -308,9 +673,9 @@ class StateMerger:
         with open(os.path.join(dir, "state_merging.txt"), "w", encoding="utf-8-sig") as file:
             file.write(file_str)
 
-        # Copy USA state counting file to mod directory
+        # Write the USA state counting script value, covering the integration counts of the merged map
         dir = os.path.join(self.write_dir, "common", "script_values")
-        file_str = vic3_state_merger.assets.usa_state_counter.str
+        file_str = usa_state_counter(integration_counts(self.subsystem("map_data")))
         if not os.path.exists(dir):
             os.makedirs(dir)
         # Delete the file in dir if it exists
@@ -318,67 +683,142 @@ class StateMerger:
             os.remove(os.path.join(dir, "state_merging.txt"))
         with open(os.path.join(dir, "state_merging.txt"), "w", encoding="utf-8-sig") as file:
             file.write(file_str)
+        self.end_phase()
+
+    def merge_map_object_data(self):
+        """Drop the generated map object locators of the food states, keeping the ones of the hubs
+        the merged states inherit under the id of their diner"""
+        if self.locator_plan is None:
+            # merge_state_data has not run, map_data is not merged yet
+            self.locator_plan = locator_plan(self.subsystem("map_data"), self.merge_dict)
+        for file, attr in locator_kinds.items():
+            self.check_cancelled()
+            base_game_file = os.path.join(self.game_root_dir, "gfx", "map", "map_object_data", file)
+            mod_file = os.path.join(self.write_dir, "gfx", "map", "map_object_data", file)
+            moves = self.locator_plan[attr]
+            if not moves:
+                if not self.dry_run and os.path.exists(mod_file):
+                    # Left over from a previous merge into the same mod directory
+                    os.remove(mod_file)
+                continue
+            if not os.path.exists(base_game_file):
+                self.log(f"Warning: {base_game_file} not found, skipping map object data")
+                continue
+            self.log(f"Modifying {base_game_file}")
+            counts = transform_locators(base_game_file, None if self.dry_run else mod_file, moves)
+            if self.dry_run:
+                self.report["map_objects"].append(
+                    {"file": f"gfx/map/map_object_data/{file}", **counts}
+                )
 
     def merge_loc_data(self):
+        self.start_phase("loc_data")
+        map_data = self.subsystem("map_data")
         # Read localization yml files
-        for lang, loc_dir in loc_file_dir.items():
-            print(f"Reading localization files for {lang}...")
+        for lang_done, (lang, loc_dir) in enumerate(loc_file_dir.items()):
+            self.check_cancelled()
+            self.emit("progress", lang_done, len(loc_file_dir), "files", lang)
+            self.log(f"Reading localization files for {lang}...")
             hub_file = os.path.join(
                 self.game_root_dir, loc_dir, f"hub_names_{lang}.yml"
             )
             miss_dict = {}
-            with open(hub_file, "r", encoding="utf-8-sig") as f:
-                cleaned_yml = clean_v3_yml_numbered_keys(hub_file)
-                data = yaml.safe_load(cleaned_yml)[lang]
-                # Process the localization data as needed
-                print(f"Processing {hub_file} for {lang}")
-                for diner, food_list in self.merge_dict.items():
-                    # Skip states with empty food lists (no merging needed)
-                    if not food_list:
-                        continue
+            # Names of existing keys, for the hubs moved by place_hubs
+            replace_dict = {}
+            data = self.read_loc(hub_file, lang)
+            # Process the localization data as needed
+            self.log(f"Processing {hub_file} for {lang}")
+            for diner, food_list in self.merge_dict.items():
+                # Skip states with empty food lists (no merging needed)
+                if not food_list:
+                    continue
 
-                    # Check if the diner state exists in map data
-                    if diner not in self.map_data:
-                        print(
-                            f"Warning: {diner} not found in map data, skipping localization processing"
-                        )
-                        continue
+                # Check if the diner state exists in map data
+                if diner not in map_data:
+                    self.log(
+                        f"Warning: {diner} not found in map data, skipping localization processing"
+                    )
+                    continue
 
-                    # Check if city, wood, mine, farm, port attribute of diner are in the localization data
-                    for attr in ["city", "wood", "mine", "farm", "port"]:
-                        if getattr(self.map_data[diner], attr, "") == "":
-                            continue
-                        if f"HUB_NAME_{diner}_{attr}" in data.keys():
-                            continue
-                        # If not found, add a missing hub name entry
-                        print(f"Missing HUB_NAME_{diner}_{attr} in {lang}")
-                        # Search for attribute in the food_list
-                        for food in food_list:
-                            if f"HUB_NAME_{food}_{attr}" in data.keys():
-                                miss_dict[f"HUB_NAME_{diner}_{attr}"] = (
-                                    '"' + data[f"HUB_NAME_{food}_{attr}"] + '"'
-                                )
-                                print(miss_dict[f"HUB_NAME_{diner}_{attr}"])
-                                break
-            # Write the missing hub names to the localization file
-            write_file = os.path.join(
-                self.write_dir, loc_dir, f"hub_names_states_merging_{lang}.yml"
+                # Check if city, wood, mine, farm, port attribute of diner are in the localization data
+                for attr in ["city", "wood", "mine", "farm", "port"]:
+                    if getattr(map_data[diner], attr, "") == "":
+                        continue
+                    source = self.hub_sources.get(diner, {}).get(attr, diner)
+                    if source != diner and f"HUB_NAME_{source}_{attr}" in data.keys():
+                        # The hub was moved to the one of source, so is its name
+                        entries = replace_dict if f"HUB_NAME_{diner}_{attr}" in data.keys() else miss_dict
+                        entries[f"HUB_NAME_{diner}_{attr}"] = '"' + data[f"HUB_NAME_{source}_{attr}"] + '"'
+                        continue
+                    if f"HUB_NAME_{diner}_{attr}" in data.keys():
+                        continue
+                    # If not found, add a missing hub name entry
+                    self.log(f"Missing HUB_NAME_{diner}_{attr} in {lang}")
+                    # Search for attribute in the food_list
+                    for food in food_list:
+                        if f"HUB_NAME_{food}_{attr}" in data.keys():
+                            miss_dict[f"HUB_NAME_{diner}_{attr}"] = (
+                                '"' + data[f"HUB_NAME_{food}_{attr}"] + '"'
+                            )
+                            self.log(miss_dict[f"HUB_NAME_{diner}_{attr}"])
+                            break
+            if self.dry_run:
+                self.report["loc_keys"][lang] = list(miss_dict.keys()) + list(replace_dict.keys())
+                continue
+            # Write the missing hub names to the localization file, and the renamed ones to the
+            # replace folder, which overrides existing keys
+            self.write_loc(
+                os.path.join(self.write_dir, loc_dir, f"hub_names_states_merging_{lang}.yml"), lang, miss_dict
             )
-            if miss_dict:
-                print(f"Modifying {write_file}")
-                # Create the output directory if it doesn't exist
-                if not os.path.exists(os.path.dirname(write_file)):
-                    os.makedirs(os.path.dirname(write_file))
-                with open(write_file, "w", encoding="utf-8-sig") as f:
-                    content = yaml.dump(
-                        {lang: miss_dict},
-                        allow_unicode=True,
-                        default_style="",
-                        default_flow_style=False,
-                    )
-                    # Remove all '\'' in write_file
-                    content = content.replace("'", "")
-                    f.write(content)
+            self.write_loc(
+                os.path.join(self.write_dir, loc_dir, "replace", f"hub_names_states_merging_{lang}.yml"),
+                lang,
+                replace_dict,
+            )
+        # In case merge_misc_data did not run
+        self.wait_subsystems()
+        self.emit("progress", len(loc_file_dir), len(loc_file_dir), "files")
+        self.end_phase()
+
+    def write_loc(self, write_file:str, lang:str, entries:dict):
+        if not entries and os.path.exists(write_file):
+            # Left over from a previous merge into the same mod directory
+            os.remove(write_file)
+        if not entries:
+            return
+        self.log(f"Modifying {write_file}")
+        # Create the output directory if it doesn't exist
+        if not os.path.exists(os.path.dirname(write_file)):
+            os.makedirs(os.path.dirname(write_file))
+        with open(write_file, "w", encoding="utf-8-sig") as f:
+            content = yaml.dump(
+                {lang: entries},
+                allow_unicode=True,
+                default_style="",
+                default_flow_style=False,
+            )
+            # Remove all '\'' in write_file
+            content = content.replace("'", "")
+            f.write(content)
+
+    def summarize_states(self) -> dict:
+        """Return the province, pop, building and trade totals of every merged diner state"""
+        totals = {
+            field: self.diner_totals[key] if key in self.diner_totals else count_diners(self.subsystem(key), key, self.merge_dict)
+            for key, (field, _) in summary_counts.items()
+        }
+        summary = {}
+        for diner, food_list in self.merge_dict.items():
+            if not food_list or diner not in self.map_data:
+                continue
+            summary[diner] = {
+                "foods": list(food_list),
+                "provinces": self.map_data[diner].province_cnt(),
+                "pops": totals["pops"][diner],
+                "building_levels": totals["building_levels"][diner],
+                "trade_entries": totals["trade_entries"][diner],
+            }
+        return summary
 
     def copy_state_data(self):
         for key in state_file_dir.keys():
@@ -1,8 +1,46 @@
+import copy
 from pyradox import Tree
 
+from vic3_state_merger.emit import write_states
+
 seq_str = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight"]
 
 
+def normalize_province(province:str) -> str:
+    """Return a province id in the "xRRGGBB" form of provinces.png, whatever its quotes and case"""
+    province = str(province).strip('"')
+    return "x" + province[1:].upper()
+
+
+def merge_groups(merge_dict:dict, states) -> dict[str, list[str]]:
+    """Return the states making up each merged state of merge_dict, diner first, in the order the
+    merge takes their hubs from. The plan is followed in order like StateRegion.merge_states, so a
+    state merged into a food before the food is merged goes along with it. States not in states
+    are left out, and so are the foods of a diner merged into another state earlier, which
+    validate_plan reports as errors."""
+    members = {}
+    for diner, food_list in merge_dict.items():
+        if not food_list or not isinstance(food_list, list) or diner not in states:
+            continue
+        group = members.get(diner)
+        if group == []:
+            # Eaten earlier in the plan
+            continue
+        if group is None:
+            group = members[diner] = [diner]
+        for food in food_list:
+            if food not in states or food == diner:
+                continue
+            eaten = members.get(food)
+            if eaten is None:
+                group.append(food)
+                members[food] = []
+            else:
+                group += eaten
+                eaten.clear()
+    return {diner: group for diner, group in members.items() if len(group) > 1}
+
+
 class StateRegionItem:
     """Class for state objects in '/map_data/state_regions/'
     name: string, state name
@@ -20,10 +58,11 @@ class StateRegionItem:
     arable_resources: list of string, what kind of available agriculture buildings the state has
     capped_resources: dict, capped resources in the state
     naval_exit_id: int, corresponding sea node id for the state
+    integration_cnt: int, number of states merged in the state, as given by its integration trait
     """
 
-    def __init__(self, name, dict:dict):
-        """Initialize the state object with a dictionary"""
+    def __init__(self, name, dict:dict, log=print):
+        """Initialize the state object with a dictionary, log is called with each log line"""
         self.name = ""
         self.id = 0
         self.subsistence_building = ""
@@ -43,6 +82,7 @@ class StateRegionItem:
         self.rubber = [0, 0]  # rubber[0]: undiscovered, rubber[1]: discovered
         self.oil = 0
         self.naval_exit_id = -1
+        self.integration_cnt = 1
 
         self.name = name
         dict_data = dict[name]
@@ -125,20 +165,23 @@ class StateRegionItem:
                 elif resource["type"] == "building_oil_rig":
                     self.oil = int(resource["undiscovered_amount"])
                 else:
-                    print(f'Unknown resource type: {resource["type"]}')
+                    log(f'Unknown resource type: {resource["type"]}')
         if "naval_exit_id" in dict_data.keys():
             self.naval_exit_id = dict_data["naval_exit_id"]
         else:
             self.naval_exit_id = -1
+        # Number of merged states, read once from the traits and then kept up to date by merge
+        self.integration_cnt = 1
+        for i in range(2, 9):
+            if f"state_trait_{seq_str[i]}_states_integration" in self.traits:
+                self.integration_cnt = i
+                break
 
     def merge_states_cnt(self):
         """Determine the number of states merged in the state"""
         if self.is_sea_node():
             return 0
-        for i in range(2, 9):
-            if f"state_trait_{seq_str[i]}_states_integration" in self.traits:
-                return i
-        return 1
+        return self.integration_cnt
 
     def is_sea_node(self):
         """Determine if the state is a sea node"""
@@ -158,10 +201,10 @@ class StateRegionItem:
             return True
         return False
 
-    def merge(self, other, ignoreSmallStates:bool=False, smallStateLimit:int=4):
-        """Merge two state objects."""
+    def merge(self, other, ignoreSmallStates:bool=False, smallStateLimit:int=4, log=print):
+        """Merge two state objects, log is called with each log line"""
         if self.is_sea_node() or other.is_sea_node():
-            print(f"Error: Cannot merge sea node with other state")
+            log(f"Error: Cannot merge sea node with other state")
             return
         # provinces: list append
         self.provinces += other.provinces
@@ -193,8 +236,12 @@ class StateRegionItem:
             self.traits.append(
                 f"state_trait_{seq_str[totalMergeStatesCnt]}_states_integration"
             )
+            self.integration_cnt = totalMergeStatesCnt
         elif totalMergeStatesCnt >= 8:
             self.traits.append("state_trait_eight_states_integration")
+            self.integration_cnt = 8
+        else:
+            self.integration_cnt = 1
         # arable_land: int sum
         self.arable_land += other.arable_land
         # arable_resources: list append
@@ -233,6 +280,7 @@ class StateRegionItem:
         other.gold = [0, 0]
         other.rubber = [0, 0]
         other.oil = 0
+        other.integration_cnt = 1
 
     def __str__(self):
         """Export the state object to a string"""
@@ -371,38 +419,120 @@ class StateRegionItem:
         return state_dict
 
 
+def state_region_str(name:str, state:StateRegionItem) -> str:
+    return str(state)
+
+
+class StateHubItem:
+    """Attributes of a merged state that the merge needs once map_data is written: its hubs, for
+    the hub names, and its province and integration counts
+    name: string, state name
+    id: int, state id
+    city, port, farm, mine, wood: string, province ids of the hubs of the state
+    provinces: int, number of provinces in the state
+    integration_cnt: int, number of states merged in the state, 0 for sea nodes
+    """
+
+    def __init__(self, state:StateRegionItem):
+        self.name = state.name
+        self.id = state.id
+        self.city = state.city
+        self.port = state.port
+        self.farm = state.farm
+        self.mine = state.mine
+        self.wood = state.wood
+        self.provinces = state.province_cnt()
+        self.integration_cnt = state.merge_states_cnt()
+
+    def merge_states_cnt(self):
+        return self.integration_cnt
+
+    def is_sea_node(self):
+        return self.integration_cnt == 0
+
+    def province_cnt(self):
+        return self.provinces
+
+
 class StateRegion(dict):
     """
     Dictionary of StateRegionItem objects
+    province_index: dict, normalized province id -> name of the state the province is in, kept up
+        to date by merge_state
+    duplicate_provinces: dict, normalized province id -> names of the states listing it, for the
+        provinces listed by more than one state when the StateRegion was built
+    log: function called with each log line
     """
 
-    def __init__(self, source:dict|Tree|None=None):
+    def __init__(self, source:dict|Tree|None=None, log=print):
+        self.log = log
         if source is None:
             super().__init__()
         elif isinstance(source, Tree):
             source_dict = source.to_python()
             for state_id in source_dict.keys():
-                self[state_id] = StateRegionItem(state_id, source_dict)
+                self[state_id] = StateRegionItem(state_id, source_dict, log=log)
         elif isinstance(source, dict):
             for state_id in source.keys():
-                self[state_id] = StateRegionItem(state_id, source)
+                self[state_id] = StateRegionItem(state_id, source, log=log)
         else:
             raise TypeError(
                 "StateRegion can only be initialized with a Tree object, a dict, or None"
             )
+        self.index_provinces()
+
+    def index_provinces(self):
+        """Build province_index and duplicate_provinces from the provinces of the states"""
+        self.province_index = {}
+        self.duplicate_provinces = {}
+        for state_id, state in self.items():
+            for province in state.provinces:
+                province = normalize_province(province)
+                if province in self.province_index and self.province_index[province] != state_id:
+                    self.duplicate_provinces.setdefault(province, [self.province_index[province]]).append(state_id)
+                    continue
+                self.province_index[province] = state_id
+
+    def state_of(self, province:str) -> str|None:
+        """Return the name of the state province is in, or None if it is in none"""
+        return self.province_index.get(normalize_province(province))
+
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing every state the merge plan does not touch"""
+        forked = StateRegion(log=self.log)
+        forked.update(self)
+        for diner, food_list in merge_dict.items():
+            for state_id in [diner, *food_list]:
+                if state_id in self:
+                    forked[state_id] = copy.deepcopy(self[state_id])
+        forked.province_index = dict(self.province_index)
+        forked.duplicate_provinces = self.duplicate_provinces
+        return forked
 
     def merge_state(
         self, diner, food, ignoreSmallStates:bool=False, smallStateLimit:int=4
     ):
+        # The provinces of food move to diner, or are dropped with food if merge refuses it
+        owner = None if self[diner].is_sea_node() or self[food].is_sea_node() else diner
+        for province in self[food].provinces:
+            province = normalize_province(province)
+            if self.province_index.get(province) != food:
+                continue
+            if owner is None:
+                del self.province_index[province]
+            else:
+                self.province_index[province] = owner
         self[diner].merge(
             self[food],
             ignoreSmallStates=ignoreSmallStates,
             smallStateLimit=smallStateLimit,
+            log=self.log,
         )
         self.pop(food)
 
-    def merge_states(self, merge_dict:dict, ignoreSmallStates:bool=False, smallStateLimit:int=4):
-        for diner, food_list in merge_dict.items():
+    def merge_states(self, merge_dict:dict, ignoreSmallStates:bool=False, smallStateLimit:int=4, progress=None):
+        # progress is called with (diners done, diners total) after each diner
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
             for food in food_list:
                 self.merge_state(
                     diner,
@@ -410,6 +540,8 @@ class StateRegion(dict):
                     ignoreSmallStates=ignoreSmallStates,
                     smallStateLimit=smallStateLimit,
                 )
+            if progress is not None:
+                progress(done, len(merge_dict))
 
     def __str__(self, include_sea_nodes:bool=False):
         state_str = ""
@@ -419,9 +551,17 @@ class StateRegion(dict):
             state_str += str(state_region_item)
         return state_str
 
-    def dump(self, dir, include_sea_nodes:bool=False):
+    def dump(self, dir, include_sea_nodes:bool=False, workers:int=1, threshold:int|None=None):
+        """Write the states to dir, formatting them in worker processes if there are workers and
+        at least threshold states, see emit.write_states"""
+        items = [(state_id, item) for state_id, item in self.items() if include_sea_nodes or not item.is_sea_node()]
         with open(dir, "w", encoding="utf-8-sig") as file:
-            file.write(self.__str__(include_sea_nodes=include_sea_nodes))
+            write_states(file, items, state_region_str, workers, threshold)
+
+    def hub_view(self) -> dict[str, StateHubItem]:
+        """Return the StateHubItem of each state, a small copy of the states to keep once the
+        state regions are written"""
+        return {state_id: StateHubItem(state) for state_id, state in self.items()}
 
     def provinces_count_dict(self):
         """Return a dictionary of province counts for each state"""
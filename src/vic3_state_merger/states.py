@@ -1,9 +1,19 @@
+import copy
 from pyradox import Tree
 
 
 class States(dict):
-    def __init__(self, source:dict|Tree|None=None):
+    """
+    Dictionary of the state history of each "s:STATE_X" state
+    indexes: dict, state id -> lookup tables of the state built by state_index, for the states
+        merge_state has merged into
+    log: function called with each log line
+    """
+
+    def __init__(self, source:dict|Tree|None=None, log=print):
         super().__init__()
+        self.log = log
+        self.indexes = {}
         if source is None:
             return
         if isinstance(source, Tree):
@@ -19,7 +29,7 @@ class States(dict):
 
     def format(self):
         for state_id in self.keys():
-            print(f"Formatting state data: {state_id}")
+            self.log(f"Formatting state data: {state_id}")
             if not isinstance(self[state_id], dict):
                 self[state_id] = {"create_state": []}
                 continue
@@ -50,28 +60,63 @@ class States(dict):
                 elif not isinstance(self[state_id]["add_claim"], list):
                     self[state_id]["add_claim"] = [self[state_id]["add_claim"]]
 
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing every state the merge plan does not touch"""
+        forked = States(log=self.log)
+        forked.update(self)
+        for diner, food_list in merge_dict.items():
+            for state_id in [diner, *food_list]:
+                if ("s:" + state_id) in self.keys():
+                    forked["s:" + state_id] = copy.deepcopy(self["s:" + state_id])
+        return forked
+
+    def state_index(self, state_id:str) -> dict:
+        """Return the lookup tables of a state, built on first use:
+        countries: dict, country tag -> its first create_state entry
+        owned: dict, country tag -> set of the provinces of that entry
+        add_homeland, add_claim: sets of the cultures and countries of the lists of the same name,
+            the lists keep the order they are written in
+        """
+        if state_id not in self.indexes:
+            countries = {}
+            owned = {}
+            for create_state in self[state_id]["create_state"]:
+                if create_state["country"] not in countries:
+                    countries[create_state["country"]] = create_state
+                    owned[create_state["country"]] = set(create_state["owned_provinces"])
+            self.indexes[state_id] = {
+                "countries": countries,
+                "owned": owned,
+                "add_homeland": set(self[state_id].get("add_homeland", [])),
+                "add_claim": set(self[state_id].get("add_claim", [])),
+            }
+        return self.indexes[state_id]
+
     def merge_state(self, this:str, other:str):  # this, other are "state_id" strings
-        # Merge create_state
-        for province in self[other]["create_state"]:
-            for province_ref in self[this]["create_state"]:
-                if province["country"] == province_ref["country"]:
-                    province_ref["owned_provinces"] += province["owned_provinces"]
-                    break
+        index = self.state_index(this)
+        # Merge create_state: provinces of a country this already has go to its entry, skipping
+        # the ones it already owns there, the other entries are appended
+        for create_state in self[other]["create_state"]:
+            country = create_state["country"]
+            if country in index["countries"]:
+                owned = index["owned"][country]
+                provinces = [province for province in create_state["owned_provinces"] if province not in owned]
+                index["countries"][country]["owned_provinces"] += provinces
+                owned.update(provinces)
             else:
-                self[this]["create_state"].append(province)
-        # Merge add_homeland
-        if "add_homeland" in self[other].keys():
-            for culture in self[other]["add_homeland"]:
-                if culture not in self[this]["add_homeland"]:
-                    self[this]["add_homeland"].append(culture)
-        # Merge add_claim
-        if "add_claim" not in self[this].keys():
-            if "add_claim" in self[other].keys():
-                self[this]["add_claim"] = self[other]["add_claim"]
-        elif "add_claim" in self[other].keys():
-            for country in self[other]["add_claim"]:
-                if country not in self[this]["add_claim"]:
-                    self[this]["add_claim"].append(country)
+                self[this]["create_state"].append(create_state)
+                index["countries"][country] = create_state
+                index["owned"][country] = set(create_state["owned_provinces"])
+        # Merge add_homeland and add_claim
+        for key in ("add_homeland", "add_claim"):
+            if key not in self[other].keys():
+                continue
+            if key not in self[this].keys():
+                self[this][key] = []
+            for value in self[other][key]:
+                if value not in index[key]:
+                    index[key].add(value)
+                    self[this][key].append(value)
 
     def get_str(self, state_id:str) -> str:
         state_str = f"    {state_id} = {{\n"
@@ -96,13 +141,21 @@ class States(dict):
 
         return state_str
 
-    def merge_states(self, merge_dict:dict):
-        for diner, food_list in merge_dict.items():
+    def merge_states(self, merge_dict:dict, progress=None):
+        # progress is called with (diners done, diners total) after each diner
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
             for food in food_list:
                 if ("s:" + food) in self.keys():
-                    print(f"Merging {food} state data into {diner}")
+                    self.log(f"Merging {food} state data into {diner}")
                     self.merge_state(("s:" + diner), ("s:" + food))
                     self.pop("s:" + food)
+                    self.indexes.pop("s:" + food, None)
+            if progress is not None:
+                progress(done, len(merge_dict))
+
+    def to_python(self):
+        """Export the States object to a Python dictionary"""
+        return {state_id: copy.deepcopy(state) for state_id, state in self.items()}
 
     def __str__(self) -> str:
         states_str = "STATES = {\n"
@@ -1,10 +1,18 @@
+import copy
 from pyradox import Tree
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
 
 class Trade(dict):
 
-    def __init__(self, source:dict|Tree|None=None):
+    def __init__(self, source:dict|Tree|None=None, log=print):
         super().__init__()
+        # Called with each log line
+        self.log = log
         if source is None:
             return
         if isinstance(source, Tree):
@@ -21,7 +29,7 @@ class Trade(dict):
     def format(self):
         # Format trade data to ensure consistent structure
         for state_id in self.keys():
-            print(f"Formatting trade data: {state_id}")
+            self.log(f"Formatting trade data: {state_id}")
             if isinstance(self[state_id], list):
                 merge_dict = {}
                 for entry in self[state_id]:
@@ -61,6 +69,16 @@ class Trade(dict):
                             except (ValueError, TypeError):
                                 good_data["add_imports"] = 0
 
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing every state the merge plan does not touch"""
+        forked = Trade(log=self.log)
+        forked.update(self)
+        for diner, food_list in merge_dict.items():
+            for state_id in [diner, *food_list]:
+                if ("s:" + state_id) in self.keys():
+                    forked["s:" + state_id] = copy.deepcopy(self["s:" + state_id])
+        return forked
+
     def merge_state(self, this:str, other:str):  # this, other are "state_id" strings
         """Merge trade data from 'other' state into 'this' state"""
         if other not in self:
@@ -98,17 +116,30 @@ class Trade(dict):
                         else:
                             this_good["add_imports"] = other_good["add_imports"]
 
-    def merge_states(self, merge_dict:dict):
-        """Merge trade data according to state merging dictionary"""
-        for diner, food_list in merge_dict.items():
+    def merge_states(self, merge_dict:dict, progress=None):
+        """Merge trade data according to state merging dictionary.
+        progress is called with (diners done, diners total) after each diner."""
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
             for food in food_list:
                 food_key = f"s:{food}"
                 diner_key = f"s:{diner}"
 
                 if food_key in self:
-                    print(f"Merging {food} trade data into {diner}")
+                    self.log(f"Merging {food} trade data into {diner}")
                     self.merge_state(diner_key, food_key)
                     self.pop(food_key)
+            if progress is not None:
+                progress(done, len(merge_dict))
+
+    def entry_cnt(self, state_id:str) -> int:
+        """Return the number of trade good entries of a state"""
+        if state_id not in self:
+            return 0
+        entries = 0
+        for trade_data in self[state_id].values():
+            if isinstance(trade_data, dict):
+                entries += len(trade_data)
+        return entries
 
     def get_str(self, state_id:str) -> str:
         """Generate string representation for a state's trade data"""
@@ -146,6 +177,10 @@ class Trade(dict):
         state_str += f"    }}\n"
         return state_str
 
+    def to_python(self):
+        """Export the Trade object to a Python dictionary"""
+        return {state_id: copy.deepcopy(state_trade) for state_id, state_trade in self.items()}
+
     def __str__(self) -> str:
         trade_str = "TRADE = {\n"
         for state_id in self.keys():
@@ -158,3 +193,318 @@ class Trade(dict):
         """Export trade data to file"""
         with open(dir, "w", encoding="utf-8-sig") as file:
             file.write(str(self))
+
+
+# Bits of ColumnarTrade.flags
+has_exports = 1
+has_imports = 2
+float_exports = 4
+float_imports = 8
+non_empty = 16
+
+
+class ColumnarTrade:
+    """Trade held as a flat table with numpy columns, one row per (state, region_state, good)
+    entry, the strings being kept in tables.
+    state, region, good: int32 arrays, indices in state_names, region_names and goods
+    exports, imports: float64 arrays, add_exports and add_imports of the entry, 0 if absent
+    flags: int32 array, has_exports, has_imports, float_exports, float_imports (the value is
+        written as a float) and non_empty (the entry has any key) bits
+    extra: int32 array, index in extras of the values of the other keys of the entry, or -1
+    order: list of the state_names indices of the states, in the order they are written
+    regions_of: dict, state index -> region indices of the state, in the order they are written
+    log: function called with each log line, the one of source by default
+
+    It merges and writes the same TRADE as Trade, see merge_states.
+    """
+
+    columns = ["state", "region", "good", "exports", "imports", "flags", "extra"]
+
+    def __init__(self, source:Trade|None=None, log=None):
+        if np is None:
+            raise ImportError(
+                "numpy is required for the columnar trade, install it with: pip install vic3-state-merger[numpy]"
+            )
+        self.log = log or (print if source is None else source.log)
+        if source is None:
+            source = Trade()
+        self.state_names = []
+        self.order = []
+        self.regions_of = {}
+        self.extras = []
+        self.entry_totals = None
+        region_ids = {}
+        good_ids = {}
+        rows = {column: [] for column in self.columns}
+        for state_index, (state_id, state_trade) in enumerate(source.items()):
+            self.state_names.append(state_id)
+            self.order.append(state_index)
+            self.regions_of[state_index] = []
+            for region_state, trade_data in state_trade.items():
+                if not isinstance(trade_data, dict):
+                    raise ValueError(f"Unexpected trade format in state {state_id}, region_state {region_state}")
+                region = region_ids.setdefault(region_state, len(region_ids))
+                self.regions_of[state_index].append(region)
+                for trade_good, good_data in trade_data.items():
+                    if not isinstance(good_data, dict):
+                        raise ValueError(f"Unexpected trade format in state {state_id}, {region_state} {trade_good}")
+                    flags = non_empty if good_data else 0
+                    for key, present, is_float, column in (
+                        ("add_exports", has_exports, float_exports, "exports"),
+                        ("add_imports", has_imports, float_imports, "imports"),
+                    ):
+                        value = good_data.get(key, 0)
+                        if key in good_data:
+                            flags |= present
+                            if isinstance(value, float):
+                                flags |= is_float
+                        rows[column].append(value)
+                    rows["state"].append(state_index)
+                    rows["region"].append(region)
+                    rows["good"].append(good_ids.setdefault(trade_good, len(good_ids)))
+                    rows["flags"].append(flags)
+                    extra = {key: value for key, value in good_data.items() if key not in ("add_exports", "add_imports")}
+                    if extra:
+                        rows["extra"].append(len(self.extras))
+                        self.extras.append(extra)
+                    else:
+                        rows["extra"].append(-1)
+        self.region_names = list(region_ids)
+        self.goods = list(good_ids)
+        self.index = {state_id: state_index for state_index, state_id in enumerate(self.state_names)}
+        for column, values in rows.items():
+            setattr(self, column, np.array(values, dtype=np.float64 if column in ("exports", "imports") else np.int32))
+
+    def fork(self, merge_dict:dict):
+        """Return a copy sharing the columns, which merge_states replaces instead of changing them"""
+        return copy.copy(self)
+
+    def keys(self):
+        return [self.state_names[state_index] for state_index in self.order]
+
+    def __contains__(self, state_id) -> bool:
+        return state_id in self.index and self.index[state_id] in self.regions_of
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, state_id:str) -> dict:
+        """Return the trade of a state in the layout of Trade, {region_state: {good: {...}}}"""
+        if state_id not in self:
+            raise KeyError(state_id)
+        state_index = self.index[state_id]
+        state_trade = {self.region_names[region]: {} for region in self.regions_of[state_index]}
+        for row in np.flatnonzero(self.state == state_index).tolist():
+            state_trade[self.region_names[self.region[row]]][self.goods[self.good[row]]] = self.good_dict(row)
+        return state_trade
+
+    def get(self, state_id:str, default=None):
+        return self[state_id] if state_id in self else default
+
+    def items(self):
+        for state_id in self.keys():
+            yield state_id, self[state_id]
+
+    def value(self, row:int, column:str, is_float:int):
+        value = getattr(self, column)[row]
+        return float(value) if self.flags[row] & is_float else int(value)
+
+    def good_dict(self, row:int) -> dict:
+        good_data = {}
+        if self.flags[row] & has_exports:
+            good_data["add_exports"] = self.value(row, "exports", float_exports)
+        if self.flags[row] & has_imports:
+            good_data["add_imports"] = self.value(row, "imports", float_imports)
+        if self.extra[row] >= 0:
+            good_data.update(copy.deepcopy(self.extras[self.extra[row]]))
+        return good_data
+
+    def merge_states(self, merge_dict:dict, progress=None):
+        """Merge the trade of each food into its diner like Trade.merge_states.
+        The foods each diner takes in are found first. The entries are then merged a level of the
+        plan at a time, foods that took in other foods being complete before their diner takes them
+        in, so that float values are added in the same order as Trade. Each level merges all its
+        diners at once: a remap of the states, a sort in the order Trade adds the entries and a
+        group-by sum over (state, region_state, good)."""
+        # progress is called with (diners done, diners total) after each diner
+        state_names = list(self.state_names)
+        index = dict(self.index)
+        regions_of = dict(self.regions_of)
+        order = list(self.order)
+        alive = set(order)
+        children = {}
+        for done, (diner, food_list) in enumerate(merge_dict.items(), 1):
+            for food in food_list:
+                food_key = f"s:{food}"
+                diner_key = f"s:{diner}"
+
+                if index.get(food_key) in alive:
+                    self.log(f"Merging {food} trade data into {diner}")
+                    if index.get(diner_key) not in alive:
+                        # Trade adds a diner without trade at the end
+                        index[diner_key] = len(state_names)
+                        state_names.append(diner_key)
+                        regions_of[index[diner_key]] = []
+                        order.append(index[diner_key])
+                        alive.add(index[diner_key])
+                    diner_index = index[diner_key]
+                    food_index = index[food_key]
+                    children.setdefault(diner_index, []).append(food_index)
+                    regions_of[diner_index] = regions_of[diner_index] + [
+                        region for region in regions_of[food_index] if region not in regions_of[diner_index]
+                    ]
+                    del regions_of[food_index]
+                    alive.discard(food_index)
+            if progress is not None:
+                progress(done, len(merge_dict))
+        if not children:
+            return
+
+        height = {}
+
+        def height_of(state_index:int) -> int:
+            if state_index not in height:
+                height[state_index] = 1 + max((height_of(child) for child in children.get(state_index, ())), default=-1)
+            return height[state_index]
+
+        levels = {}
+        for dest in children:
+            levels.setdefault(height_of(dest), {})[dest] = [dest] + children[dest]
+        for level in sorted(levels):
+            self.merge_groups(levels[level], len(state_names))
+        self.state_names = state_names
+        self.index = index
+        self.regions_of = regions_of
+        self.order = [state_index for state_index in order if state_index in alive]
+        self.entry_totals = None
+
+    def merge_groups(self, groups:dict[int, list[int]], state_count:int):
+        """Merge the entries of the states of each group into its first state, by state index"""
+        dest_of = np.arange(state_count, dtype=np.int64)
+        pos_of = np.zeros(state_count, dtype=np.int64)
+        merged = np.zeros(state_count, dtype=bool)
+        for dest, states in groups.items():
+            for pos, state_index in enumerate(states):
+                dest_of[state_index] = dest
+                pos_of[state_index] = pos
+                merged[state_index] = True
+
+        affected = merged[self.state]
+        rows = np.flatnonzero(affected)
+        # Entries in the order Trade adds them: by merged state, region_state, source, then file order
+        rows = rows[np.lexsort((rows, pos_of[self.state[rows]], self.region[rows], dest_of[self.state[rows]]))]
+        dest = dest_of[self.state[rows]]
+        keys = np.stack([dest, self.region[rows], self.good[rows]], axis=1)
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        target = first[inverse.reshape(-1)]
+        exports = np.zeros(len(rows))
+        imports = np.zeros(len(rows))
+        flags = np.zeros(len(rows), dtype=np.int32)
+        np.add.at(exports, target, self.exports[rows])
+        np.add.at(imports, target, self.imports[rows])
+        kept = target == np.arange(len(rows))
+        # Trade only adds add_exports and add_imports to an entry, so the later entries make it
+        # non-empty only through them
+        added = self.flags[rows]
+        added = np.where(
+            kept | (added & (has_exports | has_imports) != 0), added, added & ~non_empty
+        )
+        np.bitwise_or.at(flags, target, added)
+
+        # The other keys of a merged entry are those of its first entry, kept with its extra
+        keep = np.concatenate([np.flatnonzero(~affected), rows[kept]])
+        for column in self.columns:
+            setattr(self, column, getattr(self, column)[keep])
+        start = len(keep) - int(kept.sum())
+        self.state[start:] = dest[kept]
+        self.exports[start:] = exports[kept]
+        self.imports[start:] = imports[kept]
+        self.flags[start:] = flags[kept]
+
+    def entry_cnt(self, state_id:str) -> int:
+        """Return the number of trade good entries of a state"""
+        if state_id not in self:
+            return 0
+        if self.entry_totals is None:
+            self.entry_totals = np.bincount(self.state, minlength=len(self.state_names))
+        return int(self.entry_totals[self.index[state_id]])
+
+    def to_python(self):
+        """Export the trade to a Python dictionary in the layout of Trade.to_python"""
+        trade_dict = {}
+        for state_index in self.order:
+            trade_dict[self.state_names[state_index]] = {
+                self.region_names[region]: {} for region in self.regions_of[state_index]
+            }
+        rows = np.lexsort((np.arange(len(self.state)), self.state))
+        for row, state_index, region, good in zip(
+            rows.tolist(), self.state[rows].tolist(), self.region[rows].tolist(), self.good[rows].tolist()
+        ):
+            trade_dict[self.state_names[state_index]][self.region_names[region]][self.goods[good]] = self.good_dict(row)
+        return trade_dict
+
+    def get_str(self, state_id:str) -> str:
+        """Generate string representation for a state's trade data"""
+        if state_id not in self:
+            return ""
+        return self.state_strs([self.index[state_id]])[0]
+
+    def state_strs(self, state_indices:list[int]) -> list[str]:
+        """Return the TRADE entries of states, written like Trade.get_str, reading the rows of
+        each (state, region_state) as a run of the rows sorted by state and region_state"""
+        wanted = np.zeros(len(self.state_names), dtype=bool)
+        wanted[state_indices] = True
+        rows = np.flatnonzero(wanted[self.state])
+        rows = rows[np.lexsort((rows, self.region[rows], self.state[rows]))]
+        runs = {}
+        if len(rows):
+            run_keys = self.state[rows].astype(np.int64) * max(len(self.region_names), 1) + self.region[rows]
+            starts = np.flatnonzero(np.concatenate([[True], run_keys[1:] != run_keys[:-1]]))
+            ends = np.append(starts[1:], len(rows))
+            for start, end, key in zip(starts.tolist(), ends.tolist(), run_keys[starts].tolist()):
+                runs[key] = rows[start:end].tolist()
+        goods = self.good.tolist()
+        flags = self.flags.tolist()
+        exports = self.exports.tolist()
+        imports = self.imports.tolist()
+        strs = []
+        for state_index in state_indices:
+            state_str = f"    {self.state_names[state_index]}={{\n"
+            for region in self.regions_of[state_index]:
+                region_rows = runs.get(state_index * max(len(self.region_names), 1) + region)
+                if not region_rows:
+                    continue
+
+                state_str += f"        {self.region_names[region]}={{\n"
+
+                for row in region_rows:
+                    if not flags[row] & non_empty:
+                        continue
+
+                    state_str += f"            {self.goods[goods[row]]} = {{\n"
+
+                    if flags[row] & has_exports and exports[row] > 0:
+                        value = exports[row] if flags[row] & float_exports else int(exports[row])
+                        state_str += f"                add_exports = {value}\n"
+
+                    if flags[row] & has_imports and imports[row] > 0:
+                        value = imports[row] if flags[row] & float_imports else int(imports[row])
+                        state_str += f"                add_imports = {value}\n"
+
+                    state_str += f"            }}\n"
+
+                state_str += f"        }}\n"
+
+            state_str += f"    }}\n"
+            strs.append(state_str)
+        return strs
+
+    def __str__(self) -> str:
+        # Only include states with trade data
+        states = [state_index for state_index in self.order if self.regions_of[state_index]]
+        return "TRADE = {\n" + "".join(self.state_strs(states)) + "}\n"
+
+    def dump(self, dir):
+        """Export trade data to file"""
+        with open(dir, "w", encoding="utf-8-sig") as file:
+            file.write(str(self))
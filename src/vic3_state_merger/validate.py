@@ -0,0 +1,171 @@
+from vic3_state_merger.state_regions import StateRegion, normalize_province
+
+
+def issue(level:str, state:str, message:str) -> dict:
+    """Return a plan issue. level is "error" if the merge would fail, "warning" otherwise"""
+    return {"level": level, "state": state, "message": message}
+
+
+def validate_plan(merge_dict:dict, map_data:StateRegion) -> list[dict]:
+    """Check that a merge plan only merges existing land states, each of them at most once"""
+    issues = []
+    diner_pos = {}
+    for pos, (diner, food_list) in enumerate(merge_dict.items()):
+        if food_list:
+            diner_pos[diner] = pos
+    eaten_by = {}
+    for pos, (diner, food_list) in enumerate(merge_dict.items()):
+        if not isinstance(food_list, list):
+            issues.append(issue("error", diner, "The foods of a state must be a list of state ids"))
+            continue
+        if diner not in map_data:
+            if food_list:
+                issues.append(issue("error", diner, "Unknown state"))
+            else:
+                issues.append(issue("warning", diner, "Unknown state"))
+            continue
+        if food_list and map_data[diner].is_sea_node():
+            issues.append(issue("error", diner, "Sea nodes cannot be merged"))
+        for food in food_list:
+            if food == diner:
+                issues.append(issue("error", food, "A state cannot be merged into itself"))
+                continue
+            if food not in map_data:
+                issues.append(issue("error", food, f"Unknown state, merged into {diner}"))
+                continue
+            if map_data[food].is_sea_node():
+                issues.append(issue("error", food, f"Sea nodes cannot be merged, merged into {diner}"))
+            if food in eaten_by:
+                issues.append(issue("error", food, f"Merged into both {eaten_by[food]} and {diner}"))
+                continue
+            eaten_by[food] = diner
+            if food in diner_pos:
+                if diner_pos[food] > pos:
+                    issues.append(
+                        issue("error", food, f"Merged into {diner} before its own foods are merged into it")
+                    )
+                else:
+                    issues.append(issue("warning", food, f"Merged into {diner} after its own foods were merged into it"))
+    return issues
+
+
+def merge_groups(merge_dict:dict, map_data:StateRegion) -> dict[str, list[str]]:
+    """Return the known land states of each diner group with foods, diner first"""
+    groups = {}
+    for diner, food_list in merge_dict.items():
+        if not isinstance(food_list, list) or not food_list or diner not in map_data:
+            continue
+        group = [diner] + [food for food in food_list if food in map_data and food != diner]
+        groups[diner] = [state for state in group if not map_data[state].is_sea_node()]
+    return groups
+
+
+def validate_provinces(merge_dict:dict, map_data:StateRegion, states:dict) -> list[dict]:
+    """Check the provinces of the merged states with the province index of map_data: each must be
+    in a single state region, and owned by a single create_state of that state region in states
+    (a States)"""
+    issues = []
+    for diner, group in merge_groups(merge_dict, map_data).items():
+        for state in group:
+            owner_of = {}
+            for create_state in states.get("s:" + state, {}).get("create_state", []):
+                country = create_state.get("country", "")
+                for province in create_state.get("owned_provinces", []):
+                    province = normalize_province(province)
+                    if province in owner_of:
+                        issues.append(
+                            issue("error", state, f"Province {province} is owned by both {owner_of[province]} and {country}")
+                        )
+                        continue
+                    owner_of[province] = country
+                    region = map_data.state_of(province)
+                    if region is None:
+                        issues.append(issue("error", state, f"Province {province} owned by {country} is in no state region"))
+                    elif region != state:
+                        issues.append(
+                            issue("error", state, f"Province {province} owned by {country} is in the state region {region}")
+                        )
+            for province in map_data[state].provinces:
+                province = normalize_province(province)
+                if province in map_data.duplicate_provinces:
+                    others = [other for other in map_data.duplicate_provinces[province] if other != state]
+                    issues.append(issue("error", state, f"Province {province} is also in {', '.join(others)}"))
+                elif province not in owner_of:
+                    issues.append(issue("warning", state, f"Province {province} is owned by no country"))
+    return issues
+
+
+def validate_geometry(merge_dict:dict, map_data:StateRegion, province_map) -> list[dict]:
+    """Check with the province adjacency of province_map (a ProvinceMap) that every diner group
+    is contiguous and that the merged state keeps a consistent port and naval exit"""
+    issues = []
+    adjacency = province_map.state_adjacency(map_data)
+    sea_provinces = {}
+    for state in map_data.values():
+        if state.is_sea_node():
+            sea_provinces[state.id] = {normalize_province(p) for p in state.provinces}
+
+    for diner, group in merge_groups(merge_dict, map_data).items():
+        # Contiguity: the group states must be connected by land borders between themselves
+        members = set(group)
+        seen = {diner}
+        stack = [diner]
+        while stack:
+            for neighbor in adjacency.get(stack.pop(), ()):
+                if neighbor in members and neighbor not in seen:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        detached = [state for state in group if state not in seen]
+        if detached:
+            issues.append(
+                issue("warning", diner, f"Not contiguous, no border links {', '.join(detached)} to the rest of the group")
+            )
+
+        # Port and naval exit: StateRegionItem.merge keeps the first of the group having each of them
+        port_from = next((state for state in group if map_data[state].port != ""), None)
+        exit_from = next((state for state in group if map_data[state].naval_exit_id != -1), None)
+        if port_from is None and exit_from is None:
+            continue
+        if port_from is None or exit_from is None:
+            issues.append(
+                issue(
+                    "warning",
+                    diner,
+                    f"The merged port comes from {port_from or 'no state'} but the naval exit from {exit_from or 'no state'}",
+                )
+            )
+            continue
+        if port_from != exit_from and map_data[port_from].naval_exit_id != map_data[exit_from].naval_exit_id:
+            issues.append(
+                issue(
+                    "warning",
+                    diner,
+                    f"The merged port comes from {port_from} but the naval exit from {exit_from}",
+                )
+            )
+        elif port_from != diner:
+            issues.append(issue("warning", diner, f"Landlocked, the merged port and naval exit come from {port_from}"))
+        naval_exit_id = map_data[exit_from].naval_exit_id
+        lost = sorted(
+            {map_data[state].naval_exit_id for state in group if map_data[state].naval_exit_id not in (-1, naval_exit_id)}
+        )
+        if lost:
+            issues.append(
+                issue(
+                    "warning",
+                    diner,
+                    f"Naval exit {naval_exit_id} is kept, the ports on naval exits {', '.join(map(str, lost))} are lost",
+                )
+            )
+        if naval_exit_id in sea_provinces:
+            port = map_data[port_from].port
+            try:
+                neighbors = province_map.neighbors(port)
+            except KeyError:
+                issues.append(issue("warning", diner, f"Port province {port} is not in provinces.png"))
+                continue
+            if not sea_provinces[naval_exit_id].intersection(neighbors):
+                issues.append(
+                    issue("warning", diner, f"Port province {port} does not border the sea of naval exit {naval_exit_id}")
+                )
+    return issues
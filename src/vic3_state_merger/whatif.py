@@ -0,0 +1,170 @@
+import json
+import os
+
+from vic3_state_merger.buildings import Buildings
+from vic3_state_merger.pops import Pops
+from vic3_state_merger.province_map import require_numpy
+from vic3_state_merger.state_merger import parse_merge, state_file_dir
+from vic3_state_merger.state_regions import StateRegion, merge_groups
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, see the "numpy" extra in pyproject.toml
+    np = None
+
+# Bump when the columns of the cache file change
+cache_version = 1
+
+# Columns of every state, followed by one "capped:<resource>" column per capped resource and one
+# "culture:<culture>" column per culture
+base_columns = [
+    "provinces",
+    "arable_land",
+    "gold_undiscovered",
+    "gold_discovered",
+    "rubber_undiscovered",
+    "rubber_discovered",
+    "oil",
+    "pops",
+    "building_levels",
+]
+
+
+def state_aggregates(map_data:StateRegion, pops, buildings) -> tuple[list[str], list[str], "np.ndarray"]:
+    """Return the land states of map_data, the column names and an int64 array holding the
+    totals of each state in each column"""
+    require_numpy()
+    states = [state for state, item in map_data.items() if not item.is_sea_node()]
+    resources = sorted({resource for state in states for resource in map_data[state].capped_resources})
+    culture_sizes = {}
+    for state in states:
+        sizes = {}
+        for tag_pops in pops.get("s:" + state, {}).values():
+            for pop in tag_pops["create_pop"]:
+                sizes[pop["culture"]] = sizes.get(pop["culture"], 0) + int(pop["size"])
+        culture_sizes[state] = sizes
+    cultures = sorted({culture for sizes in culture_sizes.values() for culture in sizes})
+    columns = base_columns + [f"capped:{resource}" for resource in resources] + [f"culture:{culture}" for culture in cultures]
+    column_index = {column: i for i, column in enumerate(columns)}
+
+    matrix = np.zeros((len(states), len(columns)), dtype=np.int64)
+    for row, state in enumerate(states):
+        item = map_data[state]
+        matrix[row, :len(base_columns)] = [
+            item.province_cnt(),
+            item.arable_land,
+            item.gold[0],
+            item.gold[1],
+            item.rubber[0],
+            item.rubber[1],
+            item.oil,
+            sum(culture_sizes[state].values()),
+            buildings.level_cnt("s:" + state),
+        ]
+        for resource, amount in item.capped_resources.items():
+            matrix[row, column_index[f"capped:{resource}"]] = amount
+        for culture, size in culture_sizes[state].items():
+            matrix[row, column_index[f"culture:{culture}"]] = size
+    return states, columns, matrix
+
+
+class WhatIf:
+    """Totals of the merged states of any plan, computed from per-state totals without merging.
+    states: list of string, land state names
+    columns: list of string, names of the totals, see base_columns
+    matrix: int64 array of shape (state count, column count), totals of each state
+
+    The per-state totals are read from the state regions, pops and buildings of a game root once
+    and cached in cache_dir/state_aggregates.npz, rebuilt when one of their files changes. A plan
+    is then evaluated by summing the rows of the states of each merged state."""
+
+    def __init__(self, game_root_dir:str, cache_dir:str|None=None):
+        require_numpy()
+        dirs = [os.path.join(game_root_dir, state_file_dir[key]) for key in ("map_data", "pops", "buildings")]
+        source = json.dumps(
+            [cache_version]
+            + [
+                [file, os.path.getmtime(os.path.join(dir, file)), os.path.getsize(os.path.join(dir, file))]
+                for dir in dirs
+                for file in sorted(os.listdir(dir))
+            ]
+        )
+        cache_file = None if cache_dir is None else os.path.join(cache_dir, "state_aggregates.npz")
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as cached:
+                    if str(cached["source"]) == source:
+                        self.states = [str(state) for state in cached["states"]]
+                        self.columns = [str(column) for column in cached["columns"]]
+                        self.matrix = cached["matrix"]
+                        self.index = {state: i for i, state in enumerate(self.states)}
+                        self.column_matrices = {}
+                        return
+            except (OSError, ValueError, KeyError):
+                pass
+
+        map_data = StateRegion(parse_merge(dirs[0], merge_levels=1))
+        pops = Pops(parse_merge(dirs[1], merge_levels=2))
+        buildings = Buildings(parse_merge(dirs[2], merge_levels=2))
+        self.states, self.columns, self.matrix = state_aggregates(map_data, pops, buildings)
+        self.index = {state: i for i, state in enumerate(self.states)}
+        # Totals of some of the columns, see column_matrix
+        self.column_matrices = {}
+        if cache_file is not None:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            np.savez_compressed(
+                cache_file,
+                source=np.array(source),
+                states=np.array(self.states),
+                columns=np.array(self.columns),
+                matrix=self.matrix,
+            )
+
+    def groups(self, merge_dict:dict) -> dict[str, list[int]]:
+        """Return the rows of the states making up each merged diner state of merge_dict, following
+        the plan in order like a merge, see merge_groups. Sea nodes and unknown states are left out."""
+        index = self.index
+        return {diner: [index[state] for state in states] for diner, states in merge_groups(merge_dict, index).items()}
+
+    def column_matrix(self, columns:tuple[str, ...]|None) -> "np.ndarray":
+        """Return the totals of columns for each state, followed by a row of zeros"""
+        if columns not in self.column_matrices:
+            matrix = self.matrix if columns is None else self.matrix[:, [self.columns.index(column) for column in columns]]
+            self.column_matrices[columns] = np.vstack([matrix, np.zeros((1, matrix.shape[1]), dtype=matrix.dtype)])
+        return self.column_matrices[columns]
+
+    def group_totals(self, merge_dict:dict, columns:list[str]|None=None) -> tuple[list[str], "np.ndarray"]:
+        """Return the diner states of merge_dict and an array holding the totals of each merged
+        state, one row per diner.
+        columns: names of the totals to compute, all of them if None; scoring many plans on a few
+            totals is much faster than on all of them"""
+        matrix = self.column_matrix(None if columns is None else tuple(columns))
+        groups = self.groups(merge_dict)
+        if not groups:
+            return [], np.zeros((0, matrix.shape[1]), dtype=matrix.dtype)
+        # Rows of each group padded with the row of zeros to the size of the largest group, then
+        # summed one position at a time
+        sizes = np.fromiter((len(group) for group in groups.values()), dtype=np.intp, count=len(groups))
+        rows = np.fromiter((row for group in groups.values() for row in group), dtype=np.intp, count=int(sizes.sum()))
+        group_of = np.repeat(np.arange(len(groups)), sizes)
+        position = np.arange(len(rows)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        padded = np.full((len(groups), int(sizes.max())), len(self.states), dtype=np.intp)
+        padded[group_of, position] = rows
+        totals = matrix[padded[:, 0]]
+        for pos in range(1, padded.shape[1]):
+            totals += matrix[padded[:, pos]]
+        return list(groups), totals
+
+    def evaluate(self, merge_dict:dict) -> dict[str, dict[str, int]]:
+        """Return the totals of each merged diner state of merge_dict, the capped resources and
+        cultures it has none of left out"""
+        diners, totals = self.group_totals(merge_dict)
+        result = {}
+        for diner, row in zip(diners, totals.tolist()):
+            result[diner] = {
+                column: value
+                for pos, (column, value) in enumerate(zip(self.columns, row))
+                if pos < len(base_columns) or value
+            }
+        return result
@@ -0,0 +1,52 @@
+import os
+import shutil
+
+import pytest
+
+from vic3_state_merger.state_merger import remove_file_dir, replace_file_dir
+from vic3_state_merger.state_regions import StateRegion
+
+fixture_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def make_map():
+    """Return a function building a StateRegion from {state: provinces} of land states, with the
+    other keys of a state given in extra, and {sea node: provinces} of sea nodes"""
+
+    def make(land:dict, seas:dict|None=None, extra:dict|None=None) -> StateRegion:
+        source = {}
+        for state_id, (name, provinces) in enumerate(land.items(), 1):
+            source[name] = {
+                "id": state_id,
+                "subsistence_building": "building_subsistence_farms",
+                "provinces": provinces,
+                "arable_land": 10,
+                "arable_resources": ["bg_wheat_farms"],
+                **(extra or {}).get(name, {}),
+            }
+        for sea_id, (name, provinces) in enumerate((seas or {}).items(), 3000):
+            source[name] = {"id": sea_id, "provinces": provinces}
+        return StateRegion(source)
+
+    return make
+
+
+@pytest.fixture
+def game_root(tmp_path) -> str:
+    """Copy of the small game root in fixtures/game: 8 land states of 2x2 provinces of 10x10 pixels in
+    2 strategic regions, owned by GBR, FRA and USA, and 2 sea nodes south of them"""
+    root = tmp_path / "game"
+    shutil.copytree(os.path.join(fixture_dir, "game"), root)
+    # Git does not keep the empty script directories the merger reads
+    for directory in replace_file_dir + remove_file_dir:
+        os.makedirs(root / directory, exist_ok=True)
+    return str(root) + "/"
+
+
+@pytest.fixture
+def plan_file(tmp_path) -> str:
+    """Copy of fixtures/merge_states.json, a plan merging 4 of the 8 states of game_root into 3 others"""
+    path = tmp_path / "merge_states.json"
+    shutil.copy(os.path.join(fixture_dir, "merge_states.json"), path)
+    return str(path)
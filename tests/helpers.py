@@ -0,0 +1,75 @@
+import contextlib
+import io
+import random
+
+tags = ["region_state:GBR", "region_state:FRA", "region_state:USA", "region_state:PRU"]
+pop_values = {
+    "culture": ["english", "french", "german", "dutch"],
+    "religion": ["catholic", "protestant"],
+    "pop_type": ["slaves", "peasants"],
+    "split_religion": ["x"],
+}
+goods = ["grain", "fabric", "iron", "tools", "wine"]
+
+
+def random_pops(rng:random.Random, state_cnt:int) -> dict:
+    """Return the POPS of state_cnt states, some without tags or pops, with the optional keys of
+    each pop in a random order"""
+    data = {}
+    for i in range(state_cnt):
+        state = {}
+        for tag in rng.sample(tags, rng.randint(0, 3)):
+            pops = []
+            for _ in range(rng.randint(0, 6)):
+                keys = ["culture", "size"]
+                keys += [key for key, chance in (("religion", 0.4), ("pop_type", 0.3), ("split_religion", 0.05)) if rng.random() < chance]
+                rng.shuffle(keys)
+                pops.append({key: rng.randint(1, 5000) if key == "size" else rng.choice(pop_values[key]) for key in keys})
+            state[tag] = {"create_pop": pops}
+        data[f"s:STATE_{i}"] = state
+    return data
+
+
+def random_trade(rng:random.Random, state_cnt:int) -> dict:
+    """Return the TRADE of up to state_cnt states: some states have no trade, some tags and goods
+    are empty, and some values are floats"""
+    data = {}
+    for i in range(state_cnt):
+        if rng.random() < 0.3:
+            continue
+        state = {}
+        for tag in rng.sample(tags, rng.randint(0, 3)):
+            state[tag] = {
+                good: {
+                    key: rng.randint(-3, 30) if rng.random() < 0.8 else round(rng.uniform(0, 10), 1)
+                    for key in rng.sample(["add_exports", "add_imports", "other"], rng.randint(0, 3))
+                }
+                for good in rng.sample(goods, rng.randint(0, 4))
+            }
+        data[f"s:STATE_{i}"] = state
+    return data
+
+
+def random_plan(rng:random.Random, state_cnt:int, reuse_foods:bool=False) -> dict:
+    """Return a merge plan of STATE_0 to STATE_<state_cnt - 1> where a later diner sometimes eats
+    an earlier one, and if reuse_foods is set a food sometimes becomes a diner afterwards"""
+    states = [f"STATE_{i}" for i in range(state_cnt)]
+    rng.shuffle(states)
+    plan = {}
+    while states:
+        diner = states.pop()
+        plan[diner] = [states.pop() for _ in range(min(rng.randint(0, 4), len(states)))]
+    diners = list(plan)
+    if len(diners) > 2 and rng.random() < 0.5:
+        plan[diners[-1]].append(diners[0])
+    if reuse_foods and len(diners) > 3 and rng.random() < 0.3:
+        eaten = plan[diners[1]][0] if plan[diners[1]] else diners[1]
+        plan[eaten] = [diners[2]]
+    return plan
+
+
+def merged(subsystem, plan:dict):
+    """Merge plan into subsystem without its log lines and return it"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        subsystem.merge_states(plan)
+    return subsystem
@@ -0,0 +1,35 @@
+import contextlib
+import io
+
+from vic3_state_merger.buildings import Buildings
+
+
+def ownership(region:str, levels:int) -> dict:
+    return {"type": "building", "country": "c:GBR", "levels": levels, "region": f'"{region}"'}
+
+
+def test_merge_states_moves_ownerships_by_original_region():
+    source = {
+        "BUILDINGS": {
+            "s:STATE_F1": {
+                "region_state:GBR": {
+                    "create_building": {
+                        "building": "building_textile_mills",
+                        "add_ownership": {"building": [ownership("STATE_F1", 1), ownership("STATE_D1", 2)]},
+                    }
+                }
+            },
+            "s:STATE_D1": {"region_state:GBR": {}},
+            "s:STATE_D2": {"region_state:GBR": {}},
+        }
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        buildings = Buildings(source)
+        buildings.merge_states({"STATE_D1": ["STATE_F1"], "STATE_D2": ["STATE_D1"]})
+    [building] = [
+        building for state in buildings.values() for tag_buildings in state.values() for building in tag_buildings
+    ]
+    assert [(item["region"], int(item["levels"])) for item in building.building_ownership] == [
+        ('"STATE_D1"', 1),
+        ('"STATE_D2"', 2),
+    ]
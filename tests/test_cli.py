@@ -0,0 +1,121 @@
+import json
+import os
+
+import pytest
+
+from vic3_state_merger import cli
+from vic3_state_merger.state_merger import parse_subsystem
+
+
+@pytest.mark.parametrize("option", [["--staged"], ["--jobs", "2"]])
+def test_watch_rejects_staged_and_jobs(capsys, option):
+    with pytest.raises(SystemExit):
+        cli.main(["merge_states.json", "game", "mod", "--watch", *option])
+    assert "cannot be combined with --staged or --jobs" in capsys.readouterr().err
+
+
+def test_report_requires_dry_run(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["merge_states.json", "game", "mod", "--report", "report.json"])
+    assert "--report requires --dry-run" in capsys.readouterr().err
+
+
+def test_watch_dry_run_leaves_mod_dir_alone(monkeypatch, capsys, tmp_path, game_root, plan_file):
+    def stop(interval):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cli.time, "sleep", stop)
+    mod_dir = tmp_path / "mod"
+    cli.main([plan_file, game_root, str(mod_dir), "--data-dir", str(tmp_path / "data"), "--watch", "--dry-run"])
+    out = capsys.readouterr().out
+    assert "STATE_S1 <- STATE_S2, STATE_S5" in out
+    assert "left untouched" in out
+    assert not os.path.exists(mod_dir)
+
+
+def read_tree(root) -> dict:
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as file:
+                files[os.path.relpath(path, root)] = file.read()
+    return files
+
+
+@pytest.mark.parametrize("jobs, recompute_hubs", [(1, False), (2, True)])
+def test_run_batch_matches_run_merge(tmp_path, game_root, plan_file, jobs, recompute_hubs):
+    if recompute_hubs:
+        pytest.importorskip("numpy")
+    other_plan = tmp_path / "other.json"
+    other_plan.write_text('{"STATE_S2": ["STATE_S1"], "STATE_S7": ["STATE_S8", "STATE_S4"]}', encoding="utf-8")
+    trait_table = tmp_path / "traits.json"
+    trait_table.write_text(
+        '{"icon": "gfx/test.dds", "modifiers": [{"modifier": "state_tax_capacity_add", "per_state": 7}]}',
+        encoding="utf-8",
+    )
+    data_dir = str(tmp_path / "data")
+    variants = [(plan_file, str(tmp_path / "batch_a")), (str(other_plan), str(tmp_path / "batch_b"))]
+    options = {"recompute_hubs": recompute_hubs, "trait_table": str(trait_table)}
+    cli.run_batch(game_root, variants, data_dir, 4, False, jobs=jobs, **options)
+    for merge_file, mod_dir in variants:
+        cli.run_merge(merge_file, mod_dir + "_single", game_root, data_dir, 4, False, **options)
+        assert read_tree(mod_dir) == read_tree(mod_dir + "_single")
+    traits = read_tree(tmp_path / "batch_b")[os.path.join("common", "state_traits", "state_merging.txt")]
+    assert b"gfx/test.dds" in traits and b"state_tax_capacity_add = 7\n" in traits
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_dry_run_report_totals(tmp_path, game_root, plan_file, jobs):
+    with open(plan_file, encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    mod_dir = tmp_path / "mod"
+    report_file = tmp_path / "report.json"
+    cli.main([
+        plan_file, game_root, str(mod_dir), "--data-dir", str(tmp_path / "data"),
+        "--dry-run", "--report", str(report_file), "--jobs", jobs,
+    ])
+    assert not os.path.exists(mod_dir)
+    with open(report_file, encoding="utf-8") as file:
+        report = json.load(file)
+    # The totals of a merged state are those of its states before the merge, trade entries of a
+    # same good excepted
+    map_data = parse_subsystem(game_root, "map_data", log=lambda message: None)
+    pops = parse_subsystem(game_root, "pops", log=lambda message: None)
+    buildings = parse_subsystem(game_root, "buildings", log=lambda message: None)
+    trade = parse_subsystem(game_root, "trade", log=lambda message: None)
+    trade.merge_states(merge_dict)
+    assert list(report["states"]) == [diner for diner, food_list in merge_dict.items() if food_list]
+    for diner, summary in report["states"].items():
+        group = [diner, *merge_dict[diner]]
+        assert summary == {
+            "foods": merge_dict[diner],
+            "provinces": sum(map_data[state].province_cnt() for state in group),
+            "pops": sum(pops.size_cnt("s:" + state) for state in group),
+            "building_levels": sum(buildings.level_cnt("s:" + state) for state in group),
+            "trade_entries": trade.entry_cnt("s:" + diner),
+        }
+    assert [misc_file["file"] for misc_file in report["misc_files"]] == [
+        "common/journal_entries/00_je.txt",
+        "common/strategic_regions/00_regions.txt",
+    ]
+    assert report["loc_keys"]["l_english"] == ["HUB_NAME_STATE_S1_port"]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"staged": True},
+        {"jobs": 2},
+        {"staged": True, "columnar": True},
+        {"jobs": 2, "recompute_hubs": True},
+    ],
+)
+def test_staged_merge_matches_merge(tmp_path, game_root, plan_file, options):
+    if options.get("columnar") or options.get("recompute_hubs"):
+        pytest.importorskip("numpy")
+    shared = {key: value for key, value in options.items() if key not in ("staged", "jobs")}
+    data_dir = str(tmp_path / "data")
+    cli.run_merge(plan_file, str(tmp_path / "mod"), game_root, data_dir, 4, False, **shared)
+    cli.run_merge(plan_file, str(tmp_path / "staged"), game_root, data_dir, 4, False, **options)
+    assert read_tree(tmp_path / "staged") == read_tree(tmp_path / "mod")
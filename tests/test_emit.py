@@ -0,0 +1,19 @@
+import io
+
+import pytest
+
+from vic3_state_merger.emit import write_states
+
+
+def format_state(state_id:str, value:int) -> str:
+    return f"{state_id} = {value}\n"
+
+
+@pytest.mark.parametrize("workers, threshold", [(1, None), (3, 1), (3, 1000)])
+def test_write_states_keeps_order(workers, threshold):
+    items = [(f"s:STATE_{i}", i * i) for i in range(50)]
+    file = io.StringIO()
+    written = []
+    write_states(file, items, format_state, workers=workers, threshold=threshold, on_state=written.append)
+    assert file.getvalue() == "".join(format_state(state_id, value) for state_id, value in items)
+    assert written == [state_id for state_id, _ in items]
@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+
+import pytest
+
+from vic3_state_merger import cli
+from vic3_state_merger.export import (
+    building_rows,
+    claim_rows,
+    export_tables,
+    homeland_rows,
+    ownership_rows,
+    pop_rows,
+    state_province_rows,
+    state_region_rows,
+    state_resource_rows,
+    tables,
+    trade_rows,
+)
+from vic3_state_merger.state_merger import StateMerger
+
+table_sources = {
+    "state_regions": ("map_data", state_region_rows),
+    "state_provinces": ("map_data", state_province_rows),
+    "state_resources": ("map_data", state_resource_rows),
+    "pops": ("pops", pop_rows),
+    "buildings": ("buildings", building_rows),
+    "ownership": ("states", ownership_rows),
+    "homelands": ("states", homeland_rows),
+    "claims": ("states", claim_rows),
+    "trade": ("trade", trade_rows),
+}
+
+parsers = {"str": str, "int": int, "float": float, "bool": lambda value: value == "True"}
+
+
+def read_csv(path:str, name:str) -> list[tuple]:
+    """Return the rows of a CSV table, with their values parsed to the types of the table"""
+    with open(path, encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        assert next(reader) == [column for column, _ in tables[name]]
+        return [tuple(parsers[kind](value) for (_, kind), value in zip(tables[name], row)) for row in reader]
+
+
+def test_csv_round_trip(tmp_path, game_root, plan_file):
+    with open(plan_file, encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    state_merger = StateMerger(game_root, "", merge_dict, str(tmp_path / "data") + "/", dry_run=True)
+    state_merger.merge_state_data()
+    out_dir = str(tmp_path / "tables")
+    counts = export_tables(
+        state_merger.map_data,
+        state_merger.buildings,
+        state_merger.pops,
+        state_merger.states,
+        state_merger.trade,
+        out_dir,
+        ["csv"],
+    )
+    assert set(counts) == set(tables)
+    for name, (subsystem, rows) in table_sources.items():
+        expected = list(rows(getattr(state_merger, subsystem).to_python()))
+        assert expected, name
+        assert counts[name] == len(expected)
+        assert read_csv(os.path.join(out_dir, f"{name}.csv"), name) == expected
+
+
+def test_columnar_export_matches_dict(tmp_path, game_root, plan_file):
+    np = pytest.importorskip("numpy")
+    data_dir = str(tmp_path / "data")
+    dict_dir = str(tmp_path / "dict")
+    columnar_dir = str(tmp_path / "columnar")
+    counts = cli.run_export(plan_file, game_root, dict_dir, data_dir, ["csv", "npz"])
+    assert cli.run_export(plan_file, game_root, columnar_dir, data_dir, ["csv", "npz"], columnar=True) == counts
+    for name in tables:
+        with open(os.path.join(dict_dir, f"{name}.csv"), "rb") as dict_file:
+            with open(os.path.join(columnar_dir, f"{name}.csv"), "rb") as columnar_file:
+                assert columnar_file.read() == dict_file.read(), name
+        with np.load(os.path.join(dict_dir, f"{name}.npz")) as dict_arrays:
+            with np.load(os.path.join(columnar_dir, f"{name}.npz")) as columnar_arrays:
+                assert list(columnar_arrays) == [column for column, _ in tables[name]]
+                for column in dict_arrays:
+                    assert np.array_equal(columnar_arrays[column], dict_arrays[column]), (name, column)
@@ -0,0 +1,67 @@
+from vic3_state_merger.generate import generate_plan
+
+# STATE_A - STATE_B - STATE_C - STATE_D in a row
+adjacency = {
+    "STATE_A": {"STATE_B"},
+    "STATE_B": {"STATE_A", "STATE_C"},
+    "STATE_C": {"STATE_B", "STATE_D"},
+    "STATE_D": {"STATE_C"},
+}
+
+
+def provinces(count:int, first:int) -> list[str]:
+    return [f"x{i:06X}" for i in range(first, first + count)]
+
+
+def row_map(make_map, sizes:list[int]):
+    return make_map(
+        {name: provinces(size, 10 * i) for i, (name, size) in enumerate(zip(adjacency, sizes))},
+        seas={"sea_1": ["x0000FF"]},
+    )
+
+
+def test_generate_plan_merges_small_states_into_largest_neighbour(make_map):
+    map_data = row_map(make_map, [1, 5, 2, 6])
+    region_of = dict.fromkeys(adjacency, "sr:region_a")
+    assert generate_plan(map_data, adjacency, region_of) == {
+        "STATE_B": ["STATE_A"],
+        "STATE_D": ["STATE_C"],
+    }
+
+
+def test_generate_plan_keeps_strategic_regions_apart(make_map):
+    map_data = row_map(make_map, [1, 5, 2, 6])
+    region_of = {"STATE_A": "sr:region_a", "STATE_B": "sr:region_a", "STATE_C": "sr:region_b", "STATE_D": "sr:region_a"}
+    assert generate_plan(map_data, adjacency, region_of) == {
+        "STATE_B": ["STATE_A"],
+        "STATE_C": [],
+        "STATE_D": [],
+    }
+
+
+def test_generate_plan_grows_groups_until_caps(make_map):
+    map_data = row_map(make_map, [1, 1, 1, 1])
+    region_of = dict.fromkeys(adjacency, "sr:region_a")
+    assert generate_plan(map_data, adjacency, region_of) == {"STATE_B": ["STATE_A", "STATE_C", "STATE_D"]}
+    assert generate_plan(map_data, adjacency, region_of, max_provinces=2) == {
+        "STATE_B": ["STATE_A"],
+        "STATE_D": ["STATE_C"],
+    }
+    pop_size = {"STATE_A": 10, "STATE_B": 10, "STATE_C": 10, "STATE_D": 30}
+    assert generate_plan(map_data, adjacency, region_of, pop_size=pop_size, max_pops=25) == {
+        "STATE_B": ["STATE_A"],
+        "STATE_C": [],
+        "STATE_D": [],
+    }
+
+
+def test_generate_plan_leaves_states_of_no_region_alone(make_map):
+    map_data = row_map(make_map, [1, 5, 2, 6])
+    region_of = {"STATE_B": "sr:region_a", "STATE_D": "sr:region_a"}
+    assert generate_plan(map_data, adjacency, region_of) == {
+        "STATE_A": [],
+        "STATE_B": [],
+        "STATE_C": [],
+        "STATE_D": [],
+    }
+    assert generate_plan(map_data, adjacency, {}) == dict.fromkeys(adjacency, [])
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from vic3_state_merger.hubs import hub_attrs, hub_candidates, place_hubs
+from vic3_state_merger.province_map import ProvinceMap
+from vic3_state_merger.state_merger import parse_subsystem
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def merged_hubs(game_root, plan_file):
+    """Return the merged map_data of game_root, the hub candidates of the plan, the sources
+    place_hubs returns and the ProvinceMap of game_root"""
+    with open(plan_file, encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    map_data = parse_subsystem(game_root, "map_data", log=lambda message: None)
+    candidates = hub_candidates(map_data, merge_dict)
+    map_data.merge_states(merge_dict)
+    province_map = ProvinceMap(game_root)
+    return map_data, candidates, place_hubs(map_data, candidates, province_map), province_map
+
+
+def test_place_hubs_picks_candidate_closest_to_centroid(merged_hubs):
+    map_data, candidates, sources, province_map = merged_hubs
+    assert list(sources) == list(candidates)
+    for diner, attr_candidates in candidates.items():
+        total = x = y = 0.0
+        for province in map_data[diner].provinces:
+            label = province_map.label(province)
+            area = float(province_map.areas[label])
+            total += area
+            x += area * province_map.centroids[label][0]
+            y += area * province_map.centroids[label][1]
+        x, y = x / total, y / total
+        for attr in hub_attrs:
+            hubs = attr_candidates[attr]
+            if not hubs:
+                assert attr not in sources[diner]
+                continue
+            distances = [
+                (province_map.centroids[province_map.label(province)][0] - x) ** 2
+                + (province_map.centroids[province_map.label(province)][1] - y) ** 2
+                for _, province in hubs
+            ]
+            state, province = hubs[distances.index(min(distances))]
+            assert sources[diner][attr] == state
+            assert getattr(map_data[diner], attr) == province
+
+
+def test_place_hubs_on_fixture(merged_hubs):
+    map_data, _, sources, _ = merged_hubs
+    # STATE_S3 and STATE_S4 lie side by side: the city of STATE_S4 and the farm of STATE_S3 are
+    # the ones next to their border
+    assert sources["STATE_S3"] == {"city": "STATE_S4", "farm": "STATE_S3", "mine": "STATE_S4"}
+    assert (map_data["STATE_S3"].city, map_data["STATE_S3"].farm, map_data["STATE_S3"].port) == ("x88108E", "x741087", "")
+    # Only STATE_S5 has a naval exit in the group of STATE_S1
+    assert (sources["STATE_S1"]["port"], map_data["STATE_S1"].port) == ("STATE_S5", "x246A74")
+
+
+def test_place_hubs_skips_unknown_diners_and_provinces(game_root):
+    map_data = parse_subsystem(game_root, "map_data", log=lambda message: None)
+    candidates = {
+        "STATE_MISSING": {"city": [("STATE_S1", "x101064")]},
+        "STATE_S6": {"city": [("STATE_S6", "x000001")], "farm": [("STATE_S6", "x4C4C7F")]},
+    }
+    sources = place_hubs(map_data, candidates, ProvinceMap(game_root))
+    assert sources == {"STATE_S6": {"farm": "STATE_S6"}}
+    assert map_data["STATE_S6"].city == "x384C78"
@@ -0,0 +1,88 @@
+import codecs
+
+from vic3_state_merger.map_objects import locator_plan, transform_locators
+
+
+def hub_map(make_map):
+    # STATE_A and STATE_D have a city and no port, the others a port on the same naval exit
+    return make_map(
+        {"STATE_A": ["x000001"], "STATE_B": ["x000002"], "STATE_C": ["x000003"], "STATE_D": ["x000004"]},
+        extra={
+            "STATE_A": {"city": "x000001"},
+            "STATE_B": {"city": "x000002", "port": "x000002", "naval_exit_id": 3000},
+            "STATE_C": {"city": "x000003", "port": "x000003", "mine": "x000003", "naval_exit_id": 3000},
+            "STATE_D": {"city": "x000004"},
+        },
+    )
+
+
+def test_locator_plan(make_map):
+    plan = locator_plan(hub_map(make_map), {"STATE_A": ["STATE_B", "STATE_C"]})
+    assert plan["city"] == {2: None, 3: None}
+    assert plan["port"] == {2: 1, 3: None}
+    assert plan["mine"] == {2: None, 3: 1}
+    assert plan["wood"] == {2: None, 3: None}
+
+
+def test_locator_plan_follows_chains(make_map):
+    map_data = hub_map(make_map)
+    merge_dict = {"STATE_A": ["STATE_B"], "STATE_D": ["STATE_A", "STATE_C"]}
+    plan = locator_plan(map_data, merge_dict)
+    # STATE_A is a food of STATE_D, its port from STATE_B ends up in STATE_D
+    assert plan["city"] == {1: None, 2: None, 3: None}
+    assert plan["port"] == {1: None, 2: 4, 3: None}
+    assert plan["mine"] == {1: None, 2: None, 3: 4}
+
+    # The instance moved to STATE_D is the one of the hub the merge keeps
+    ids = {state: item.id for state, item in map_data.items()}
+    hubs = {state: {attr: getattr(item, attr) for attr in plan} for state, item in map_data.items()}
+    map_data.merge_states(merge_dict)
+    for attr, moves in plan.items():
+        sources = [state for state in ("STATE_A", "STATE_B", "STATE_C") if moves[ids[state]] == ids["STATE_D"]]
+        assert len(sources) <= 1
+        assert getattr(map_data["STATE_D"], attr) == hubs[sources[0] if sources else "STATE_D"][attr]
+
+
+def test_locator_plan_skips_diners_eaten_earlier(make_map):
+    plan = locator_plan(hub_map(make_map), {"STATE_D": ["STATE_A"], "STATE_A": ["STATE_B"]})
+    assert plan["port"] == {1: None}
+
+
+locator_text = (
+    "game_object_locator={\n"
+    "\tname=\"port\"\n"
+    "\tinstances={\n"
+    + "".join(f"\t\t{{\n\t\t\tid={i}\n\t\t\tposition={{ {i}.0 0.0 {i}.0 }}\n\t\t}}\n" for i in (1, 2, 3))
+    + "\t}\n"
+    "}\n"
+)
+
+
+def test_transform_locators(tmp_path):
+    in_path = tmp_path / "in.txt"
+    in_path.write_text(locator_text, encoding="utf-8")
+    out_path = tmp_path / "out" / "out.txt"
+    counts = transform_locators(str(in_path), str(out_path), {2: None, 3: 1})
+    assert counts == {"kept": 1, "dropped": 1, "reassigned": 1}
+    assert out_path.read_bytes() == locator_text.replace(
+        "\t\t{\n\t\t\tid=2\n\t\t\tposition={ 2.0 0.0 2.0 }\n\t\t}\n", ""
+    ).replace("id=3", "id=1").encode("utf-8")
+
+
+def test_transform_locators_dry_run(tmp_path):
+    in_path = tmp_path / "in.txt"
+    in_path.write_text(locator_text, encoding="utf-8")
+    assert transform_locators(str(in_path), None, {1: None}) == {"kept": 2, "dropped": 1, "reassigned": 0}
+    assert [path.name for path in tmp_path.iterdir()] == ["in.txt"]
+
+
+def test_transform_locators_keeps_byte_order_mark(tmp_path):
+    in_path = tmp_path / "in.txt"
+    out_path = tmp_path / "out.txt"
+    in_path.write_text(locator_text, encoding="utf-8-sig")
+    transform_locators(str(in_path), str(out_path), {})
+    assert out_path.read_bytes() == in_path.read_bytes()
+    in_path.write_text(locator_text, encoding="utf-8")
+    transform_locators(str(in_path), str(out_path), {})
+    assert not out_path.read_bytes().startswith(codecs.BOM_UTF8)
+    assert out_path.read_bytes() == in_path.read_bytes()
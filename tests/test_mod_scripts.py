@@ -0,0 +1,77 @@
+import json
+import os
+
+from vic3_state_merger import cli
+from vic3_state_merger.mod_scripts import (
+    flag_definitions_usa,
+    integration_counts,
+    star_flag_counts,
+    state_traits,
+    usa_state_counter_max,
+)
+from vic3_state_merger.state_merger import parse_subsystem
+
+fixture_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def star_flags(text:str) -> int:
+    return text.count("usa_state_counter") - flag_definitions_usa(0).count("usa_state_counter")
+
+
+def test_flag_definitions_usa_keeps_star_flags_up_to_max_count():
+    assert star_flags(flag_definitions_usa()) == len(star_flag_counts)
+    assert star_flags(flag_definitions_usa(1000)) == len(star_flag_counts)
+    assert star_flags(flag_definitions_usa(30)) == 6
+    assert star_flags(flag_definitions_usa(24)) == 0
+
+
+def test_usa_state_counter_max(make_map):
+    map_data = make_map(
+        {f"STATE_{i}": [f"x{i:06X}"] for i in range(1, 31)},
+        seas={"sea_1": ["x100000"]},
+    )
+    assert usa_state_counter_max(map_data) == 32
+    map_data.merge_states({"STATE_1": ["STATE_2", "STATE_3"], "STATE_4": ["STATE_5"]})
+    # Merging keeps the count of the original states
+    assert usa_state_counter_max(map_data) == 32
+
+
+def test_integration_counts_follow_merges(make_map):
+    map_data = make_map(
+        {f"STATE_{i}": [f"x{i:06X}"] for i in range(1, 8)},
+        seas={"sea_1": ["x100000"]},
+        extra={"STATE_2": {"traits": ["state_trait_two_states_integration"]}},
+    )
+    assert integration_counts(map_data) == {2: 1}
+    map_data.merge_states({"STATE_1": ["STATE_2", "STATE_3"], "STATE_4": ["STATE_5"]})
+    # STATE_2 already held two states
+    assert integration_counts(map_data) == {4: 1, 2: 1}
+    assert map_data["STATE_1"].traits == ["state_trait_four_states_integration"]
+
+
+def test_state_traits_default_table_matches_former_asset():
+    # fixtures/state_merging.txt is the trait file that used to be copied for every merge
+    with open(os.path.join(fixture_dir, "state_merging.txt"), encoding="utf-8") as file:
+        assert state_traits(range(2, 9)) == file.read()
+
+
+def test_state_traits_custom_table():
+    table = {"modifiers": [{"modifier": "state_tax_capacity_add", "per_state": 0.1}]}
+    text = state_traits({4: 1}, table)
+    assert text.count("INJECT_OR_CREATE:") == 1
+    assert "INJECT_OR_CREATE:state_trait_four_states_integration= {" in text
+    assert 'icon = "gfx/interface/icons/state_trait_icons/great_plains.dds"' in text
+    # 0.1 * 3 is written without its float noise
+    assert "        state_tax_capacity_add = 0.3\n" in text
+
+
+def test_merge_writes_traits_of_merged_states(tmp_path, game_root, plan_file):
+    mod_dir = str(tmp_path / "mod")
+    cli.run_merge(plan_file, mod_dir, game_root, str(tmp_path / "data"), 4, False)
+    with open(os.path.join(mod_dir, "common", "state_traits", "state_merging.txt"), encoding="utf-8-sig") as file:
+        written = file.read()
+    map_data = parse_subsystem(game_root, "map_data", log=lambda message: None)
+    with open(plan_file, encoding="utf-8") as file:
+        map_data.merge_states(json.load(file))
+    assert written == state_traits(integration_counts(map_data))
+    assert written.count("INJECT_OR_CREATE:") == len(integration_counts(map_data)) < 7
@@ -0,0 +1,52 @@
+import copy
+import random
+
+import pytest
+
+from tests.helpers import merged, random_plan, random_pops
+from vic3_state_merger.pops import ColumnarPops, Pops
+
+pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_columnar_pops_merge_like_pops(seed):
+    rng = random.Random(seed)
+    data = random_pops(rng, 30)
+    plan = random_plan(rng, 30)
+    pops = merged(Pops({"POPS": copy.deepcopy(data)}), plan)
+    source = ColumnarPops(Pops({"POPS": copy.deepcopy(data)}))
+    columnar = merged(source.fork(plan), plan)
+    assert str(columnar) == str(pops)
+    assert columnar.to_python() == pops.to_python()
+    assert {state_id: columnar.size_cnt(state_id) for state_id in columnar.keys()} == {
+        state_id: pops.size_cnt(state_id) for state_id in pops.keys()
+    }
+    # The fork leaves the source unmerged
+    assert str(source) == str(Pops({"POPS": copy.deepcopy(data)}))
+
+
+def test_columnar_pops_drop_empty_food_of_eaten_diner():
+    data = {
+        "s:STATE_3": {},
+        "s:STATE_4": {"region_state:GBR": {"create_pop": [{"culture": "english", "size": 10}]}},
+        "s:STATE_8": {"region_state:GBR": {"create_pop": [{"culture": "french", "size": 5}]}},
+    }
+    plan = {"STATE_4": ["STATE_8"], "STATE_8": ["STATE_3"]}
+    pops = merged(Pops({"POPS": copy.deepcopy(data)}), plan)
+    columnar = merged(ColumnarPops(Pops({"POPS": copy.deepcopy(data)})), plan)
+    assert list(pops.keys()) == ["s:STATE_4"]
+    assert str(columnar) == str(pops)
+
+
+def test_columnar_pops_reject_food_of_eaten_diner():
+    data = {
+        "s:STATE_3": {"region_state:GBR": {"create_pop": [{"culture": "dutch", "size": 1}]}},
+        "s:STATE_4": {"region_state:GBR": {"create_pop": [{"culture": "english", "size": 10}]}},
+        "s:STATE_8": {"region_state:GBR": {"create_pop": [{"culture": "french", "size": 5}]}},
+    }
+    plan = {"STATE_4": ["STATE_8"], "STATE_8": ["STATE_3"]}
+    with pytest.raises(KeyError):
+        merged(Pops({"POPS": copy.deepcopy(data)}), plan)
+    with pytest.raises(KeyError):
+        merged(ColumnarPops(Pops({"POPS": copy.deepcopy(data)})), plan)
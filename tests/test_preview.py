@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from vic3_state_merger.preview import PreviewData, border_color, render_preview, sea_color, state_color
+from vic3_state_merger.province_map import ProvinceMap
+
+# A pixel of each state of the game_root fixture, where states are blocks of 20x20 pixels
+pixels = {
+    "STATE_S1": (5, 5),
+    "STATE_S2": (25, 5),
+    "STATE_S3": (45, 5),
+    "STATE_S4": (65, 5),
+    "STATE_S5": (5, 25),
+    "STATE_S6": (25, 25),
+}
+
+
+@pytest.fixture
+def preview(tmp_path, game_root):
+    province_map = ProvinceMap(game_root, str(tmp_path / "data"))
+    preview_data = PreviewData(game_root, province_map, str(tmp_path / "data"))
+
+    def render(merge_dict:dict, **options):
+        return render_preview(province_map, preview_data, merge_dict, **options)
+
+    return render
+
+
+def test_render_preview_colours_merged_states(preview):
+    image = preview({"STATE_S1": ["STATE_S2", "STATE_S5"], "STATE_S3": ["STATE_S4"]})
+    assert image.size == (80, 50)
+    for state in ["STATE_S1", "STATE_S2", "STATE_S5"]:
+        assert image.getpixel(pixels[state]) == state_color("STATE_S1")
+    assert image.getpixel(pixels["STATE_S4"]) == state_color("STATE_S3")
+    assert image.getpixel(pixels["STATE_S6"]) == state_color("STATE_S6")
+    assert image.getpixel((5, 45)) == sea_color
+
+
+def test_render_preview_follows_the_plan_order(preview):
+    # STATE_S2 goes along with STATE_S1 into STATE_S6
+    image = preview({"STATE_S1": ["STATE_S2"], "STATE_S6": ["STATE_S1"]})
+    assert {image.getpixel(pixels[state]) for state in ["STATE_S1", "STATE_S2", "STATE_S6"]} == {state_color("STATE_S6")}
+    # STATE_S1 is merged before it could merge STATE_S2, which the merge refuses
+    image = preview({"STATE_S6": ["STATE_S1"], "STATE_S1": ["STATE_S2"]})
+    assert image.getpixel(pixels["STATE_S1"]) == state_color("STATE_S6")
+    assert image.getpixel(pixels["STATE_S2"]) == state_color("STATE_S2")
+
+
+def test_render_preview_borders_and_scale(preview):
+    image = preview({"STATE_S1": ["STATE_S2"]}, borders=True)
+    # Between two merged states, not inside one
+    assert image.getpixel((40, 5)) == border_color
+    assert image.getpixel((20, 5)) == state_color("STATE_S1")
+    assert preview({}, scale=0.5).size == (40, 25)
+
+
+def test_preview_data_cache(tmp_path, game_root):
+    province_map = ProvinceMap(game_root, str(tmp_path / "data"))
+    built = PreviewData(game_root, province_map, str(tmp_path / "data"))
+    cached = PreviewData(game_root, province_map, str(tmp_path / "data"))
+    assert cached.states == built.states
+    assert (cached.state_of == built.state_of).all()
+    assert (cached.is_sea == built.is_sea).all()
+    assert (tmp_path / "data" / "preview_states.npz").exists()
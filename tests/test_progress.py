@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from vic3_state_merger import progress
+from vic3_state_merger.progress import ProgressEvent, ProgressTracker, load_timings, phases, save_timings
+from vic3_state_merger.state_merger import StateMerger
+
+previous_timings = {"parse": 10.0, "state_data": 20.0, "misc_data": 5.0, "loc_data": 5.0}
+
+
+def event(kind:str, phase:str, at:float, done:int=0, total:int=0) -> ProgressEvent:
+    progress_event = ProgressEvent(kind, phase, done, total)
+    progress_event.time = at
+    return progress_event
+
+
+def test_overall_weighs_phases_equally_without_previous_run():
+    tracker = ProgressTracker()
+    assert tracker.overall() == 0.0
+    tracker.update(event("phase_start", "parse", 100.0))
+    tracker.update(event("phase_end", "parse", 104.0))
+    tracker.update(event("phase_start", "state_data", 104.0))
+    tracker.update(event("progress", "state_data", 105.0, 1, 2))
+    assert tracker.overall() == pytest.approx(1.5 / 4)
+    assert tracker.timings == {"parse": 4.0}
+    assert tracker.remaining() is None
+
+
+def test_overall_and_remaining_follow_previous_timings(monkeypatch):
+    tracker = ProgressTracker(previous_timings)
+    tracker.update(event("phase_start", "parse", 90.0))
+    tracker.update(event("phase_end", "parse", 100.0))
+    tracker.update(event("phase_start", "state_data", 100.0))
+    tracker.update(event("progress", "state_data", 105.0, 1, 4))
+    assert tracker.overall() == pytest.approx((10 + 20 * 0.25) / 40)
+    monkeypatch.setattr(progress.time, "time", lambda: 105.0)
+    # A quarter of state_data took 5 seconds, 15 are left of it, then misc_data and loc_data
+    assert tracker.remaining() == pytest.approx(15 + 5 + 5)
+    tracker.update(event("phase_end", "state_data", 120.0))
+    assert tracker.remaining() == pytest.approx(5 + 5)
+
+
+def test_timings_round_trip(tmp_path):
+    path = str(tmp_path / "data" / "timings.json")
+    assert load_timings(path) == {}
+    save_timings(path, previous_timings)
+    assert load_timings(path) == previous_timings
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{not json")
+    assert load_timings(path) == {}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump([1, 2], file)
+    assert load_timings(path) == {}
+
+
+def test_tracker_follows_a_merge(tmp_path, game_root, plan_file):
+    with open(plan_file, encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    tracker = ProgressTracker()
+    overall = []
+
+    def update(progress_event):
+        tracker.update(progress_event)
+        overall.append(tracker.overall())
+
+    state_merger = StateMerger(
+        game_root, str(tmp_path / "mod") + "/", merge_dict, str(tmp_path / "data") + "/", progress=update
+    )
+    state_merger.merge_state_data()
+    state_merger.merge_misc_data()
+    state_merger.merge_loc_data()
+    assert list(tracker.timings) == phases
+    assert overall == sorted(overall)
+    assert overall[-1] == 1.0
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from PIL import Image
+
+from vic3_state_merger import province_map
+from vic3_state_merger.province_map import ProvinceMap, province_id, provinces_png
+from vic3_state_merger.state_merger import parse_subsystem
+
+np = pytest.importorskip("numpy")
+
+
+def reference_graph(png_path:str) -> tuple[dict, dict, set]:
+    """Return the areas, centroids and borders of provinces.png, read pixel by pixel"""
+    with Image.open(png_path) as image:
+        image = image.convert("RGB")
+        width, height = image.size
+        ids = [
+            [province_id((r << 16) | (g << 8) | b) for r, g, b in (image.getpixel((x, y)) for x in range(width))]
+            for y in range(height)
+        ]
+    areas = {}
+    sums = {}
+    borders = set()
+    for y in range(height):
+        for x in range(width):
+            province = ids[y][x]
+            areas[province] = areas.get(province, 0) + 1
+            sum_x, sum_y = sums.get(province, (0, 0))
+            sums[province] = (sum_x + x, sum_y + y)
+            for nx, ny in ((x + 1, y), (x, y + 1)):
+                if nx < width and ny < height and ids[ny][nx] != province:
+                    borders.add(frozenset((province, ids[ny][nx])))
+    centroids = {
+        province: (sum_x / areas[province], sum_y / areas[province]) for province, (sum_x, sum_y) in sums.items()
+    }
+    return areas, centroids, borders
+
+
+@pytest.mark.parametrize("rows", [province_map.band_rows, 3])
+def test_build_matches_pixel_reference(monkeypatch, game_root, rows):
+    # Bands of 3 rows put band seams through every state of the fixture
+    monkeypatch.setattr(province_map, "band_rows", rows)
+    provinces = ProvinceMap(game_root)
+    areas, centroids, borders = reference_graph(os.path.join(game_root, provinces_png))
+    assert provinces.provinces == sorted(areas)
+    assert {province: int(provinces.areas[label]) for label, province in enumerate(provinces.provinces)} == areas
+    for label, province in enumerate(provinces.provinces):
+        assert tuple(provinces.centroids[label]) == pytest.approx(centroids[province])
+    assert {frozenset((provinces.provinces[a], provinces.provinces[b])) for a, b in provinces.edges.tolist()} == borders
+    for province in provinces.provinces:
+        assert sorted(provinces.neighbors(province)) == sorted(
+            other for border in borders if province in border for other in border if other != province
+        )
+
+
+def test_cache_is_reused_and_labels_match(tmp_path, game_root):
+    cache_dir = str(tmp_path / "data")
+    built = ProvinceMap(game_root, cache_dir)
+    assert os.path.exists(os.path.join(cache_dir, "province_map.npz"))
+    cached = ProvinceMap(game_root, cache_dir)
+    assert cached.provinces == built.provinces
+    assert np.array_equal(cached.edges, built.edges)
+    labels = cached.labels()
+    assert np.array_equal(np.asarray(labels), ProvinceMap.read_labels(cached.png_path)[1])
+    # The second call reads the memory-mapped cache
+    assert np.array_equal(np.asarray(cached.labels()), np.asarray(labels))
+
+
+def test_states_of_the_fixture_are_contiguous(game_root):
+    provinces = ProvinceMap(game_root)
+    map_data = parse_subsystem(game_root, "map_data", log=lambda message: None)
+    for state in ("STATE_S1", "STATE_S2", "STATE_S3"):
+        assert provinces.is_contiguous(map_data[state].provinces)
+    assert provinces.is_contiguous(map_data["STATE_S1"].provinces + map_data["STATE_S2"].provinces)
+    # STATE_S2 lies between STATE_S1 and STATE_S3
+    components = provinces.components(map_data["STATE_S1"].provinces + map_data["STATE_S3"].provinces)
+    assert sorted(map(sorted, components)) == sorted(
+        [sorted(map_data["STATE_S1"].provinces), sorted(map_data["STATE_S3"].provinces)]
+    )
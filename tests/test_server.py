@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from vic3_state_merger.server import INVALID_PARAMS, MergeService, ServiceError, _http_error, handle_payload
+
+hosts = {"127.0.0.1:8765", "localhost:8765"}
+
+
+@pytest.mark.parametrize(
+    "headers, status",
+    [
+        ({"host": "127.0.0.1:8765", "content-type": "application/json"}, None),
+        ({"host": "localhost:8765", "content-type": "application/json; charset=utf-8"}, None),
+        ({"host": "127.0.0.1:8765", "content-type": "application/json", "origin": "null"}, "403 Forbidden"),
+        ({"host": "evil.example:8765", "content-type": "application/json"}, "403 Forbidden"),
+        ({"content-type": "application/json"}, "403 Forbidden"),
+        ({"host": "127.0.0.1:8765", "content-type": "text/plain"}, "415 Unsupported Media Type"),
+        ({"host": "127.0.0.1:8765"}, "415 Unsupported Media Type"),
+    ],
+)
+def test_http_error(headers, status):
+    assert _http_error(headers, hosts) == status
+
+
+def request(service:MergeService, method:str, params:dict) -> dict:
+    payload = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return asyncio.run(handle_payload(service, executor, payload))
+
+
+def test_paths_need_allowed_dirs(tmp_path, game_root, plan_file):
+    service = MergeService(game_root, str(tmp_path / "data"))
+    response = request(service, "merge", {"plan": {}, "mod_dir": str(tmp_path / "mod")})
+    assert response["error"]["code"] == INVALID_PARAMS
+    assert "without allowed directories" in response["error"]["message"]
+    assert not os.path.exists(tmp_path / "mod")
+    with pytest.raises(ServiceError):
+        service.call("validate", {"merge_file": plan_file})
+
+
+def test_paths_inside_allowed_dirs(tmp_path, game_root, plan_file):
+    allowed = tmp_path / "allowed"
+    allowed.mkdir()
+    service = MergeService(game_root, str(tmp_path / "data"), allowed_dirs=[str(allowed)])
+    for mod_dir in [str(tmp_path / "mod"), str(allowed / ".." / "mod"), str(allowed) + "_mod"]:
+        with pytest.raises(ServiceError, match="outside the allowed directories"):
+            service.call("merge", {"plan": {}, "mod_dir": mod_dir})
+    with pytest.raises(ServiceError, match="outside the allowed directories"):
+        service.call("validate", {"merge_file": plan_file})
+    os.replace(plan_file, allowed / "merge_states.json")
+    result = service.call("merge", {"merge_file": str(allowed / "merge_states.json"), "mod_dir": str(allowed / "mod")})
+    assert result == {"mod_dir": str(allowed / "mod")}
+    assert os.path.exists(allowed / "mod" / "map_data" / "state_regions" / "state_merging.txt")
+
+
+def test_dry_run(tmp_path, game_root, plan_file):
+    service = MergeService(game_root, str(tmp_path / "data"))
+    with open(plan_file, encoding="utf-8") as file:
+        plan = json.load(file)
+    report = request(service, "dry_run", {"plan": plan})["result"]
+    assert list(report["states"]) == ["STATE_S1", "STATE_S3", "STATE_S7"]
+    assert report["states"]["STATE_S1"]["foods"] == ["STATE_S2", "STATE_S5"]
+    assert not os.path.exists(tmp_path / "data" / "mod")
+
+
+chained_plan = {"STATE_S1": ["STATE_S2"], "STATE_S6": ["STATE_S1"]}
+
+
+def test_query(tmp_path, game_root):
+    service = MergeService(game_root, str(tmp_path / "data"))
+    plan = chained_plan
+    result = request(service, "query", {"plan": plan, "state": "STATE_S2"})["result"]
+    # STATE_S1 and the STATE_S2 it ate end up in STATE_S6
+    assert result["state"] == "STATE_S6"
+    assert result["merged_into"] == "STATE_S6"
+    assert len(result["provinces"]) == 12
+    assert result["pop_total"] == sum(pop["size"] for pop in result["pops"])
+    assert {pop["region_state"] for pop in result["pops"]} == {"region_state:GBR", "region_state:FRA", "region_state:USA"}
+    # The last province comes from STATE_S2
+    province = result["provinces"][-1]
+    assert request(service, "query", {"plan": plan, "province": province})["result"] == result
+    response = request(service, "query", {"plan": plan, "province": "x000000"})
+    assert response["error"]["code"] == INVALID_PARAMS
+
+
+def test_query_columnar(tmp_path, game_root):
+    pytest.importorskip("numpy")
+    params = {"plan": chained_plan, "state": "STATE_S6"}
+    expected = MergeService(game_root, str(tmp_path / "data")).call("query", params)
+    assert MergeService(game_root, str(tmp_path / "data"), columnar=True).call("query", params) == expected
@@ -0,0 +1,53 @@
+import json
+import multiprocessing
+import threading
+
+import pytest
+
+from vic3_state_merger.progress import MergeCancelled
+from vic3_state_merger.state_merger import StateMerger, terminate_executor
+
+
+def test_cancelled_jobs_merge_leaves_no_workers(tmp_path, game_root, plan_file):
+    with open(plan_file, encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    cancel = threading.Event()
+    pools = []
+
+    def progress(event):
+        # Cancel once the worker processes have been given their subsystems
+        if event.phase == "state_data" and event.kind == "progress" and state_merger.executor is not None:
+            pools.append(state_merger.executor)
+            cancel.set()
+
+    state_merger = StateMerger(
+        game_root, str(tmp_path / "mod") + "/", merge_dict, str(tmp_path / "data") + "/",
+        progress=progress, cancel=cancel, jobs=2,
+    )
+    with pytest.raises(MergeCancelled):
+        state_merger.merge_state_data()
+    assert pools
+    assert state_merger.executor is None
+    assert multiprocessing.active_children() == []
+
+
+def test_terminate_executor_waits_without_processes():
+    class Executor:
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shutdown_args = (wait, cancel_futures)
+
+    executor = Executor()
+    terminate_executor(executor)
+    assert executor.shutdown_args == (True, True)
+
+
+def test_staged_merge_releases_subsystems(tmp_path, game_root, plan_file):
+    with open(plan_file, encoding="utf-8") as file:
+        merge_dict = json.load(file)
+    state_merger = StateMerger(
+        game_root, str(tmp_path / "mod") + "/", merge_dict, str(tmp_path / "data") + "/", staged=True
+    )
+    state_merger.merge_state_data()
+    assert (state_merger.buildings, state_merger.pops, state_merger.states, state_merger.trade) == (None,) * 4
+    assert state_merger.map_data["STATE_S1"].merge_states_cnt() == 3
+    assert "STATE_S2" not in state_merger.map_data
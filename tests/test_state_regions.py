@@ -0,0 +1,32 @@
+from vic3_state_merger.state_regions import StateRegion, merge_groups
+
+
+def test_state_region_logs_through_log():
+    lines = []
+    source = {
+        "STATE_A": {
+            "id": 1,
+            "subsistence_building": "building_subsistence_farms",
+            "provinces": ["x000001"],
+            "arable_land": 10,
+            "arable_resources": ["bg_wheat_farms"],
+            "resource": {"type": "building_whaling_station", "undiscovered_amount": 3},
+        },
+        "sea_1": {"id": 3000, "provinces": ["x000002"]},
+    }
+    map_data = StateRegion(source, log=lines.append)
+    assert lines == ["Unknown resource type: building_whaling_station"]
+    map_data.fork({"STATE_A": ["sea_1"]}).merge_states({"STATE_A": ["sea_1"]})
+    assert lines[1:] == ["Error: Cannot merge sea node with other state"]
+
+
+def test_merge_groups():
+    states = {"STATE_A", "STATE_B", "STATE_C", "STATE_D", "STATE_E"}
+    assert merge_groups({"STATE_A": ["STATE_B", "STATE_X", "STATE_A"], "STATE_C": []}, states) == {
+        "STATE_A": ["STATE_A", "STATE_B"]
+    }
+    # STATE_B is merged into STATE_A before STATE_A is merged into STATE_C
+    chained = {"STATE_A": ["STATE_B"], "STATE_C": ["STATE_D", "STATE_A"]}
+    assert merge_groups(chained, states) == {"STATE_C": ["STATE_C", "STATE_D", "STATE_A", "STATE_B"]}
+    # STATE_A is eaten before it could eat STATE_B
+    assert merge_groups({"STATE_C": ["STATE_A"], "STATE_A": ["STATE_B"]}, states) == {"STATE_C": ["STATE_C", "STATE_A"]}
@@ -0,0 +1,41 @@
+import copy
+import random
+
+import pytest
+
+from tests.helpers import merged, random_plan, random_trade
+from vic3_state_merger.trade import ColumnarTrade, Trade
+
+pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_columnar_trade_merge_like_trade(seed):
+    rng = random.Random(seed)
+    data = random_trade(rng, 30)
+    plan = random_plan(rng, 30, reuse_foods=True)
+    source = ColumnarTrade(Trade({"TRADE": copy.deepcopy(data)}))
+    assert str(source) == str(Trade({"TRADE": copy.deepcopy(data)}))
+    trade = merged(Trade({"TRADE": copy.deepcopy(data)}), plan)
+    columnar = merged(source.fork(plan), plan)
+    assert str(columnar) == str(trade)
+    assert columnar.to_python() == trade.to_python()
+    assert columnar.keys() == list(trade.keys())
+    assert [columnar.entry_cnt(state_id) for state_id in columnar.keys()] == [
+        trade.entry_cnt(state_id) for state_id in trade.keys()
+    ]
+    # The fork leaves the source unmerged
+    assert str(source) == str(Trade({"TRADE": copy.deepcopy(data)}))
+
+
+def test_columnar_trade_sum_floats_in_merge_order():
+    data = {
+        "s:STATE_1": {"region_state:GBR": {"grain": {"add_exports": 0.1}}},
+        "s:STATE_2": {"region_state:GBR": {"grain": {"add_exports": 0.2}, "iron": {}}},
+        "s:STATE_3": {"region_state:GBR": {"grain": {"add_exports": 0.3}}},
+    }
+    plan = {"STATE_1": ["STATE_2"], "STATE_3": ["STATE_1"]}
+    trade = merged(Trade({"TRADE": copy.deepcopy(data)}), plan)
+    columnar = merged(ColumnarTrade(Trade({"TRADE": copy.deepcopy(data)})), plan)
+    assert str(columnar) == str(trade)
+    assert columnar.keys() == ["s:STATE_3"]
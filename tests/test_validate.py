@@ -0,0 +1,82 @@
+from vic3_state_merger.validate import issue, validate_geometry, validate_plan, validate_provinces
+
+
+class StubProvinceMap:
+    """Province adjacency given as {state: adjacent states} and {province: adjacent provinces}"""
+
+    def __init__(self, states:dict, provinces:dict):
+        self.states = states
+        self.provinces = provinces
+
+    def state_adjacency(self, map_data):
+        return self.states
+
+    def neighbors(self, province:str) -> list[str]:
+        return self.provinces[province]
+
+
+def test_validate_plan_accepts_good_plan(make_map):
+    map_data = make_map({"STATE_A": ["x000001"], "STATE_B": ["x000002"], "STATE_C": ["x000003"]})
+    assert validate_plan({"STATE_A": ["STATE_B", "STATE_C"]}, map_data) == []
+
+
+def test_validate_plan_reports_bad_states(make_map):
+    map_data = make_map({"STATE_A": ["x000001"], "STATE_B": ["x000002"]}, seas={"sea_1": ["x000010"]})
+    plan = {"STATE_A": ["STATE_A", "STATE_X", "sea_1"], "STATE_Y": ["STATE_B"], "STATE_Z": [], "STATE_B": "STATE_A"}
+    assert validate_plan(plan, map_data) == [
+        issue("error", "STATE_A", "A state cannot be merged into itself"),
+        issue("error", "STATE_X", "Unknown state, merged into STATE_A"),
+        issue("error", "sea_1", "Sea nodes cannot be merged, merged into STATE_A"),
+        issue("error", "STATE_Y", "Unknown state"),
+        issue("warning", "STATE_Z", "Unknown state"),
+        issue("error", "STATE_B", "The foods of a state must be a list of state ids"),
+    ]
+
+
+def test_validate_plan_reports_merge_order(make_map):
+    map_data = make_map({name: [f"x00000{i}"] for i, name in enumerate(["STATE_A", "STATE_B", "STATE_C", "STATE_D"])})
+    assert validate_plan({"STATE_A": ["STATE_B"], "STATE_C": ["STATE_A"], "STATE_D": ["STATE_B"]}, map_data) == [
+        issue("warning", "STATE_A", "Merged into STATE_C after its own foods were merged into it"),
+        issue("error", "STATE_B", "Merged into both STATE_A and STATE_D"),
+    ]
+    assert validate_plan({"STATE_C": ["STATE_A"], "STATE_A": ["STATE_B"]}, map_data) == [
+        issue("error", "STATE_A", "Merged into STATE_C before its own foods are merged into it"),
+    ]
+
+
+def test_validate_provinces(make_map):
+    map_data = make_map({"STATE_A": ["x000001", "x000002"], "STATE_B": ["x000003", "x000004"], "STATE_C": ["x000004"]})
+    states = {
+        "s:STATE_A": {"create_state": [{"country": "c:GBR", "owned_provinces": ["x000001", "x000001", "x000003"]}]},
+        "s:STATE_B": {"create_state": [{"country": "c:FRA", "owned_provinces": ["x000003", "x000004"]}]},
+    }
+    assert validate_provinces({"STATE_A": ["STATE_B"]}, map_data, states) == [
+        issue("error", "STATE_A", "Province x000001 is owned by both c:GBR and c:GBR"),
+        issue("error", "STATE_A", "Province x000003 owned by c:GBR is in the state region STATE_B"),
+        issue("warning", "STATE_A", "Province x000002 is owned by no country"),
+        issue("error", "STATE_B", "Province x000004 is also in STATE_C"),
+    ]
+
+
+def test_validate_geometry(make_map):
+    map_data = make_map(
+        {"STATE_A": ["x000001"], "STATE_B": ["x000002"], "STATE_C": ["x000003"]},
+        seas={"sea_1": ["x000010"], "sea_2": ["x000020"]},
+        extra={
+            "STATE_B": {"port": "x000002", "naval_exit_id": 3000},
+            "STATE_C": {"port": "x000003", "naval_exit_id": 3001},
+        },
+    )
+    province_map = StubProvinceMap(
+        {"STATE_A": {"STATE_B"}, "STATE_B": {"STATE_A"}, "STATE_C": set()},
+        {"x000002": ["x000001", "x000010"], "x000003": []},
+    )
+    assert validate_geometry({"STATE_A": ["STATE_B"]}, map_data, province_map) == [
+        issue("warning", "STATE_A", "Landlocked, the merged port and naval exit come from STATE_B"),
+    ]
+    assert validate_geometry({"STATE_A": ["STATE_C", "STATE_B"]}, map_data, province_map) == [
+        issue("warning", "STATE_A", "Not contiguous, no border links STATE_C to the rest of the group"),
+        issue("warning", "STATE_A", "Landlocked, the merged port and naval exit come from STATE_C"),
+        issue("warning", "STATE_A", "Naval exit 3001 is kept, the ports on naval exits 3000 are lost"),
+        issue("warning", "STATE_A", "Port province x000003 does not border the sea of naval exit 3001"),
+    ]
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import numpy as np
+
+from vic3_state_merger import whatif
+from vic3_state_merger.state_merger import StateMerger
+from vic3_state_merger.whatif import WhatIf
+
+plans = [
+    {"STATE_S1": ["STATE_S2", "STATE_S5"], "STATE_S3": ["STATE_S4"], "STATE_S6": [], "STATE_S7": ["STATE_S8"]},
+    {"STATE_S1": ["STATE_S2"], "STATE_S6": ["STATE_S1", "STATE_S5"], "STATE_S3": ["STATE_S4", "STATE_S7", "STATE_S8"]},
+]
+
+
+@pytest.mark.parametrize("plan", plans)
+def test_evaluate_matches_merge(tmp_path, game_root, plan):
+    totals = WhatIf(game_root, str(tmp_path / "data")).evaluate(plan)
+    state_merger = StateMerger(game_root, "", plan, str(tmp_path / "data") + "/", dry_run=True)
+    state_merger.merge_state_data()
+    summary = state_merger.summarize_states()
+    diners = [diner for diner in summary if diner in state_merger.map_data]
+    assert sorted(totals) == sorted(diners)
+    for diner in diners:
+        merged = state_merger.map_data[diner]
+        assert totals[diner]["provinces"] == summary[diner]["provinces"]
+        assert totals[diner]["pops"] == summary[diner]["pops"]
+        assert totals[diner]["building_levels"] == summary[diner]["building_levels"]
+        assert totals[diner]["arable_land"] == merged.arable_land
+        assert totals[diner]["gold_undiscovered"] == merged.gold[0]
+        assert {
+            column[len("capped:"):]: value for column, value in totals[diner].items() if column.startswith("capped:")
+        } == merged.capped_resources
+        cultures = {}
+        for state_pops in state_merger.pops["s:" + diner].values():
+            for pop in state_pops["create_pop"]:
+                cultures[pop["culture"]] = cultures.get(pop["culture"], 0) + int(pop["size"])
+        assert {
+            column[len("culture:"):]: value for column, value in totals[diner].items() if column.startswith("culture:")
+        } == cultures
+
+
+def test_groups(tmp_path, game_root):
+    what_if = WhatIf(game_root, str(tmp_path / "data"))
+    row = what_if.index
+    assert "sea_1" not in row
+    assert what_if.groups({"STATE_S1": ["STATE_S2", "sea_1", "STATE_X", "STATE_S1"], "STATE_S3": []}) == {
+        "STATE_S1": [row["STATE_S1"], row["STATE_S2"]]
+    }
+    assert what_if.groups({"STATE_S1": ["STATE_S2"], "STATE_S6": ["STATE_S1"]}) == {
+        "STATE_S6": [row["STATE_S6"], row["STATE_S1"], row["STATE_S2"]]
+    }
+    # STATE_S1 is merged before it could merge STATE_S2, its foods are left out
+    assert what_if.groups({"STATE_S6": ["STATE_S1"], "STATE_S1": ["STATE_S2"]}) == {
+        "STATE_S6": [row["STATE_S6"], row["STATE_S1"]]
+    }
+
+
+def test_group_totals_sums_groups_of_any_size(tmp_path, game_root):
+    what_if = WhatIf(game_root, str(tmp_path / "data"))
+    plan = {"STATE_S1": ["STATE_S2", "STATE_S5", "STATE_S6"], "STATE_S3": ["STATE_S4"], "STATE_S7": ["STATE_S8"]}
+    columns = ["pops", "provinces"]
+    diners, totals = what_if.group_totals(plan, columns)
+    assert diners == ["STATE_S1", "STATE_S3", "STATE_S7"]
+    picked = what_if.matrix[:, [what_if.columns.index(column) for column in columns]]
+    for diner, row in zip(diners, totals):
+        expected = sum(picked[what_if.index[state]] for state in [diner, *plan[diner]])
+        assert row.tolist() == expected.tolist()
+    assert what_if.group_totals({}, columns)[1].shape == (0, 2)
+    assert what_if.evaluate({}) == {}
+
+
+def test_cache_is_rebuilt_when_a_file_changes(tmp_path, game_root, monkeypatch):
+    data_dir = str(tmp_path / "data")
+    built = WhatIf(game_root, data_dir)
+    assert os.path.exists(os.path.join(data_dir, "state_aggregates.npz"))
+
+    def refuse(*args):
+        raise AssertionError("the cache should have been used")
+
+    monkeypatch.setattr(whatif, "state_aggregates", refuse)
+    cached = WhatIf(game_root, data_dir)
+    assert cached.states == built.states and cached.columns == built.columns
+    assert np.array_equal(cached.matrix, built.matrix)
+    monkeypatch.undo()
+
+    pops_file = os.path.join(game_root, "common", "history", "pops", "00_pops.txt")
+    with open(pops_file, encoding="utf-8-sig") as file:
+        text = file.read()
+    with open(pops_file, "w", encoding="utf-8-sig") as file:
+        file.write(text.replace("size = 1000\n", "size = 1500\n", 1))
+    stat = os.stat(pops_file)
+    os.utime(pops_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    rebuilt = WhatIf(game_root, data_dir)
+    pops = rebuilt.columns.index("pops")
+    assert rebuilt.matrix[rebuilt.index["STATE_S1"], pops] == built.matrix[built.index["STATE_S1"], pops] + 500